@@ -38,6 +38,15 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
-
-exec gunicorn core.wsgi:application --bind 0.0.0.0:8000
+# Ein Worker-Pool pro Queue, damit lange Transcodes keine E-Mails blockieren.
+# Die E-Mail-Worker arbeiten auch alte Jobs aus der 'default' Queue ab.
+python manage.py rqworker-pool email default --num-workers "${RQ_EMAIL_WORKERS:-1}" &
+python manage.py rqworker-pool thumbnail --num-workers "${RQ_THUMBNAIL_WORKERS:-1}" &
+python manage.py rqworker-pool transcode --num-workers "${RQ_TRANSCODE_WORKERS:-1}" &
+
+# SERVER_PROFILE=asgi startet uvicorn: Playlists und Segmente werden dann von async Views gestreamt,
+# so dass langsame Clients keinen ganzen Worker-Prozess blockieren.
+if [ "${SERVER_PROFILE:-wsgi}" = "asgi" ]; then
+    exec uvicorn core.asgi:application --host 0.0.0.0 --port 8000 --workers "${WEB_WORKERS:-1}"
+fi
+exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --workers "${WEB_WORKERS:-1}"
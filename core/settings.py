@@ -15,6 +15,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 load_dotenv(override=True)
 
@@ -68,6 +69,8 @@ MIDDLEWARE = [
 
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'upload-offset', 'upload-checksum')
+CORS_EXPOSE_HEADERS = ['Upload-Offset']
 
 ROOT_URLCONF = 'core.urls'
 
@@ -114,15 +117,64 @@ CACHES = {
     }
 }
 
+# Transactional emails, thumbnails and transcodes run on separate queues, so a long encode never delays
+# a sign-up email. Each queue has its own timeout and is served by its own worker pool (backend.entrypoint.sh).
+RQ_CONNECTION = {
+    'HOST': os.environ.get("REDIS_HOST", default="redis"),        
+    'PORT': os.environ.get("REDIS_PORT", default=6379),
+    'DB': os.environ.get("REDIS_DB", default=0),
+    'REDIS_CLIENT_KWARGS': {},
+}
 RQ_QUEUES = {
-    'default': {
-        'HOST': os.environ.get("REDIS_HOST", default="redis"),        
-        'PORT': os.environ.get("REDIS_PORT", default=6379),
-        'DB': os.environ.get("REDIS_DB", default=0),
-        'DEFAULT_TIMEOUT': 900,
-        'REDIS_CLIENT_KWARGS': {},
-    },
+    'default': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 900},
+    'email': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': int(os.environ.get("RQ_EMAIL_TIMEOUT", default=60))},
+    'thumbnail': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': int(os.environ.get("RQ_THUMBNAIL_TIMEOUT", default=300))},
+    'transcode': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': int(os.environ.get("RQ_TRANSCODE_TIMEOUT", default=4 * 60 * 60))},
 }
+# Prefix of the ids of the video jobs, so deployments that share one Redis never mix up the jobs of videos with the
+# same id. When empty, the prefix is derived from the name, host and port of the database.
+RQ_JOB_ID_PREFIX = os.environ.get("RQ_JOB_ID_PREFIX", default="")
+
+# Videos of at least HLS_CHUNKED_MIN_DURATION seconds are split into chunks of HLS_CHUNK_SECONDS
+# that are encoded in parallel by HLS_CHUNK_WORKERS processes.
+HLS_CHUNKED_MIN_DURATION = int(os.environ.get("HLS_CHUNKED_MIN_DURATION", default=600))
+HLS_CHUNK_SECONDS = int(os.environ.get("HLS_CHUNK_SECONDS", default=60))
+HLS_CHUNK_WORKERS = int(os.environ.get("HLS_CHUNK_WORKERS", default=os.cpu_count() or 1))
+
+# Publish a growing EVENT playlist while the ladder is encoded, so a new upload can be played after its first
+# segments instead of after the full encode. The playlists are switched to VOD when the encode has finished.
+HLS_PROGRESSIVE_PUBLISH = os.environ.get("HLS_PROGRESSIVE_PUBLISH", "False").lower() == "true"
+
+# Write one media file per rendition and address the segments with EXT-X-BYTERANGE instead of one file per segment.
+HLS_SINGLE_FILE = os.environ.get("HLS_SINGLE_FILE", "False").lower() == "true"
+
+# Encode the audio once into a shared 'audio' rendition that every video rendition references via EXT-X-MEDIA,
+# instead of muxing the same AAC track into every rendition. Always on for the 'cmaf' profile.
+# The rendition playlists are then video-only, so clients that play a '<resolution>p/index.m3u8' directly instead of
+# the master playlist play without sound.
+HLS_SHARED_AUDIO = os.environ.get("HLS_SHARED_AUDIO", "False").lower() == "true"
+
+# Per-title encoding: short sample encodes measure the complexity of every title and pick its CRF between
+# HLS_CRF_MAX (simple content) and HLS_CRF_MIN (complex content) and the bitrate cap of every rendition.
+# When disabled every title is encoded with CRF 20 without a cap.
+HLS_PER_TITLE_ENCODING = os.environ.get("HLS_PER_TITLE_ENCODING", "True").lower() == "true"
+HLS_CRF_MIN = int(os.environ.get("HLS_CRF_MIN", default=20))
+HLS_CRF_MAX = int(os.environ.get("HLS_CRF_MAX", default=24))
+
+# Outputs produced for every upload:
+#   'hls'     - HLS with MPEG-TS segments only
+#   'hls+mp4' - HLS plus one progressive MP4 fallback in VIDEO_PROGRESSIVE_RESOLUTION
+#   'cmaf'    - HLS with fragmented-MP4 (CMAF) segments plus a DASH manifest that references the same segments
+VIDEO_DELIVERY_PROFILE = os.environ.get("VIDEO_DELIVERY_PROFILE", default="hls")
+VIDEO_PROGRESSIVE_RESOLUTION = os.environ.get("VIDEO_PROGRESSIVE_RESOLUTION", default="480")
+
+# Trickplay scrub previews: one frame every TRICKPLAY_INTERVAL seconds, TRICKPLAY_WIDTH pixels wide,
+# tiled into sprite sheets of TRICKPLAY_COLUMNS x TRICKPLAY_ROWS thumbnails ('jpeg' or 'webp').
+TRICKPLAY_INTERVAL = int(os.environ.get("TRICKPLAY_INTERVAL", default=10))
+TRICKPLAY_WIDTH = int(os.environ.get("TRICKPLAY_WIDTH", default=160))
+TRICKPLAY_COLUMNS = int(os.environ.get("TRICKPLAY_COLUMNS", default=10))
+TRICKPLAY_ROWS = int(os.environ.get("TRICKPLAY_ROWS", default=10))
+TRICKPLAY_FORMAT = os.environ.get("TRICKPLAY_FORMAT", default="jpeg")
 
 
 # Password validation
@@ -166,8 +218,53 @@ STATIC_ROOT = BASE_DIR / "static"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Server that runs the app (backend.entrypoint.sh):
+#   'wsgi' - gunicorn with sync workers
+#   'asgi' - uvicorn; the HLS playlist and segment routes use async views that stream with non-blocking file reads,
+#            so one process holds many slow downloads
+SERVER_PROFILE = os.environ.get("SERVER_PROFILE", default="wsgi")
+
+# How the streaming views send HLS/DASH files after the permission check:
+#   'django'     - Django streams the file itself
+#   'x-accel'    - nginx sends the file from an 'internal' location that maps MEDIA_ACCEL_PREFIX to MEDIA_ROOT
+#   'x-sendfile' - Apache (mod_xsendfile) or lighttpd sends the file from its absolute path
+MEDIA_DELIVERY_MODE = os.environ.get("MEDIA_DELIVERY_MODE", default="django")
+MEDIA_ACCEL_PREFIX = os.environ.get("MEDIA_ACCEL_PREFIX", default="/protected-media/")
+
+# Cache-Control of HLS segments and of finished rendition playlists. A segment file never changes once it is listed in a playlist,
+# so it may be cached for a year; use 'public, ...' when a CDN caches the segments. Growing EVENT playlists and the single
+# media file of a byte-range rendition are always served with 'no-cache' and revalidated with their ETag.
+HLS_SEGMENT_CACHE_CONTROL = os.environ.get("HLS_SEGMENT_CACHE_CONTROL", default="private, max-age=31536000, immutable")
+HLS_MANIFEST_CACHE_CONTROL = os.environ.get("HLS_MANIFEST_CACHE_CONTROL", default="private, max-age=60")
+
+# Sign the segment URIs of every rendition playlist with an HMAC of the user, the video and an expiry time, so segment requests
+# are authenticated without a token or database lookup. The signed URLs stay valid for at least HLS_SIGNED_URL_LIFETIME seconds.
+HLS_SIGNED_SEGMENT_URLS = os.environ.get("HLS_SIGNED_SEGMENT_URLS", "True").lower() == "true"
+HLS_SIGNED_URL_LIFETIME = int(os.environ.get("HLS_SIGNED_URL_LIFETIME", default=21600))
+
+# Rendition playlists are cached in every worker process (up to HLS_MANIFEST_CACHE_SIZE playlists) and in the Redis cache
+# (for HLS_MANIFEST_CACHE_TIMEOUT seconds). The cache keys contain the modification time and size of the file,
+# so a rewritten playlist is read again from disk.
+HLS_MANIFEST_CACHE_SIZE = int(os.environ.get("HLS_MANIFEST_CACHE_SIZE", default=512))
+HLS_MANIFEST_CACHE_TIMEOUT = int(os.environ.get("HLS_MANIFEST_CACHE_TIMEOUT", default=3600))
+
+# Every finished rendition has a segment index (segments.json) with the names, sizes and checksums of its segments.
+# Every worker process caches up to HLS_SEGMENT_INDEX_CACHE_SIZE indexes and checks them for a new version after
+# HLS_SEGMENT_INDEX_TTL seconds.
+HLS_SEGMENT_INDEX_CACHE_SIZE = int(os.environ.get("HLS_SEGMENT_INDEX_CACHE_SIZE", default=256))
+HLS_SEGMENT_INDEX_TTL = int(os.environ.get("HLS_SEGMENT_INDEX_TTL", default=60))
+
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Uploads that do not fit into memory are hashed while they stream to disk (content-hash deduplication).
+FILE_UPLOAD_HANDLERS = [
+    "django.core.files.uploadhandler.MemoryFileUploadHandler",
+    "videoflix_app.api.upload_handlers.ContentHashUploadHandler",
+]
+
+# Largest chunk in bytes accepted by the resumable upload endpoint (api/uploads/).
+UPLOAD_MAX_CHUNK_SIZE = int(os.environ.get("UPLOAD_MAX_CHUNK_SIZE", default=64 * 1024 * 1024))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Video, Category, Watchlist, WatchlistEntry, WatchHistory
+from .models import CustomUser, Video, Category, Watchlist, WatchlistEntry, WatchHistory, MediaInfo, TranscodeJob, Rendition, UploadSession
 
 admin.site.register(CustomUser, UserAdmin)
 admin.site.register(Video)
@@ -59,3 +59,27 @@ class WatchHistoryAdmin(admin.ModelAdmin):
         if request.user.is_superuser:
             return qs
         return qs.none()
+
+class RenditionInline(admin.TabularInline):
+    model = Rendition
+    extra = 0
+    readonly_fields = ['resolution', 'status', 'started_at', 'finished_at', 'output_size', 'exit_code', 'crf', 'max_bitrate']
+
+@admin.register(TranscodeJob)
+class TranscodeJobAdmin(admin.ModelAdmin):
+    list_display = ['video', 'status', 'progress', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['status']
+    search_fields = ['video__title']
+    readonly_fields = ['video', 'status', 'progress', 'error', 'created_at', 'started_at', 'finished_at']
+    inlines = [RenditionInline]
+
+@admin.register(MediaInfo)
+class MediaInfoAdmin(admin.ModelAdmin):
+    list_display = ['video', 'duration', 'width', 'height', 'video_codec', 'audio_codec', 'bitrate', 'frame_rate', 'keyframe_interval', 'complexity']
+    search_fields = ['video__title']
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['filename', 'user', 'offset', 'size', 'video', 'created_at', 'updated_at']
+    search_fields = ['filename', 'title']
+    readonly_fields = ['offset', 'video']
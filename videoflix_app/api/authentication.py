@@ -1,4 +1,9 @@
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
 
 
@@ -13,4 +18,45 @@ class CookieJWTAuthentication(JWTAuthentication):
         try:
             return super().authenticate(request)
         except exceptions.AuthenticationFailed:
-            return None
\ No newline at end of file
+            return None
+
+
+def get_segment_signature(user_id, movie_id, expires):
+    """ Returns the HMAC that ties a segment URL to a user, a video and an expiry time. """
+    return salted_hmac('videoflix.segment', f'{user_id}:{movie_id}:{expires}', algorithm='sha256').hexdigest()
+
+def get_segment_query(user_id, movie_id):
+    """ Returns the signed query string that is appended to the segment URIs of a playlist for the given user and video.
+    The URLs stay valid for at least HLS_SIGNED_URL_LIFETIME seconds. The expiry is rounded up to a bucket of half the lifetime,
+    so repeated playlist requests get the same URLs and players and caches can reuse the segments they already have. """
+    bucket = max(settings.HLS_SIGNED_URL_LIFETIME // 2, 1)
+    expires = -(-(int(time.time()) + settings.HLS_SIGNED_URL_LIFETIME) // bucket) * bucket
+    return urlencode({'user': user_id, 'expires': expires, 'token': get_segment_signature(user_id, movie_id, expires)})
+
+
+class SegmentUser:
+    """ The user of a signed segment URL. It only carries the user ID from the URL and is never loaded from the database. """
+    is_authenticated = True
+    is_active = True
+
+    def __init__(self, user_id):
+        self.id = self.pk = user_id
+
+
+class SignedSegmentAuthentication(BaseAuthentication):
+    def authenticate(self, request):
+        """ Authenticates a segment request by the signed query of its URL alone, without a database lookup.
+        Returns None if the URL is not signed, expired or has a wrong signature, so the request falls back to the cookie. """
+        user_id = request.query_params.get('user', '')
+        expires = request.query_params.get('expires', '')
+        token = request.query_params.get('token', '')
+        movie_id = request.parser_context['kwargs'].get('movie_id')
+        if not (user_id.isdigit() and expires.isdigit() and token) or int(expires) < time.time():
+            return None
+        if not constant_time_compare(token, get_segment_signature(user_id, movie_id, expires)):
+            return None
+        return (SegmentUser(int(user_id)), token)
+
+    def authenticate_header(self, request):
+        """ Answers unauthenticated requests with 401 like the cookie authentication that follows. """
+        return 'Bearer realm="api"'
@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django_redis.exceptions import ConnectionInterrupted
+
+MANIFEST_CACHE_KEY = 'manifest:{}:{}:{}'
+
+_local_manifests = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def get_manifest_version(stat):
+    """ Returns the version of a playlist file from its modification time and size. A rewritten playlist gets a new version,
+    so cached copies of the old one are never served again. """
+    return f'{stat.st_mtime_ns:x}-{stat.st_size:x}'
+
+def get_local_manifest(key, version):
+    """ Returns the playlist content from the in-process cache if it is cached in the given version, otherwise None. """
+    with _local_lock:
+        entry = _local_manifests.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        _local_manifests.move_to_end(key)
+        return entry[1]
+
+def set_local_manifest(key, version, content):
+    """ Stores a playlist in the in-process cache, replacing older versions of it and evicting the least recently used playlists
+    beyond HLS_MANIFEST_CACHE_SIZE. """
+    with _local_lock:
+        _local_manifests[key] = (version, content)
+        _local_manifests.move_to_end(key)
+        while len(_local_manifests) > settings.HLS_MANIFEST_CACHE_SIZE:
+            _local_manifests.popitem(last=False)
+
+def clear_local_manifests():
+    """ Empties the in-process playlist cache of this worker. """
+    with _local_lock:
+        _local_manifests.clear()
+
+def read_manifest(file_path, movie_id, resolution):
+    """ Reads a rendition playlist through a two-tier cache: a bounded LRU cache in every worker process and the shared Redis cache.
+    Only the modification time and size of the file are read from disk while a cached copy is current.
+    Args:
+        file_path (str): The path of the playlist.
+        movie_id (int): The ID of the video.
+        resolution (str): The rendition folder of the playlist, e.g. "480p" or "audio".
+    Returns:
+        tuple: The os.stat_result of the playlist and its content as a string.
+    Raises:
+        FileNotFoundError: If the playlist does not exist. """
+    stat = os.stat(file_path)
+    version = get_manifest_version(stat)
+    key = (movie_id, resolution)
+    content = get_local_manifest(key, version)
+    if content is not None:
+        return stat, content
+    cache_key = MANIFEST_CACHE_KEY.format(movie_id, resolution, version)
+    try:
+        content = cache.get(cache_key)
+    except ConnectionInterrupted as e:
+        print(f"Manifest cache not available: {e}")
+    if content is None:
+        with open(file_path) as manifest:
+            content = manifest.read()
+        try:
+            cache.set(cache_key, content, settings.HLS_MANIFEST_CACHE_TIMEOUT)
+        except ConnectionInterrupted as e:
+            print(f"Manifest cache not available: {e}")
+    set_local_manifest(key, version, content)
+    return stat, content
@@ -0,0 +1,59 @@
+import os
+import re
+import json
+import time
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .tasks import SEGMENT_INDEX_FILE
+
+MEDIA_NAME_PATTERN = re.compile(r'[\w-]+(\.[\w-]+)*')
+
+_local_indexes = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def is_valid_media_name(name):
+    """ Returns whether a rendition or segment name from a URL is a plain file name without path separators or '..'. """
+    return MEDIA_NAME_PATTERN.fullmatch(name) is not None
+
+def load_segment_index(index_path):
+    """ Reads a segment index written by write_segment_index.
+    Returns: - dict: (size, mtime, sha256) keyed by segment name, or None if the rendition has no index. """
+    try:
+        with open(index_path) as f:
+            return {name: tuple(entry) for name, entry in json.load(f).items()}
+    except FileNotFoundError:
+        return None
+
+def get_segment_index(folder):
+    """ Returns the segment index of a rendition folder from the in-process cache of up to HLS_SEGMENT_INDEX_CACHE_SIZE indexes.
+    A cached index is used without touching the disk for HLS_SEGMENT_INDEX_TTL seconds and then revalidated by the modification
+    time of the index file, so the index of a re-encoded rendition is picked up. Renditions without an index, e.g. while they
+    are still published progressively, are cached as None as well.
+    Args:
+        folder (str): The rendition folder.
+    Returns:
+        dict or None: (size, mtime, sha256) keyed by segment name, or None if the rendition has no index. """
+    now = time.monotonic()
+    with _local_lock:
+        entry = _local_indexes.get(folder)
+    if entry is not None and now - entry[0] < settings.HLS_SEGMENT_INDEX_TTL:
+        return entry[2]
+    index_path = os.path.join(folder, SEGMENT_INDEX_FILE)
+    try:
+        mtime = os.stat(index_path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    index = entry[2] if entry is not None and entry[1] == mtime else (load_segment_index(index_path) if mtime is not None else None)
+    with _local_lock:
+        _local_indexes[folder] = (now, mtime, index)
+        _local_indexes.move_to_end(folder)
+        while len(_local_indexes) > settings.HLS_SEGMENT_INDEX_CACHE_SIZE:
+            _local_indexes.popitem(last=False)
+    return index
+
+def clear_segment_indexes():
+    """ Empties the in-process segment index cache of this worker. """
+    with _local_lock:
+        _local_indexes.clear()
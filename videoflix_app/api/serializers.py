@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
-from videoflix_app.models import  CustomUser, Category, Video, Watchlist, WatchlistEntry, WatchHistory
+import os
+import re
+from videoflix_app.models import  CustomUser, Category, Video, MediaInfo, Watchlist, WatchlistEntry, WatchHistory, UploadSession
 from django.contrib.auth import get_user_model, authenticate
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
@@ -159,6 +161,12 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name']
     
 
+class MediaInfoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MediaInfo
+        fields = ['duration', 'width', 'height', 'video_codec', 'audio_codec', 'bitrate', 'frame_rate', 'keyframe_interval']
+        read_only_fields = fields
+
 class VideoSerializer(serializers.ModelSerializer):
     category = serializers.CharField(source='category.name', read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -168,9 +176,10 @@ class VideoSerializer(serializers.ModelSerializer):
     )
     video_base_url = serializers.SerializerMethodField()  
     thumbnail_url = serializers.SerializerMethodField()   
+    media_info = MediaInfoSerializer(read_only=True)
     class Meta:
         model = Video
-        fields =  ['id', 'title', 'description', 'duration', 'video_file', 'thumbnail','thumbnail_url', 'category','category_id', 'is_featured', 'created_at', 'user', 'video_base_url' ]
+        fields =  ['id', 'title', 'description', 'duration', 'video_file', 'thumbnail','thumbnail_url', 'category','category_id', 'is_featured', 'created_at', 'user', 'video_base_url', 'media_info' ]
         read_only_fields = ['thumbnail']  
                
     def get_video_base_url(self, obj):        
@@ -190,6 +199,36 @@ class VideoSerializer(serializers.ModelSerializer):
         if obj.thumbnail and request:
             return request.build_absolute_uri(obj.thumbnail.url)
         return None
+class UploadSessionSerializer(serializers.ModelSerializer):
+    category_id = serializers.PrimaryKeyRelatedField(
+        queryset=Category.objects.all(),
+        source='category',
+        write_only=True
+    )
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'offset', 'checksum', 'title', 'description', 'category_id', 'is_featured', 'video', 'created_at']
+        read_only_fields = ['offset', 'video']
+
+    def validate_filename(self, value):
+        """Strips any directory part from the filename so the upload can only be stored in the video folder."""
+        filename = os.path.basename(value.replace('\\', '/'))
+        if not filename:
+            raise serializers.ValidationError('Filename must not be empty.')
+        return filename
+
+    def validate_size(self, value):
+        """Rejects empty uploads."""
+        if value < 1:
+            raise serializers.ValidationError('Size must be at least 1 byte.')
+        return value
+
+    def validate_checksum(self, value):
+        """Checks that the checksum is a hex encoded SHA-256 digest."""
+        if value and not re.fullmatch(r'[0-9a-fA-F]{64}', value):
+            raise serializers.ValidationError('Checksum must be a hex encoded SHA-256 digest.')
+        return value.lower()
+
 class VideoListSerializer(serializers.ModelSerializer):
     category = serializers.CharField(source='category.name', read_only=True)
     thumbnail_url = serializers.SerializerMethodField()
@@ -5,16 +5,51 @@ from django.utils.encoding import force_bytes
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import get_template
 from django.conf import settings
+from django.db import connections
 from email.mime.image import MIMEImage
 import os
+import re
+import json
+import hashlib
+import math
 import subprocess
+import shutil
+import tempfile
+import traceback
 import ffmpeg
+import django_rq
+from PIL import Image
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rq.job import Job, JobStatus
+from rq.command import send_stop_job_command
+from rq.exceptions import NoSuchJobError, InvalidJobOperation
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from django.core.files import File
-from videoflix_app.models import Video
+from django.utils import timezone
+from videoflix_app.models import Video, MediaInfo, TranscodeJob, Rendition
 
 User = get_user_model()
 token_generator = PasswordResetTokenGenerator()
 
+# Resolutions of the HLS ladder that is encoded for every upload, each one maps to its own frame size.
+LADDER_RESOLUTIONS = [360, 480, 720, 1080]
+# Upper bitrate limits of the renditions in bits per second, per-title caps never exceed them.
+RENDITION_MAX_BITRATES = {'360': 1_000_000, '480': 2_500_000, '720': 5_000_000, '1080': 8_000_000}
+# CRF of the sample encodes that measure the complexity of a title.
+COMPLEXITY_REFERENCE_CRF = 23
+# Redis set with the ids of the background jobs of a video, per job id prefix and video id.
+VIDEO_JOBS_KEY = 'videoflix:{}:video:{}:jobs'
+# Job states in which a job with the same id is not enqueued again.
+ACTIVE_JOB_STATUSES = (JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED, JobStatus.SCHEDULED)
+# Name of the per-rendition index of valid segment names, sizes, modification times and checksums.
+SEGMENT_INDEX_FILE = 'segments.json'
+
+class TranscodeError(ffmpeg.Error):
+    """Raised when an ffmpeg run exits with a non-zero status. Keeps the exit code next to the captured stderr."""
+    def __init__(self, exit_code, stderr):
+        super().__init__('ffmpeg', b'', stderr.encode())
+        self.exit_code = exit_code
+
 def build_activation_email_content(user):
     """  Returns a rendered HTML email template to be sent to a given user containing an activation link. 
     The link is composed of the user's base64 encoded id and a token generated by the default token generator. 
@@ -104,22 +139,37 @@ def generate_thumbnail(video_id):
     filename_base = os.path.splitext(os.path.basename(video_path))[0]
     thumbnail_path = os.path.join(os.path.dirname(video_path), f'{filename_base}_thumb.jpg')
     try:
-        (ffmpeg
-        .input(video_path, ss='00:00:01')
-        .output(thumbnail_path, vframes=1)
-        .run()   )
+        extract_thumbnail(video_path, thumbnail_path, get_media_info(video).duration)
         print(f"Thumbnail generated for video {video.id} at {thumbnail_path}")
         return thumbnail_path
     except Exception as e:
         print(f"Failed to generate thumbnail for video {video.id}: {e}")
         return None
     
+def extract_thumbnail(video_path, thumbnail_path, duration):
+    """Write the frame after one second (or from the middle of shorter videos) as the thumbnail image.
+    Args:
+        video_path (str): The path to the source video file.
+        thumbnail_path (str): The path of the image to write.
+        duration (float): The duration of the video in seconds.
+    Raises:
+        ffmpeg.Error: If ffmpeg exits with an error."""
+
+    (ffmpeg
+    .input(video_path, ss=min(1, duration / 2))
+    .output(thumbnail_path, vframes=1)
+    .run()   )
+
 def generate_and_save_thumbnail_task(video_id):
     """Generate a thumbnail for the video with the given id and save it to the video object.    
     Args:
         video_id (int): The ID of the video for which to generate a thumbnail. """
         
-    video = Video.objects.get(id=video_id)
+    try:
+        video = Video.objects.get(id=video_id)
+    except Video.DoesNotExist:
+        print(f"Video with id={video_id} does not exist")
+        return
     thumbnail_path = generate_thumbnail(video_id)
     if thumbnail_path:
         save_thumbnail_to_video(video, thumbnail_path)
@@ -128,28 +178,154 @@ def save_thumbnail_to_video(instance, thumbnail_path):
     """Save the generated thumbnail to the Video object.    
     Args:
         instance (Video): The video object to which to save the thumbnail.
-        thumbnail_path (str): The path to the generated thumbnail file.  """
+        thumbnail_path (str): The path to the generated thumbnail file.  
+    Duplicate uploads of the video reuse the same thumbnail. If the video was deleted in the meantime, the thumbnail is
+    removed again instead of saving the video, which would insert the deleted row again.  """
     with open(thumbnail_path, 'rb') as f:
-        instance.thumbnail.save(os.path.basename(thumbnail_path), File(f), save=True)
+        instance.thumbnail.save(os.path.basename(thumbnail_path), File(f), save=False)
+    if not Video.objects.filter(id=instance.id).update(thumbnail=instance.thumbnail.name):
+        print(f"Video {instance.id} was deleted, removing its thumbnail")
+        instance.thumbnail.delete(save=False)
+        os.remove(thumbnail_path)
+        return
+    Video.objects.filter(source_video=instance).update(thumbnail=instance.thumbnail.name)
         
-def convert_resolution(source, width):
-    """Convert the resolution of a video file to the specified width.    
-    The function uses ffmpeg to scale the video to the given width while maintaining the aspect ratio.
+def format_vtt_timestamp(seconds):
+    """Format a position in seconds as a WebVTT timestamp, e.g. '00:01:05.500'."""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    return f'{hours:02d}:{minutes:02d}:{milliseconds / 1000:06.3f}'
+
+def generate_trickplay(video_path, output_folder, duration, interval=10, width=160, columns=10, rows=10, image_format='jpeg'):
+    """Generate trickplay sprite sheets and a WebVTT index for scrub previews.
+    Every 'interval' seconds ffmpeg seeks in the input (-ss before -i) and decodes a single frame, so only the frames around
+    the sampled positions are decoded instead of the whole source. Pillow tiles the frames into sprite sheets
+    of 'columns' x 'rows' thumbnails and 'thumbnails.vtt' maps every interval to its tile with a '#xywh=' fragment.
+    Args:
+        video_path (str): The path to the source video file.
+        output_folder (str): The folder in which the sprite sheets and the WebVTT file are written.
+        duration (float): The duration of the video in seconds.
+        interval (int): The distance between two sampled frames in seconds.
+        width (int): The width of a thumbnail in pixels, the height keeps the aspect ratio.
+        columns (int): The number of thumbnails per row of a sprite sheet.
+        rows (int): The number of rows of a sprite sheet.
+        image_format (str): "jpeg" or "webp".
+    Returns:
+        str: The path to the WebVTT file.
+    Raises:
+        TranscodeError: If ffmpeg exits with an error or no frame was sampled.  """
+
+    os.makedirs(output_folder, exist_ok=True)
+    extension = 'webp' if image_format == 'webp' else 'jpg'
+    with tempfile.TemporaryDirectory(dir=output_folder) as frame_folder:
+        for index in range(max(math.ceil(duration / interval), 1)):
+            frame_path = os.path.join(frame_folder, f'frame_{index:05d}.png')
+            stream = (ffmpeg
+                .input(video_path, ss=index * interval)
+                .video
+                .filter('scale', width, -2)
+                .output(frame_path, vframes=1))
+            exit_code, stderr = run_ffmpeg(stream)
+            if exit_code or not os.path.exists(frame_path):
+                break
+        frames = sorted(os.listdir(frame_folder))
+        if exit_code or not frames:
+            print(f"Error during generating trickplay: {stderr}")
+            raise TranscodeError(exit_code or 1, stderr)
+        cues = []
+        per_sheet = columns * rows
+        for sheet_index in range(0, len(frames), per_sheet):
+            sheet_frames = frames[sheet_index:sheet_index + per_sheet]
+            sheet_name = f'sprite_{sheet_index // per_sheet:03d}.{extension}'
+            sheet = None
+            for tile_index, frame_name in enumerate(sheet_frames):
+                with Image.open(os.path.join(frame_folder, frame_name)) as frame:
+                    if sheet is None:
+                        tile_width, tile_height = frame.size
+                        sheet_rows = math.ceil(len(sheet_frames) / columns)
+                        sheet = Image.new('RGB', (tile_width * min(columns, len(sheet_frames)), tile_height * sheet_rows))
+                    x, y = (tile_index % columns) * tile_width, (tile_index // columns) * tile_height
+                    sheet.paste(frame.convert('RGB'), (x, y))
+                start = (sheet_index + tile_index) * interval
+                cues.append((start, min(start + interval, duration), f'{sheet_name}#xywh={x},{y},{tile_width},{tile_height}'))
+            sheet.save(os.path.join(output_folder, sheet_name), 'WEBP' if extension == 'webp' else 'JPEG', quality=75)
+    vtt_path = os.path.join(output_folder, 'thumbnails.vtt')
+    with open(vtt_path, 'w') as f:
+        f.write('WEBVTT\n')
+        for start, end, uri in cues:
+            if start < end:
+                f.write(f'\n{format_vtt_timestamp(start)} --> {format_vtt_timestamp(end)}\n{uri}\n')
+    return vtt_path
+
+def generate_trickplay_task(video_id):
+    """Generate the trickplay sprite sheets of a video into 'videos/<id>/trickplay', next to its HLS renditions.
+    Runs on the 'transcode' queue before the HLS ladder of the video.
+    Args:
+        video_id (int): The ID of the video.
+    Returns:
+        str or None: The path to the WebVTT file, or None if generation failed.  """
+
+    try:
+        video = Video.objects.get(id=video_id)
+    except Video.DoesNotExist:
+        print(f"Video with id={video_id} does not exist")
+        return None
+    output_folder = os.path.join(settings.MEDIA_ROOT, 'videos', str(video.id), 'trickplay')
+    try:
+        duration = get_media_info(video).duration
+        vtt_path = generate_trickplay(video.video_file.path, output_folder, duration, settings.TRICKPLAY_INTERVAL, settings.TRICKPLAY_WIDTH,
+                                      settings.TRICKPLAY_COLUMNS, settings.TRICKPLAY_ROWS, settings.TRICKPLAY_FORMAT)
+    except TranscodeError as e:
+        print(f"Failed to generate trickplay for video {video.id}: {e.stderr.decode()[-500:]}")
+        return None
+    if remove_outputs_of_deleted_video(video.id):
+        return None
+    return vtt_path
+
+def get_progressive_path(source, resolution):
+    """Return the path of the progressive MP4 fallback of a source file, e.g. 'movie_480p.mp4' for 'movie.mov'."""
+    return f'{os.path.splitext(source)[0]}_{resolution}p.mp4'
+
+def convert_resolution(source, resolution):
+    """Write a progressive MP4 fallback of a video file in the specified resolution.    
+    The function uses ffmpeg to scale the video to the height of the resolution while maintaining the aspect ratio.
     The output is saved as a new file with the resolution appended to the original filename.    
     Args:
         source (str): The path to the source video file.
-        width (int): The target width for scaling the video.   """
+        resolution (str): The resolution identifier (e.g. "480", "720", "1080") to scale the video to.
+    Returns:
+        str: The path to the progressive MP4 file.
+    Raises:
+        TranscodeError: If ffmpeg exits with an error.   """
 
-    target = source.replace('.mp4', f'_{width}p.mp4')
-    cmd = 'ffmpeg -i {} -vf "scale={}:-1" -c:v libx264 -crf 23 -c:a copy {}'.format(source, width, target)
-    subprocess.run(cmd)
+    target = get_progressive_path(source, resolution)
+    _, height = get_resolution_size(str(resolution))
+    stream = (ffmpeg
+        .input(source)
+        .output(
+            target,
+            vf=f'scale=-2:{height}',
+            vcodec='libx264',
+            pix_fmt='yuv420p',
+            crf=23,
+            acodec='aac',
+            audio_bitrate='128k',
+            movflags='+faststart'  ))
+    exit_code, stderr = run_ffmpeg(stream)
+    if exit_code:
+        print(f"Error during converting resolution: {stderr}")
+        raise TranscodeError(exit_code, stderr)
+    return target
 
 def get_video_duration(video_path):   
     """Calculate and return the duration of a video file in seconds.    
     Args:
         video_path (str): The file path to the video whose duration is to be determined.
     Returns:
-        float: The duration of the video in seconds.   """
+        float: The duration of the video in seconds.
+    Raises:
+        TranscodeError: If ffprobe cannot read the file.   """
 
     result = subprocess.run(
         [   'ffprobe',
@@ -161,8 +337,76 @@ def get_video_duration(video_path):
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE
     )
+    if result.returncode or not result.stdout.strip():
+        raise TranscodeError(result.returncode or 1, result.stderr.decode(errors='replace'))
     return float(result.stdout.strip())
 
+def probe_media(video_path):
+    """Read the stream metadata of a video file with a single ffprobe run.
+    The keyframe interval is estimated from the video packets of the first 30 seconds.
+    Args:
+        video_path (str): The file path to the video to inspect.
+    Returns:
+        dict: duration, width, height, video_codec, audio_codec, bitrate, frame_rate and keyframe_interval.
+    Raises:
+        TranscodeError: If ffprobe cannot read the file or finds no video stream.   """
+
+    result = subprocess.run(
+        [   'ffprobe',
+            '-v', 'error',
+            '-show_entries', 'format=duration,bit_rate:stream=index,codec_type,codec_name,width,height,avg_frame_rate:packet=stream_index,pts_time,flags',
+            '-read_intervals', '%+30',
+            '-of', 'json',
+            video_path
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    if result.returncode:
+        raise TranscodeError(result.returncode, result.stderr.decode(errors='replace'))
+    data = json.loads(result.stdout or b'{}')
+    streams = data.get('streams', [])
+    video_stream = next((stream for stream in streams if stream.get('codec_type') == 'video'), None)
+    audio_stream = next((stream for stream in streams if stream.get('codec_type') == 'audio'), None)
+    if not video_stream or 'duration' not in data.get('format', {}):
+        raise TranscodeError(1, f"No video stream found in {video_path}")
+    numerator, _, denominator = video_stream.get('avg_frame_rate', '0/0').partition('/')
+    keyframes = [float(packet['pts_time']) for packet in data.get('packets', [])
+                 if packet.get('stream_index') == video_stream['index'] and 'K' in packet.get('flags', '') and 'pts_time' in packet]
+    return {
+        'duration': float(data['format']['duration']),
+        'width': video_stream.get('width', 0),
+        'height': video_stream.get('height', 0),
+        'video_codec': video_stream.get('codec_name', ''),
+        'audio_codec': audio_stream.get('codec_name', '') if audio_stream else '',
+        'bitrate': int(data['format']['bit_rate']) if data['format'].get('bit_rate', '').isdigit() else None,
+        'frame_rate': float(numerator) / float(denominator) if denominator and float(denominator) else None,
+        'keyframe_interval': (keyframes[-1] - keyframes[0]) / (len(keyframes) - 1) if len(keyframes) > 1 else None,
+    }
+
+def get_media_info(video):
+    """Return the stored MediaInfo of a video, probing the source file only if no media info is stored yet.
+    If another task stored the media info while the source was probed, the stored one is returned.
+    Duplicate uploads that were linked before the probe finished get a copy of the media info and the probed duration.
+    Args:
+        video (Video): The video whose media info is needed.
+    Returns:
+        MediaInfo: The stored media info.
+    Raises:
+        TranscodeError: If the source file cannot be probed.   """
+
+    info = MediaInfo.objects.filter(video=video).first()
+    if info is not None:
+        return info
+    metadata = probe_media(video.video_file.path)
+    info, created = MediaInfo.objects.get_or_create(video=video, defaults=metadata)
+    if created:
+        duplicate_ids = list(Video.objects.filter(source_video_id=video.id, media_info__isnull=True).values_list('id', flat=True))
+        for duplicate_id in duplicate_ids:
+            MediaInfo.objects.get_or_create(video_id=duplicate_id, defaults=metadata)
+        Video.objects.filter(id__in=[video.id, *duplicate_ids]).update(duration=math.ceil(info.duration / 60))
+    return info
+
 def get_resolution_size(resolution):
     """Return the width and height for a given resolution identifier.
     Args:
@@ -179,40 +423,1053 @@ def get_resolution_size(resolution):
     else:
         return 640, 360
 
-def generate_hls(video_path, output_folder, resolution="480"):
-    """Generate an HLS playlist and its segments for the given video file.
+def analyze_complexity(video_path, duration, frame_rate=None, samples=3, sample_seconds=2):
+    """Measure the encoding complexity of a video with short sample encodes spread over its duration.
+    The samples are encoded at 640x360 with the reference CRF, the complexity is the resulting number of bits per pixel.
+    Static content like talking heads ends far below 0.05, high-motion or grainy content above 0.2.
+    Args:
+        video_path (str): The path to the source video file.
+        duration (float): The duration of the video in seconds.
+        frame_rate (float): The frame rate of the video, 25 if unknown.
+        samples (int): The number of sample encodes, overlapping samples of short videos are encoded once.
+        sample_seconds (float): The length of every sample in seconds.
+    Returns:
+        float: The bits per pixel of the sample encodes.
+    Raises:
+        TranscodeError: If ffmpeg exits with an error."""
+
+    sample_seconds = min(sample_seconds, duration)
+    starts = sorted({max(0, duration * (index + 1) / (samples + 1) - sample_seconds / 2) for index in range(samples)})
+    with tempfile.TemporaryDirectory() as folder:
+        outputs = [ffmpeg.input(video_path, ss=start, t=sample_seconds).video.filter('scale', 640, 360).output(
+            os.path.join(folder, f'sample_{index}.mp4'),
+            vcodec='libx264',
+            pix_fmt='yuv420p',
+            preset='veryfast',
+            crf=COMPLEXITY_REFERENCE_CRF  ) for index, start in enumerate(starts)]
+        exit_code, stderr = run_ffmpeg(ffmpeg.merge_outputs(*outputs))
+        if exit_code:
+            print(f"Error during the complexity analysis: {stderr}")
+            raise TranscodeError(exit_code, stderr)
+        bits = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder)) * 8
+    return bits / (640 * 360 * (frame_rate or 25) * sample_seconds * len(starts))
+
+def get_per_title_encoding(complexity, resolutions, frame_rate=None):
+    """Pick the CRF and the bitrate cap of every rendition from the complexity of a title.
+    The CRF moves from HLS_CRF_MAX for simple content (0.02 bits per pixel and less) to HLS_CRF_MIN for complex content
+    (0.2 and more) on a logarithmic scale. The cap is 1.5 times the bitrate the samples needed at that CRF, scaled to
+    the size of the rendition, and stays between a quarter of and the full RENDITION_MAX_BITRATES limit.
+    Args:
+        complexity (float): The bits per pixel measured by analyze_complexity.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to encode.
+        frame_rate (float): The frame rate of the video, 25 if unknown.
+    Returns:
+        dict: {'crf', 'maxrate', 'bufsize'} of every rendition, keyed by resolution identifier.  """
+
+    share = (math.log10(max(complexity, 0.02)) - math.log10(0.02)) / (math.log10(0.2) - math.log10(0.02))
+    crf = round(settings.HLS_CRF_MAX - min(share, 1) * (settings.HLS_CRF_MAX - settings.HLS_CRF_MIN))
+    bits_per_pixel = complexity * 2 ** ((COMPLEXITY_REFERENCE_CRF - crf) / 6)
+    encoding = {}
+    for resolution in resolutions:
+        width, height = get_resolution_size(str(resolution))
+        limit = RENDITION_MAX_BITRATES.get(str(resolution), RENDITION_MAX_BITRATES['360'])
+        needed = bits_per_pixel * 640 * 360 * (width * height / (640 * 360)) ** 0.75 * (frame_rate or 25)
+        maxrate = int(min(max(needed * 1.5, limit / 4), limit))
+        encoding[str(resolution)] = {'crf': crf, 'maxrate': maxrate, 'bufsize': maxrate * 2}
+    return encoding
+
+def get_video_encoding_options(encoding, resolution, hls_time=None):
+    """Return the libx264 rate control options of a rendition.
+    With 'hls_time' a keyframe is forced at every segment boundary, so the segments of all renditions are aligned.
+    Args:
+        encoding (dict): The per-title encoding from get_per_title_encoding, or None for the fixed CRF 20.
+        resolution (str): The resolution identifier of the rendition.
+        hls_time (int): The target segment length in seconds, or None to leave the keyframes to the encoder.
+    Returns:
+        dict: The ffmpeg output options.  """
+
+    options = {'preset': 'fast', 'crf': 20}
+    if encoding and str(resolution) in encoding:
+        options.update(encoding[str(resolution)])
+    if hls_time:
+        options['force_key_frames'] = f'expr:gte(t,n_forced*{hls_time})'
+    return options
+
+def run_ffmpeg(stream, duration=None, on_progress=None):
+    """Run an ffmpeg-python stream and wait for it to finish.
+    ffmpeg reports its progress on stdout, stderr is buffered in a temporary file so a chatty encode cannot block the pipe.
+    Args:
+        stream: The ffmpeg-python output stream to run.
+        duration (float): The duration of the input in seconds, needed to report progress.
+        on_progress (callable): Optional callback that receives the encoded share of the input (0.0 - 1.0).
+    Returns:
+        tuple: (exit_code, stderr) of the ffmpeg process.  """
+
+    args = stream.global_args('-progress', 'pipe:1', '-nostats').overwrite_output().compile()
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=stderr)
+        for line in process.stdout:
+            key, _, value = line.decode().strip().partition('=')
+            if key == 'out_time_us' and value.isdigit() and duration and on_progress:
+                on_progress(min(int(value) / 1000000 / duration, 1.0))
+        process.wait()
+        stderr.seek(0)
+        return process.returncode, stderr.read().decode(errors='replace')
+
+def get_hls_segment_options(output_folder, segment_type="mpegts", single_file=False):
+    """Return the ffmpeg HLS muxer options for MPEG-TS segments or for fragmented-MP4 (CMAF) segments.
+    With 'single_file' every segment is appended to one media file per rendition ('media.ts' or 'media.mp4')
+    and the playlist addresses the segments with EXT-X-BYTERANGE, so a rendition needs two inodes instead of hundreds.
+    Args:
+        output_folder (str): The folder of the rendition.
+        segment_type (str): "mpegts" for 'segment_%03d.ts' or "fmp4" for 'init.mp4' plus 'segment_%03d.m4s'.
+        single_file (bool): Whether to write one byte-range addressed media file instead of one file per segment.
+    Returns:
+        dict: The keyword arguments for the ffmpeg-python output.  """
+
+    if single_file:
+        media_name = 'media.mp4' if segment_type == 'fmp4' else 'media.ts'
+        options = {'hls_flags': 'single_file', 'hls_segment_filename': os.path.join(output_folder, media_name)}
+        if segment_type == 'fmp4':
+            options['hls_segment_type'] = 'fmp4'
+        return options
+    if segment_type == 'fmp4':
+        return {
+            'hls_segment_type': 'fmp4',
+            'hls_fmp4_init_filename': 'init.mp4',
+            'hls_segment_filename': os.path.join(output_folder, 'segment_%03d.m4s'),
+        }
+    return {'hls_segment_filename': os.path.join(output_folder, 'segment_%03d.ts')}
+
+def generate_hls(video_path, output_folder, resolution="480", segment_type="mpegts", single_file=False):
+    """Generate an HLS playlist, its segments and the segment index for the given video file.
     Args:
         video_path (str): The path to the video file to be converted.
         output_folder (str): The folder in which to save the generated HLS playlist and segments.
         resolution (str): The resolution identifier (e.g., "480", "720", "1080") to scale the video to.
+        segment_type (str): "mpegts" for .ts segments or "fmp4" for CMAF segments with an init.mp4.
+        single_file (bool): Whether to write one byte-range addressed media file instead of one file per segment.
     Returns:
         str: The path to the generated HLS playlist file.
     Raises:
-        ffmpeg.Error: If the video file does not exist or if an error occurs during the conversion process."""
+        TranscodeError: If the video file does not exist or if ffmpeg exits with an error."""
     
     os.makedirs(output_folder, exist_ok=True)
     width, height = get_resolution_size(resolution)  
     duration = get_video_duration(video_path)
     hls_time = 4 if duration <= 10 else 6  
     output_path = os.path.join(output_folder, 'index.m3u8')
+    stream = (ffmpeg
+        .input(video_path)            
+        .output(
+            output_path,
+            vf=f'scale={width}:{height}',
+            format='hls',
+            hls_time=hls_time,
+            hls_playlist_type='vod',
+            **get_hls_segment_options(output_folder, segment_type, single_file),
+            vcodec='libx264',
+            acodec='aac',
+            audio_bitrate='128k',
+            **get_video_encoding_options(None, resolution, hls_time)
+        ))
+    exit_code, stderr = run_ffmpeg(stream)
+    if exit_code:
+        print(f"Error during generating HLS: {stderr}")
+        raise TranscodeError(exit_code, stderr)
+    write_segment_index(output_folder)
+    return output_path
+
+def generate_hls_ladder(video_path, output_root, resolutions, on_progress=None, duration=None, has_audio=None, segment_type="mpegts", playlist_type="vod", single_file=False, separate_audio=False, encoding=None):
+    """Generate HLS playlists for several resolutions in a single ffmpeg run.
+    The source is decoded once, split into one branch per resolution and scaled,
+    and every rendition is written to its own '<resolution>p' subfolder.
+    With the "event" playlist type the playlists grow while the segments are written and the master playlist is
+    published as soon as every rendition has its first segment, so playback can start before the encode has finished.
+    The playlists are switched to VOD at the end, then every rendition gets its segment index (write_segment_index).
+    Args:
+        video_path (str): The path to the video file to be converted.
+        output_root (str): The folder in which the '<resolution>p' subfolders are created.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to encode.
+        on_progress (callable): Optional callback that receives the encoded share of the video (0.0 - 1.0).
+        duration (float): The duration of the video in seconds, probed with ffprobe if not given.
+        has_audio (bool): Whether the source has an audio track, probed with ffprobe if not given.
+        segment_type (str): "mpegts" for .ts segments or "fmp4" for CMAF segments with an init.mp4.
+        playlist_type (str): "vod" to publish the playlists when the encode has finished or "event" to publish them while encoding.
+        single_file (bool): Whether to write one byte-range addressed media file per rendition instead of one file per segment.
+        separate_audio (bool): Whether to encode the audio once into its own 'audio' rendition instead of into every video rendition.
+        encoding (dict): The per-title CRF and bitrate caps from get_per_title_encoding, or None for the fixed CRF 20.
+    Returns:
+        dict: The paths to the generated HLS playlists, keyed by resolution identifier.
+    Raises:
+        TranscodeError: If ffmpeg exits with an error."""
+
+    duration = duration or get_video_duration(video_path)
+    if has_audio is None:
+        has_audio = has_audio_stream(video_path)
+    hls_time = 4 if duration <= 10 else 6
+    separate_audio = separate_audio and has_audio
+    source = ffmpeg.input(video_path)
+    branches = source.video.filter_multi_output('split', len(resolutions))
+    outputs, playlists = [], {}
+    for index, resolution in enumerate(resolutions):
+        output_folder = os.path.join(output_root, f'{resolution}p')
+        os.makedirs(output_folder, exist_ok=True)
+        width, height = get_resolution_size(str(resolution))
+        output_path = os.path.join(output_folder, 'index.m3u8')
+        streams = [branches[index].filter('scale', width, height)] + ([] if separate_audio else [source['a?']])
+        outputs.append(ffmpeg.output(
+            *streams,
+            output_path,
+            format='hls',
+            hls_time=hls_time,
+            hls_playlist_type=playlist_type,
+            **get_hls_segment_options(output_folder, segment_type, single_file),
+            vcodec='libx264',
+            pix_fmt='yuv420p',
+            acodec='aac',
+            audio_bitrate='128k',
+            **get_video_encoding_options(encoding, resolution, hls_time)  ))
+        playlists[str(resolution)] = output_path
+    published_playlists = list(playlists.values())
+    if separate_audio:
+        audio_output, audio_playlist = get_audio_hls_output(source['a'], output_root, hls_time, segment_type, single_file, playlist_type)
+        outputs.append(audio_output)
+        published_playlists.append(audio_playlist)
+    published = playlist_type != 'event'
+
+    def publish_progress(share):
+        nonlocal published
+        if not published and all(os.path.exists(playlist) for playlist in published_playlists):
+            published = write_master_playlist(output_root, resolutions, has_audio, segment_type, single_file) is not None
+        if on_progress:
+            on_progress(share)
+
+    exit_code, stderr = run_ffmpeg(ffmpeg.merge_outputs(*outputs), duration, publish_progress)
+    if exit_code:
+        print(f"Error during generating HLS ladder: {stderr}")
+        raise TranscodeError(exit_code, stderr)
+    if playlist_type == 'event':
+        for playlist in published_playlists:
+            set_playlist_type(playlist, 'VOD')
+    write_segment_indexes(output_root, resolutions)
+    write_master_playlist(output_root, resolutions, has_audio, segment_type, single_file)
+    return playlists
+
+def get_audio_hls_output(audio_stream, output_root, hls_time, segment_type="mpegts", single_file=False, playlist_type="vod"):
+    """Build the ffmpeg-python output of the shared 'audio' rendition that every video rendition references.
+    The audio is encoded once as AAC into 'audio/index.m3u8' instead of once per video rendition.
+    Args:
+        audio_stream: The ffmpeg-python audio stream of the source.
+        output_root (str): The folder in which the 'audio' subfolder is created.
+        hls_time (int): The target segment length in seconds.
+        segment_type (str): "mpegts" for .ts segments or "fmp4" for CMAF segments with an init.mp4.
+        single_file (bool): Whether to write one byte-range addressed media file instead of one file per segment.
+        playlist_type (str): "vod" or "event", see generate_hls_ladder.
+    Returns:
+        tuple: (output, playlist_path) of the audio rendition.  """
+
+    output_folder = os.path.join(output_root, 'audio')
+    os.makedirs(output_folder, exist_ok=True)
+    playlist_path = os.path.join(output_folder, 'index.m3u8')
+    output = ffmpeg.output(
+        audio_stream,
+        playlist_path,
+        format='hls',
+        hls_time=hls_time,
+        hls_playlist_type=playlist_type,
+        **get_hls_segment_options(output_folder, segment_type, single_file),
+        acodec='aac',
+        audio_bitrate='128k'  )
+    return output, playlist_path
+
+def set_playlist_type(playlist_path, playlist_type):
+    """Replace the EXT-X-PLAYLIST-TYPE of a finished media playlist, e.g. to switch a grown EVENT playlist to VOD.
+    The playlist is replaced atomically, so a player never reads a half-written file.
+    Args:
+        playlist_path (str): The path to the media playlist.
+        playlist_type (str): The new playlist type, "EVENT" or "VOD".  """
+
+    with open(playlist_path) as f:
+        content = f.read()
+    content = re.sub(r'^#EXT-X-PLAYLIST-TYPE:\w+$', f'#EXT-X-PLAYLIST-TYPE:{playlist_type}', content, flags=re.MULTILINE)
+    temp_path = playlist_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.replace(temp_path, playlist_path)
+
+def split_video_at_keyframes(video_path, chunk_folder, chunk_seconds):
+    """Split the video stream of a file into chunks without re-encoding.
+    The chunks are cut at the first keyframe after every 'chunk_seconds', so each chunk can be encoded on its own.
+    Args:
+        video_path (str): The path to the source video file.
+        chunk_folder (str): The folder in which the chunks are written.
+        chunk_seconds (int): The target length of a chunk in seconds.
+    Returns:
+        list: The paths to the chunk files in playback order.
+    Raises:
+        TranscodeError: If ffmpeg exits with an error."""
+
+    os.makedirs(chunk_folder, exist_ok=True)
+    stream = (ffmpeg
+        .input(video_path)['v:0']
+        .output(
+            os.path.join(chunk_folder, 'chunk_%04d.mp4'),
+            c='copy',
+            f='segment',
+            segment_time=chunk_seconds,
+            reset_timestamps=1  ))
+    exit_code, stderr = run_ffmpeg(stream)
+    if exit_code:
+        raise TranscodeError(exit_code, stderr)
+    return sorted(os.path.join(chunk_folder, name) for name in os.listdir(chunk_folder) if name.startswith('chunk_'))
+
+def encode_chunk(chunk_path, output_folder, resolutions, encoding=None, hls_time=None):
+    """Encode one video chunk into every resolution of the ladder. Runs in a worker process of the chunk pool.
+    Args:
+        chunk_path (str): The path to the chunk to encode.
+        output_folder (str): The folder in which the '<resolution>p' subfolders with the encoded chunks are created.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to encode.
+        encoding (dict): The per-title CRF and bitrate caps from get_per_title_encoding, or None for the fixed CRF 20.
+        hls_time (int): The target segment length in seconds, a keyframe is forced at every segment boundary.
+    Returns:
+        tuple: (exit_code, stderr) of the ffmpeg process.  """
+
+    source = ffmpeg.input(chunk_path)
+    branches = source.video.filter_multi_output('split', len(resolutions))
+    outputs = []
+    for index, resolution in enumerate(resolutions):
+        folder = os.path.join(output_folder, f'{resolution}p')
+        os.makedirs(folder, exist_ok=True)
+        width, height = get_resolution_size(str(resolution))
+        outputs.append(ffmpeg.output(
+            branches[index].filter('scale', width, height),
+            os.path.join(folder, os.path.basename(chunk_path)),
+            vcodec='libx264',
+            pix_fmt='yuv420p',
+            **get_video_encoding_options(encoding, resolution, hls_time)  ))
+    return run_ffmpeg(ffmpeg.merge_outputs(*outputs))
+
+def generate_hls_chunked(video_path, output_root, resolutions, chunk_seconds=60, workers=None, on_progress=None, duration=None, has_audio=None, segment_type="mpegts", single_file=False, separate_audio=False, encoding=None):
+    """Generate the HLS ladder of a long video by encoding keyframe-aligned chunks in parallel.
+    The video stream is split at keyframes, the chunks are encoded in a process pool, and the encoded
+    chunks of every resolution are concatenated without re-encoding into the HLS segment sequence.
+    The audio track is encoded from the source during the concatenation, so there are no gaps at chunk borders.
+    Every rendition gets its segment index (write_segment_index) at the end.
+    Args:
+        video_path (str): The path to the video file to be converted.
+        output_root (str): The folder in which the '<resolution>p' subfolders are created.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to encode.
+        chunk_seconds (int): The target length of a chunk in seconds.
+        workers (int): The number of encoder processes, defaults to the number of CPU cores.
+        on_progress (callable): Optional callback that receives the encoded share of the video (0.0 - 1.0).
+        duration (float): The duration of the video in seconds, probed with ffprobe if not given.
+        has_audio (bool): Whether the source has an audio track, probed with ffprobe if not given.
+        segment_type (str): "mpegts" for .ts segments or "fmp4" for CMAF segments with an init.mp4.
+        single_file (bool): Whether to write one byte-range addressed media file per rendition instead of one file per segment.
+        separate_audio (bool): Whether to encode the audio once into its own 'audio' rendition instead of into every video rendition.
+        encoding (dict): The per-title CRF and bitrate caps from get_per_title_encoding, or None for the fixed CRF 20.
+    Returns:
+        dict: The paths to the generated HLS playlists, keyed by resolution identifier.
+    Raises:
+        TranscodeError: If ffmpeg exits with an error."""
+
+    duration = duration or get_video_duration(video_path)
+    if has_audio is None:
+        has_audio = has_audio_stream(video_path)
+    separate_audio = separate_audio and has_audio
+    hls_time = 4 if duration <= 10 else 6
+    os.makedirs(output_root, exist_ok=True)
+    work_folder = tempfile.mkdtemp(prefix='chunks_', dir=output_root)
     try:
-        (ffmpeg
-            .input(video_path)            
-            .output(
+        chunks = split_video_at_keyframes(video_path, os.path.join(work_folder, 'source'), chunk_seconds)
+        encoded_folder = os.path.join(work_folder, 'encoded')
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            futures = [pool.submit(encode_chunk, chunk, encoded_folder, resolutions, encoding, hls_time) for chunk in chunks]
+            for finished, future in enumerate(as_completed(futures), start=1):
+                exit_code, stderr = future.result()
+                if exit_code:
+                    for pending in futures:
+                        pending.cancel()
+                    print(f"Error during encoding HLS chunk: {stderr}")
+                    raise TranscodeError(exit_code, stderr)
+                if on_progress:
+                    on_progress(finished / len(chunks) * 0.9)
+        playlists = {}
+        for resolution in resolutions:
+            output_folder = os.path.join(output_root, f'{resolution}p')
+            os.makedirs(output_folder, exist_ok=True)
+            concat_list = os.path.join(work_folder, f'{resolution}p.txt')
+            with open(concat_list, 'w') as f:
+                for chunk in chunks:
+                    f.write(f"file '{os.path.join(encoded_folder, f'{resolution}p', os.path.basename(chunk))}'\n")
+            output_path = os.path.join(output_folder, 'index.m3u8')
+            streams = [ffmpeg.input(concat_list, f='concat', safe=0)['v']] + ([] if separate_audio else [ffmpeg.input(video_path)['a?']])
+            stream = ffmpeg.output(
+                *streams,
                 output_path,
-                vf=f'scale={width}:{height}',
                 format='hls',
                 hls_time=hls_time,
                 hls_playlist_type='vod',
-                hls_segment_filename=os.path.join(output_folder, 'segment_%03d.ts'),
-                vcodec='libx264',
+                **get_hls_segment_options(output_folder, segment_type, single_file),
+                vcodec='copy',
                 acodec='aac',
-                audio_bitrate='128k',
-                preset='fast',
-                crf=20            
-            )
-            .overwrite_output()
-            .run(capture_stdout=True, capture_stderr=True)    )        
-    except ffmpeg.Error as e:
-        print(f"Error during generating HLS: {e.stderr.decode()}")
-    return output_path
\ No newline at end of file
+                audio_bitrate='128k'  )
+            exit_code, stderr = run_ffmpeg(stream)
+            if exit_code:
+                print(f"Error during concatenating HLS chunks: {stderr}")
+                raise TranscodeError(exit_code, stderr)
+            playlists[str(resolution)] = output_path
+        if separate_audio:
+            audio_output, _ = get_audio_hls_output(ffmpeg.input(video_path)['a'], output_root, hls_time, segment_type, single_file)
+            exit_code, stderr = run_ffmpeg(audio_output)
+            if exit_code:
+                print(f"Error during encoding the HLS audio rendition: {stderr}")
+                raise TranscodeError(exit_code, stderr)
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+    if on_progress:
+        on_progress(1.0)
+    write_segment_indexes(output_root, resolutions)
+    write_master_playlist(output_root, resolutions, has_audio, segment_type, single_file)
+    return playlists
+
+def has_audio_stream(video_path):
+    """Check whether a video file contains at least one audio stream.
+    Args:
+        video_path (str): The file path to the video to inspect.
+    Returns:
+        bool: True if ffprobe reports an audio stream, False otherwise.   """
+
+    result = subprocess.run(
+        [   'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'a',
+            '-show_entries', 'stream=index',
+            '-of', 'csv=p=0',
+            video_path
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    return bool(result.stdout.strip())
+
+def get_h264_codec_string(media_path):
+    """Return the RFC 6381 codec string (e.g. "avc1.64001f") of the H.264 stream in a media file.
+    The profile, constraint flags and level are read from the first sequence parameter set,
+    either from an 'avcC' box (fMP4) or from an Annex-B start code (MPEG-TS).
+    Args:
+        media_path (str): The path to a segment or init file of the rendition.
+    Returns:
+        str: The codec string, or the High profile level 4.0 default if no SPS was found.   """
+
+    with open(media_path, 'rb') as f:
+        data = f.read(1024 * 1024)
+    match = re.search(rb'avcC\x01(...)', data, re.S) or re.search(rb'\x00\x00\x01[\x27\x47\x67](...)', data, re.S)
+    if not match:
+        return 'avc1.640028'
+    return f'avc1.{match.group(1).hex()}'
+
+def parse_media_playlist(playlist_path):
+    """Read the init section and the segments of an HLS media playlist.
+    Args:
+        playlist_path (str): The path to the media playlist.
+    Returns:
+        tuple: (init, segments). 'init' is (uri, byte_range) of the EXT-X-MAP or None, 'segments' is a list of
+        (duration, uri, byte_range). 'byte_range' is (offset, length) for single-file renditions, otherwise None.  """
+
+    init, segments, duration, byte_range, next_offset = None, [], None, None, {}
+    with open(playlist_path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXT-X-MAP:'):
+                attributes = dict(re.findall(r'([A-Z-]+)="([^"]*)"', line))
+                map_range = None
+                if 'BYTERANGE' in attributes:
+                    length, _, offset = attributes['BYTERANGE'].partition('@')
+                    map_range = (int(offset or 0), int(length))
+                    next_offset[attributes['URI']] = map_range[0] + map_range[1]
+                init = (attributes['URI'], map_range)
+            elif line.startswith('#EXTINF:'):
+                duration = float(line[len('#EXTINF:'):].split(',')[0])
+            elif line.startswith('#EXT-X-BYTERANGE:'):
+                length, _, offset = line[len('#EXT-X-BYTERANGE:'):].partition('@')
+                byte_range = (int(offset) if offset else None, int(length))
+            elif line and not line.startswith('#') and duration:
+                if byte_range:
+                    offset = byte_range[0] if byte_range[0] is not None else next_offset.get(line, 0)
+                    byte_range = (offset, byte_range[1])
+                    next_offset[line] = offset + byte_range[1]
+                segments.append((duration, line, byte_range))
+                duration, byte_range = None, None
+    return init, segments
+
+def get_rendition_bandwidth(playlist_path):
+    """Calculate the peak and average bitrate of an HLS rendition from its playlist and segment sizes.
+    Segments of a single-file rendition are measured by the length of their EXT-X-BYTERANGE.
+    Args:
+        playlist_path (str): The path to the media playlist of the rendition.
+    Returns:
+        tuple: (peak, average) in bits per second, or (0, 0) if the playlist lists no segments.   """
+
+    folder = os.path.dirname(playlist_path)
+    peak, total_bits, total_duration = 0, 0, 0.0
+    for duration, uri, byte_range in parse_media_playlist(playlist_path)[1]:
+        bits = (byte_range[1] if byte_range else os.path.getsize(os.path.join(folder, uri))) * 8
+        peak = max(peak, math.ceil(bits / duration))
+        total_bits += bits
+        total_duration += duration
+    if not total_duration:
+        return 0, 0
+    return peak, math.ceil(total_bits / total_duration)
+
+def write_segment_index(output_folder):
+    """Write the segment index of a finished rendition. It lists every file referenced by the playlist with its size,
+    modification time and SHA-256, so the segment view can reject unknown names and answer Range requests without probing
+    the filesystem. The index is replaced atomically.
+    Args:
+        output_folder (str): The rendition folder containing the 'index.m3u8'.
+    Returns:
+        str: The path to the segment index.  """
+
+    init, segments = parse_media_playlist(os.path.join(output_folder, 'index.m3u8'))
+    names = ([init[0]] if init else []) + [uri for _, uri, _ in segments]
+    index = {}
+    for name in dict.fromkeys(names):
+        path = os.path.join(output_folder, name)
+        stat = os.stat(path)
+        with open(path, 'rb') as f:
+            index[name] = [stat.st_size, int(stat.st_mtime), get_file_hash(File(f))]
+    index_path = os.path.join(output_folder, SEGMENT_INDEX_FILE)
+    temp_path = index_path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(index, f, separators=(',', ':'))
+    os.replace(temp_path, index_path)
+    return index_path
+
+def write_segment_indexes(output_root, resolutions):
+    """Write the segment index of every finished rendition of a ladder, including the shared 'audio' rendition.
+    Args:
+        output_root (str): The folder containing the '<resolution>p' rendition subfolders.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") of the ladder.  """
+
+    for folder in [f'{resolution}p' for resolution in resolutions] + ['audio']:
+        if os.path.exists(os.path.join(output_root, folder, 'index.m3u8')):
+            write_segment_index(os.path.join(output_root, folder))
+
+def get_hls_version(segment_type="mpegts", single_file=False):
+    """Return the lowest HLS protocol version that supports the given segment layout.
+    fMP4 segments need EXT-X-MAP (version 6), byte-range addressed single files need EXT-X-BYTERANGE (version 4).
+    Args:
+        segment_type (str): "mpegts" or "fmp4".
+        single_file (bool): Whether the segments are byte ranges of one media file.
+    Returns:
+        int: The value of the EXT-X-VERSION tag.   """
+
+    if segment_type == 'fmp4':
+        return 6
+    return 4 if single_file else 3
+
+def write_master_playlist(output_root, resolutions, has_audio=True, segment_type="mpegts", single_file=False):
+    """Write an adaptive-bitrate 'master.m3u8' that references every finished rendition.
+    Each variant is listed with its BANDWIDTH, AVERAGE-BANDWIDTH, RESOLUTION and CODECS attributes,
+    ordered from the lowest to the highest bandwidth. Renditions without a playlist or segments are left out,
+    as are renditions whose RESOLUTION or BANDWIDTH duplicates an earlier variant.
+    If a shared 'audio' rendition exists, it is listed as an EXT-X-MEDIA audio group that every variant references,
+    and its bitrate is added to the bandwidth of every variant.
+    Args:
+        output_root (str): The folder containing the '<resolution>p' rendition subfolders.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to include.
+        has_audio (bool): Whether the renditions carry an AAC audio track.
+        segment_type (str): "mpegts" or "fmp4", sets the EXT-X-VERSION together with 'single_file'.
+        single_file (bool): Whether the renditions are byte-range addressed single files.
+    Returns:
+        str or None: The path to the master playlist, or None if no rendition was finished.   """
+
+    variants, sizes, bandwidths = [], set(), set()
+    for resolution in resolutions:
+        playlist_path = os.path.join(output_root, f'{resolution}p', 'index.m3u8')
+        if not os.path.exists(playlist_path):
+            continue
+        peak, average = get_rendition_bandwidth(playlist_path)
+        candidates = [os.path.join(output_root, f'{resolution}p', name) for name in ['segment_000.ts', 'init.mp4', 'media.ts', 'media.mp4']]
+        segment_path = next((path for path in candidates if os.path.exists(path)), None)
+        if not peak or not segment_path:
+            continue
+        width, height = get_resolution_size(str(resolution))
+        if (width, height) in sizes or peak in bandwidths:
+            continue
+        sizes.add((width, height))
+        bandwidths.add(peak)
+        codecs = get_h264_codec_string(segment_path) + (',mp4a.40.2' if has_audio else '')
+        variants.append((peak, average, width, height, codecs, f'{resolution}p/index.m3u8'))
+    if not variants:
+        return None
+    lines = ['#EXTM3U', f'#EXT-X-VERSION:{get_hls_version(segment_type, single_file)}', '#EXT-X-INDEPENDENT-SEGMENTS']
+    audio_playlist = os.path.join(output_root, 'audio', 'index.m3u8')
+    audio_peak, audio_average, audio_group = 0, 0, ''
+    if has_audio and os.path.exists(audio_playlist):
+        audio_peak, audio_average = get_rendition_bandwidth(audio_playlist)
+        audio_group = ',AUDIO="audio"'
+        lines.append('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio",NAME="Audio",DEFAULT=YES,AUTOSELECT=YES,URI="audio/index.m3u8"')
+    for peak, average, width, height, codecs, uri in sorted(variants):
+        lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={peak + audio_peak},AVERAGE-BANDWIDTH={average + audio_average},'
+                     f'RESOLUTION={width}x{height},CODECS="{codecs}"{audio_group}')
+        lines.append(uri)
+    master_path = os.path.join(output_root, 'master.m3u8')
+    with open(master_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return master_path
+
+def get_dash_segment_list(name, init, segments):
+    """Return the lines of a DASH SegmentList for the CMAF segments of one HLS rendition.
+    The segment timeline is taken from the EXTINF durations, single-file renditions are addressed with media ranges.
+    The URLs end with a slash like the segment route, so players are not redirected on every request.
+    Args:
+        name (str): The subfolder of the rendition, e.g. "480p" or "audio".
+        init (tuple): (uri, byte_range) of the init section, see parse_media_playlist.
+        segments (list): (duration, uri, byte_range) of every segment, see parse_media_playlist.
+    Returns:
+        list: The lines of the SegmentList element.  """
+
+    init_range = f' range="{init[1][0]}-{init[1][0] + init[1][1] - 1}"' if init[1] else ''
+    lines = ['        <SegmentList timescale="1000">',
+             f'          <Initialization sourceURL="{name}/{init[0]}/"{init_range}/>',
+             '          <SegmentTimeline>']
+    start = 0
+    for duration, _, _ in segments:
+        lines.append(f'            <S t="{start}" d="{round(duration * 1000)}"/>')
+        start += round(duration * 1000)
+    lines.append('          </SegmentTimeline>')
+    for _, uri, byte_range in segments:
+        media_range = f' mediaRange="{byte_range[0]}-{byte_range[0] + byte_range[1] - 1}"' if byte_range else ''
+        lines.append(f'          <SegmentURL media="{name}/{uri}/"{media_range}/>')
+    lines.append('        </SegmentList>')
+    return lines
+
+def write_dash_manifest(output_root, resolutions, has_audio=True):
+    """Write a static DASH 'manifest.mpd' that references the CMAF segments of the HLS renditions.
+    The MPD points to the same init sections and fragmented-MP4 segments as the HLS playlists, so one set of media files
+    serves both protocols. A shared 'audio' rendition is listed as its own audio adaptation set.
+    The MPD uses the 'isoff-main' profile, the live profile does not allow a SegmentList with byte ranges.
+    Renditions with MPEG-TS segments are left out because DASH needs fragmented MP4.
+    Args:
+        output_root (str): The folder containing the '<resolution>p' rendition subfolders.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to include.
+        has_audio (bool): Whether the source has an AAC audio track.
+    Returns:
+        str or None: The path to the DASH manifest, or None if no rendition has CMAF segments.   """
+
+    audio_playlist = os.path.join(output_root, 'audio', 'index.m3u8')
+    audio = parse_media_playlist(audio_playlist) if has_audio and os.path.exists(audio_playlist) else (None, [])
+    muxed_audio = ',mp4a.40.2' if has_audio and not audio[0] else ''
+    representations, durations = [], [duration for duration, _, _ in audio[1]]
+    total_duration = sum(durations)
+    for resolution in resolutions:
+        playlist_path = os.path.join(output_root, f'{resolution}p', 'index.m3u8')
+        if not os.path.exists(playlist_path):
+            continue
+        init, segments = parse_media_playlist(playlist_path)
+        if not init or not segments:
+            continue
+        peak, _ = get_rendition_bandwidth(playlist_path)
+        codecs = get_h264_codec_string(os.path.join(output_root, f'{resolution}p', init[0])) + muxed_audio
+        width, height = get_resolution_size(str(resolution))
+        lines = [f'      <Representation id="{resolution}p" bandwidth="{peak}" width="{width}" height="{height}" codecs="{codecs}">']
+        lines += get_dash_segment_list(f'{resolution}p', init, segments)
+        lines.append('      </Representation>')
+        representations.append((peak, lines))
+        durations += [duration for duration, _, _ in segments]
+        total_duration = max(total_duration, sum(duration for duration, _, _ in segments))
+    if not representations:
+        return None
+    lines = ['<?xml version="1.0" encoding="UTF-8"?>',
+             f'<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" profiles="urn:mpeg:dash:profile:isoff-main:2011" type="static" '
+             f'mediaPresentationDuration="PT{total_duration:.3f}S" minBufferTime="PT{math.ceil(max(durations))}S">',
+             '  <Period id="0" start="PT0S">',
+             '    <AdaptationSet mimeType="video/mp4" segmentAlignment="true" startWithSAP="1">']
+    for _, representation in sorted(representations, key=lambda item: item[0]):
+        lines += representation
+    lines.append('    </AdaptationSet>')
+    if audio[0] and audio[1]:
+        audio_peak, _ = get_rendition_bandwidth(audio_playlist)
+        lines += ['    <AdaptationSet mimeType="audio/mp4" segmentAlignment="true" startWithSAP="1">',
+                  f'      <Representation id="audio" bandwidth="{audio_peak}" codecs="mp4a.40.2">']
+        lines += get_dash_segment_list('audio', *audio)
+        lines += ['      </Representation>', '    </AdaptationSet>']
+    lines += ['  </Period>', '</MPD>']
+    manifest_path = os.path.join(output_root, 'manifest.mpd')
+    with open(manifest_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    return manifest_path
+
+def measure_quality(rendition_path, reference_path, width, height):
+    """Measure the PSNR and SSIM of an encoded rendition against its source with ffmpeg's psnr and ssim filters.
+    The source is scaled to the size of the rendition, so the scores show the loss of the encoder and not of the scaling.
+    Args:
+        rendition_path (str): The path to the playlist or media file of the rendition.
+        reference_path (str): The path to the source video file.
+        width (int): The width of the rendition.
+        height (int): The height of the rendition.
+    Returns:
+        tuple: (psnr, ssim), the average PSNR in dB and the SSIM of all planes (0 - 1).
+    Raises:
+        TranscodeError: If ffmpeg exits with an error or prints no scores."""
+
+    distorted = ffmpeg.input(rendition_path).video.filter_multi_output('split')
+    reference = ffmpeg.input(reference_path).video.filter('scale', width, height).filter_multi_output('split')
+    stream = ffmpeg.merge_outputs(
+        ffmpeg.filter([distorted[0], reference[0]], 'psnr').output('-', format='null'),
+        ffmpeg.filter([distorted[1], reference[1]], 'ssim').output('-', format='null'))
+    exit_code, stderr = run_ffmpeg(stream)
+    psnr = re.search(r'PSNR .*average:([\d.]+|inf)', stderr)
+    ssim = re.search(r'SSIM .*All:([\d.]+)', stderr)
+    if exit_code or not psnr or not ssim:
+        raise TranscodeError(exit_code or 1, stderr)
+    return float(psnr.group(1)), float(ssim.group(1))
+
+def get_folder_size(folder):
+    """Return the total size in bytes of all files directly inside a folder, or 0 if it does not exist."""
+    if not os.path.isdir(folder):
+        return 0
+    return sum(entry.stat().st_size for entry in os.scandir(folder) if entry.is_file())
+
+def select_renditions(resolutions, source_width, source_height):
+    """Split the rendition ladder into the resolutions to encode and the ones that would upscale the source.
+    A rendition is only skipped if it is larger than the source in both dimensions, so a 1920x800 scope source keeps 1080p.
+    The smallest resolution is always kept, so even a very small source gets one rendition.
+    Args:
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") of the ladder.
+        source_width (int): The width of the source video in pixels.
+        source_height (int): The height of the source video in pixels.
+    Returns:
+        tuple: (kept, skipped) lists of resolution identifiers, both ordered from low to high.  """
+
+    ordered = sorted((str(resolution) for resolution in resolutions), key=lambda resolution: get_resolution_size(resolution)[1])
+    kept = [resolution for resolution in ordered
+            if get_resolution_size(resolution)[0] <= source_width or get_resolution_size(resolution)[1] <= source_height] or ordered[:1]
+    return kept, [resolution for resolution in ordered if resolution not in kept]
+
+def create_transcode_job(video, resolutions):
+    """Create a queued TranscodeJob with one queued Rendition per resolution.
+    Args:
+        video (Video): The video to be transcoded.
+        resolutions (list): The resolution identifiers (e.g. "480", "720", "1080") to encode.
+    Returns:
+        TranscodeJob: The newly created job.  """
+
+    job = TranscodeJob.objects.create(video=video)
+    Rendition.objects.bulk_create([Rendition(job=job, resolution=str(resolution)) for resolution in resolutions])
+    return job
+
+def transcode_hls_task(job_id):
+    """Encode the HLS ladder of a TranscodeJob and record the state of the job and of every rendition.
+    The job moves from queued to running and ends as done or failed. Progress, timings, output sizes
+    and the ffmpeg exit status are stored, so slow, stuck or failed encodes can be found in the admin.
+    Videos of at least HLS_CHUNKED_MIN_DURATION seconds are encoded in parallel chunks.
+    Renditions larger than the source in both dimensions are not encoded and are recorded as skipped.
+    The 'cmaf' delivery profile writes fragmented-MP4 segments with one track per file (the audio in its own rendition)
+    instead of MPEG-TS, and a DASH manifest that uses the same segments.
+    HLS_SINGLE_FILE writes one byte-range addressed media file per rendition.
+    HLS_SHARED_AUDIO encodes the audio once into a shared audio rendition instead of into every video rendition.
+    With HLS_PER_TITLE_ENCODING the complexity of the title is measured once and stored on its MediaInfo, the chosen
+    CRF and bitrate cap are stored on every rendition.
+    With HLS_PROGRESSIVE_PUBLISH the ladder is published as a growing EVENT playlist that can be played while encoding,
+    this takes precedence over the chunked encode whose segments only exist at the end.
+    Any other error also marks the job and its unfinished renditions as failed, stores the traceback and is raised again.
+    Args:
+        job_id (int): The ID of the TranscodeJob to run.
+    Raises:
+        Exception: Any error other than TranscodeError, after the job has been marked as failed.  """
+
+    try:
+        job = TranscodeJob.objects.select_related('video').get(id=job_id)
+    except TranscodeJob.DoesNotExist:
+        print(f"TranscodeJob with id={job_id} does not exist")
+        return
+    video = job.video
+    output_root = os.path.join(settings.MEDIA_ROOT, 'videos', str(video.id))
+    started_at = timezone.now()
+    TranscodeJob.objects.filter(id=job.id).update(status=TranscodeJob.STATUS_RUNNING, started_at=started_at, progress=0, error='')
+
+    def update_progress(share):
+        percent = int(share * 100)
+        if percent > job.progress:
+            job.progress = percent
+            TranscodeJob.objects.filter(id=job.id).update(progress=percent)
+
+    try:
+        info = get_media_info(video)
+        resolutions, skipped = select_renditions(job.renditions.values_list('resolution', flat=True), info.width, info.height)
+        if skipped:
+            print(f"Skipping renditions {', '.join(skipped)} of video {video.id}, the source is only {info.width}x{info.height}")
+            job.renditions.filter(resolution__in=skipped).update(status=TranscodeJob.STATUS_SKIPPED, finished_at=started_at)
+        job.renditions.filter(resolution__in=resolutions).update(status=TranscodeJob.STATUS_RUNNING, started_at=started_at)
+        segment_type = 'fmp4' if settings.VIDEO_DELIVERY_PROFILE == 'cmaf' else 'mpegts'
+        separate_audio = settings.HLS_SHARED_AUDIO or segment_type == 'fmp4'
+        encoding = None
+        if settings.HLS_PER_TITLE_ENCODING:
+            if info.complexity is None:
+                info.complexity = analyze_complexity(video.video_file.path, info.duration, info.frame_rate)
+                MediaInfo.objects.filter(id=info.id).update(complexity=info.complexity)
+            encoding = get_per_title_encoding(info.complexity, resolutions, info.frame_rate)
+            for resolution, options in encoding.items():
+                job.renditions.filter(resolution=resolution).update(crf=options['crf'], max_bitrate=options['maxrate'])
+        if info.duration >= settings.HLS_CHUNKED_MIN_DURATION and not settings.HLS_PROGRESSIVE_PUBLISH:
+            generate_hls_chunked(video.video_file.path, output_root, resolutions, settings.HLS_CHUNK_SECONDS, settings.HLS_CHUNK_WORKERS,
+                                 on_progress=update_progress, duration=info.duration, has_audio=bool(info.audio_codec), segment_type=segment_type,
+                                 single_file=settings.HLS_SINGLE_FILE, separate_audio=separate_audio, encoding=encoding)
+        else:
+            generate_hls_ladder(video.video_file.path, output_root, resolutions, on_progress=update_progress,
+                                duration=info.duration, has_audio=bool(info.audio_codec), segment_type=segment_type,
+                                playlist_type='event' if settings.HLS_PROGRESSIVE_PUBLISH else 'vod', single_file=settings.HLS_SINGLE_FILE,
+                                separate_audio=separate_audio, encoding=encoding)
+        if segment_type == 'fmp4':
+            write_dash_manifest(output_root, resolutions, has_audio=bool(info.audio_codec))
+    except TranscodeError as e:
+        finished_at = timezone.now()
+        job.renditions.exclude(status=TranscodeJob.STATUS_SKIPPED).update(status=TranscodeJob.STATUS_FAILED, finished_at=finished_at, exit_code=e.exit_code)
+        TranscodeJob.objects.filter(id=job.id).update(status=TranscodeJob.STATUS_FAILED, finished_at=finished_at, error=e.stderr.decode()[-5000:])
+        return
+    except Exception:
+        finished_at = timezone.now()
+        job.renditions.exclude(status__in=[TranscodeJob.STATUS_SKIPPED, TranscodeJob.STATUS_DONE]).update(status=TranscodeJob.STATUS_FAILED, finished_at=finished_at)
+        TranscodeJob.objects.filter(id=job.id).update(status=TranscodeJob.STATUS_FAILED, finished_at=finished_at, error=traceback.format_exc()[-5000:])
+        raise
+    if remove_outputs_of_deleted_video(video.id):
+        return
+    finished_at = timezone.now()
+    for rendition in job.renditions.filter(resolution__in=resolutions):
+        folder = os.path.join(output_root, f'{rendition.resolution}p')
+        rendition.status = TranscodeJob.STATUS_DONE if os.path.exists(os.path.join(folder, 'index.m3u8')) else TranscodeJob.STATUS_FAILED
+        rendition.finished_at = finished_at
+        rendition.output_size = get_folder_size(folder)
+        rendition.exit_code = 0
+        rendition.save(update_fields=['status', 'finished_at', 'output_size', 'exit_code'])
+    TranscodeJob.objects.filter(id=job.id).update(status=TranscodeJob.STATUS_DONE, finished_at=finished_at, progress=100)
+
+def get_job_id_prefix():
+    """Return the prefix of the job ids and job sets of the videos, so deployments or databases that share one Redis
+    never take the jobs of another video with the same id for their own. RQ_JOB_ID_PREFIX is used if it is set,
+    otherwise the prefix is derived from the name, host and port of the database.
+    Returns:
+        str: The prefix, e.g. "staging" or "3f9a1c0e".  """
+
+    if settings.RQ_JOB_ID_PREFIX:
+        return settings.RQ_JOB_ID_PREFIX
+    database = connections['default'].settings_dict
+    return hashlib.sha256(f"{database['NAME']}@{database['HOST']}:{database['PORT']}".encode()).hexdigest()[:8]
+
+def get_video_jobs_key(video_id):
+    """Return the Redis set that holds the job ids of a video.
+    Args:
+        video_id (int): The ID of the video.
+    Returns:
+        str: The key of the set.  """
+
+    return VIDEO_JOBS_KEY.format(get_job_id_prefix(), video_id)
+
+def get_video_job_id(kind, video_id, *parts):
+    """Return the deterministic RQ job id of a task of a video, e.g. "3f9a1c0e-hls-12" or "3f9a1c0e-progressive-12-480".
+    The id starts with the prefix from get_job_id_prefix. RQ does not allow ':' in job ids, so the parts are joined with '-'.
+    Args:
+        kind (str): The kind of task, e.g. "thumbnail", "trickplay", "progressive" or "hls".
+        video_id (int): The ID of the video.
+        *parts: Further parts that tell tasks of the same kind apart, e.g. the resolution.
+    Returns:
+        str: The job id.  """
+
+    return '-'.join([get_job_id_prefix(), kind, str(video_id), *map(str, parts)])
+
+def get_active_video_job(queue_name, job_id):
+    """Return the job with the given id if it is queued, scheduled, deferred or running on the queue.
+    Args:
+        queue_name (str): The RQ queue.
+        job_id (str): The deterministic job id from get_video_job_id.
+    Returns:
+        Job or None: The active job, or None if there is none.  """
+
+    job = django_rq.get_queue(queue_name).fetch_job(job_id)
+    return job if job and job.get_status() in ACTIVE_JOB_STATUSES else None
+
+def enqueue_video_task(video_id, queue_name, job_id, func, *args, is_current=None):
+    """Enqueue a background task of a video under a deterministic job id and remember the id, so the job can be
+    cancelled when the video is deleted. If a job with the same id is already active, nothing is enqueued.
+    An active job for which is_current returns False is left over from an earlier video with the same id,
+    it is cancelled (or stopped) and replaced by the new job.
+    The check and the enqueue run under a short Redis lock, so two processes cannot enqueue the same job twice.
+    Args:
+        video_id (int): The ID of the video the task works on.
+        queue_name (str): The RQ queue, e.g. "thumbnail" or "transcode".
+        job_id (str): The deterministic job id from get_video_job_id.
+        func (callable): The task function.
+        *args: The arguments of the task.
+        is_current (callable, optional): Tells whether an active job with the same id still belongs to this video.
+    Returns:
+        Job: The enqueued RQ job, or the already active job with the same id.  """
+
+    queue = django_rq.get_queue(queue_name, autocommit=True)
+    with queue.connection.lock(f'videoflix:enqueue:{job_id}', timeout=10):
+        job = get_active_video_job(queue_name, job_id)
+        if job and is_current and not is_current(job):
+            print(f"Job {job_id} belongs to an earlier video with the same id, replacing it")
+            if job.get_status() == JobStatus.STARTED:
+                send_stop_job_command(queue.connection, job_id)
+            job.delete()
+            job = None
+        if job:
+            print(f"Job {job_id} is already {job.get_status()}, not enqueued again")
+            return job
+        job = queue.enqueue(func, *args, job_id=job_id)
+    queue.connection.sadd(get_video_jobs_key(video_id), job.id)
+    return job
+
+def enqueue_video_processing(video):
+    """Enqueue the background work of an uploaded video: the poster thumbnail on the 'thumbnail' queue, the trickplay sprite sheets,
+    the progressive MP4 fallback for the 'hls+mp4' delivery profile and the HLS ladder as a TranscodeJob on the 'transcode' queue.
+    The trickplay task runs on the 'transcode' queue, because its time grows with the duration of the source and would
+    exceed the short timeout of the 'thumbnail' queue for long uploads and block the poster frames of other uploads.
+    The TranscodeJob is created first and deleted again if an HLS job of the video is already active, so the check
+    for an active job and the enqueue both happen under the lock of enqueue_video_task.
+    Args:
+        video (Video): The video whose source file is processed.  """
+
+    enqueue_video_task(video.id, 'thumbnail', get_video_job_id('thumbnail', video.id), generate_and_save_thumbnail_task, video.id)
+    enqueue_video_task(video.id, 'transcode', get_video_job_id('trickplay', video.id), generate_trickplay_task, video.id)
+    if settings.VIDEO_DELIVERY_PROFILE == 'hls+mp4':
+        enqueue_video_task(video.id, 'transcode', get_video_job_id('progressive', video.id, settings.VIDEO_PROGRESSIVE_RESOLUTION),
+                           convert_resolution, video.video_file.path, settings.VIDEO_PROGRESSIVE_RESOLUTION)
+    transcode_job = create_transcode_job(video, LADDER_RESOLUTIONS)
+    job = enqueue_video_task(video.id, 'transcode', get_video_job_id('hls', video.id), transcode_hls_task, transcode_job.id,
+                             is_current=lambda job: TranscodeJob.objects.filter(id=job.args[0], video=video).exists())
+    if job.args[0] != transcode_job.id:
+        transcode_job.delete()
+
+def cancel_video_jobs(video_id):
+    """Cancel the queued background jobs of a video and stop the running ones.
+    A running job is stopped by its worker, which kills the work horse together with its ffmpeg processes.
+    Args:
+        video_id (int): The ID of the video.
+    Returns:
+        list: The ids of the cancelled or stopped jobs.  """
+
+    try:
+        connection = django_rq.get_connection('transcode')
+        key = get_video_jobs_key(video_id)
+        job_ids = [job_id.decode() for job_id in connection.smembers(key)]
+        cancelled = []
+        for job_id in job_ids:
+            try:
+                job = Job.fetch(job_id, connection=connection)
+                status = job.get_status()
+                if status == JobStatus.STARTED:
+                    send_stop_job_command(connection, job_id)
+                elif status in (JobStatus.QUEUED, JobStatus.DEFERRED, JobStatus.SCHEDULED):
+                    job.cancel()
+                else:
+                    continue
+            except (NoSuchJobError, InvalidJobOperation):
+                continue
+            cancelled.append(job_id)
+        connection.delete(key)
+    except RedisConnectionError as e:
+        print(f"Could not cancel the jobs of video {video_id}: {e}")
+        return []
+    if cancelled:
+        print(f"Cancelled {len(cancelled)} background jobs of video {video_id}")
+    return cancelled
+
+def remove_outputs_of_deleted_video(video_id):
+    """Remove the HLS folder of a video that was deleted while one of its tasks was running.
+    Called by the tasks when they have finished, so a job that could not be stopped in time leaves no files behind.
+    Args:
+        video_id (int): The ID of the video.
+    Returns:
+        bool: True if the video was deleted and its outputs were removed.  """
+
+    if Video.objects.filter(id=video_id).exists():
+        return False
+    output_root = os.path.join(settings.MEDIA_ROOT, 'videos', str(video_id))
+    if os.path.isdir(output_root) and not os.path.islink(output_root):
+        shutil.rmtree(output_root, ignore_errors=True)
+        print(f"Video {video_id} was deleted, removed its outputs {output_root}")
+    return True
+
+def get_file_hash(file):
+    """Return the SHA-256 hex digest of an uploaded file.
+    Files streamed to disk by ContentHashUploadHandler already carry the digest, other files are hashed chunk by chunk.
+    Args:
+        file (File): The uploaded file.
+    Returns:
+        str: The hex digest of the file content.  """
+
+    content_hash = getattr(file, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks():
+        sha256.update(chunk)
+    file.seek(0)
+    return sha256.hexdigest()
+
+def link_duplicate_video(duplicate, original):
+    """Let a duplicate upload reuse the source file, thumbnail, media info and renditions of the original video.
+    The duplicate copy of the source is deleted and 'videos/<duplicate id>' becomes a symlink to the HLS folder of the original,
+    so no transcode is started and the HLS endpoints keep working without a database lookup.
+    Args:
+        duplicate (Video): The newly uploaded video with the same content hash.
+        original (Video): The video whose outputs are reused.  """
+
+    if duplicate.video_file.name != original.video_file.name and os.path.isfile(duplicate.video_file.path):
+        os.remove(duplicate.video_file.path)
+    videos_root = os.path.join(settings.MEDIA_ROOT, 'videos')
+    os.makedirs(videos_root, exist_ok=True)
+    hls_link = os.path.join(videos_root, str(duplicate.id))
+    if not os.path.lexists(hls_link):
+        os.symlink(str(original.id), hls_link)
+    Video.objects.filter(id=duplicate.id).update(
+        source_video=original, video_file=original.video_file.name, thumbnail=original.thumbnail.name, duration=original.duration)
+    info = MediaInfo.objects.filter(video=original).first()
+    if info is not None and not MediaInfo.objects.filter(video=duplicate).exists():
+        info.pk, info.video = None, duplicate
+        info.save()
+    print(f"Video {duplicate.id} is a duplicate of video {original.id}, reusing its renditions")
+
+def promote_duplicate_video(video):
+    """Hand the outputs of a video that is about to be deleted over to its oldest duplicate.
+    The HLS folder is moved to the duplicate and the remaining duplicates are pointed to it, so shared outputs are kept while in use.
+    Finished transcode jobs are copied to the duplicate with their renditions, because the jobs of the video are deleted with it.
+    Unfinished jobs are not copied, they are cancelled and the duplicate gets new ones (see video_pre_delete).
+    Args:
+        video (Video): The video that is being deleted.
+    Returns:
+        Video or None: The duplicate that took over the outputs, or None if the video has no duplicates.  """
+
+    duplicates = list(video.duplicates.order_by('id'))
+    if not duplicates:
+        return None
+    heir, others = duplicates[0], duplicates[1:]
+    videos_root = os.path.join(settings.MEDIA_ROOT, 'videos')
+    hls_folder = os.path.join(videos_root, str(video.id))
+    heir_folder = os.path.join(videos_root, str(heir.id))
+    if os.path.islink(heir_folder):
+        os.unlink(heir_folder)
+    if os.path.isdir(hls_folder) and not os.path.islink(hls_folder):
+        os.rename(hls_folder, heir_folder)
+    for other in others:
+        link = os.path.join(videos_root, str(other.id))
+        if os.path.islink(link):
+            os.unlink(link)
+        os.symlink(str(heir.id), link)
+    Video.objects.filter(id__in=[other.id for other in others]).update(source_video=heir)
+    Video.objects.filter(id=heir.id).update(source_video=None)
+    for job in TranscodeJob.objects.filter(video=video, status__in=[TranscodeJob.STATUS_DONE, TranscodeJob.STATUS_FAILED]).prefetch_related('renditions'):
+        renditions, created_at = list(job.renditions.all()), job.created_at
+        job.pk, job.video = None, heir
+        job.save()
+        TranscodeJob.objects.filter(id=job.id).update(created_at=created_at)
+        for rendition in renditions:
+            rendition.pk, rendition.job = None, job
+        Rendition.objects.bulk_create(renditions)
+    return heir
+
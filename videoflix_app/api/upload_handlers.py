@@ -0,0 +1,118 @@
+import os
+import hashlib
+from django.conf import settings
+from django.db import transaction
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from videoflix_app.models import Video
+
+UPLOAD_READ_SIZE = 64 * 1024
+
+
+class ContentHashUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        """ Starts a new SHA-256 hash for every uploaded file. """
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        """ Hashes every chunk while it is streamed into the temporary file, so the upload is not read a second time. """
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        """ Returns the temporary file with the hex digest of its content stored as `content_hash`. """
+        file = super().file_complete(file_size)
+        file.content_hash = self.sha256.hexdigest()
+        return file
+
+
+def get_upload_part_path(session):
+    """Return the path of the partial file that receives the chunks of an upload session.
+    Args:
+        session (UploadSession): The upload session.
+    Returns:
+        str: The path of the partial file.  """
+
+    return os.path.join(settings.MEDIA_ROOT, 'uploads', f'{session.id}.part')
+
+def append_upload_chunk(session, stream, length, checksum=None):
+    """Append one chunk of a resumable upload to its partial file and advance the session offset.
+    The chunk is streamed to disk in small blocks and never held in memory. If the chunk is incomplete or its SHA-256
+    digest does not match `checksum`, the partial file is cut back to the previous offset so the chunk can be sent again.
+    Args:
+        session (UploadSession): The upload session, locked by the caller.
+        stream (file-like): The request body that holds the chunk.
+        length (int): Size of the chunk in bytes.
+        checksum (bytes, optional): Expected SHA-256 digest of the chunk.
+    Returns:
+        int: The new offset of the session.
+    Raises:
+        ValueError: If the chunk exceeds the declared size, is incomplete or fails the checksum.  """
+
+    if session.offset + length > session.size:
+        raise ValueError("Chunk exceeds the declared upload size")
+    part_path = get_upload_part_path(session)
+    os.makedirs(os.path.dirname(part_path), exist_ok=True)
+    sha256 = hashlib.sha256()
+    received = 0
+    with open(part_path, 'a+b') as part:
+        part.truncate(session.offset)
+        while received < length:
+            data = stream.read(min(UPLOAD_READ_SIZE, length - received))
+            if not data:
+                break
+            part.write(data)
+            sha256.update(data)
+            received += len(data)
+        if received != length or (checksum and sha256.digest() != checksum):
+            part.truncate(session.offset)
+            raise ValueError("Chunk is incomplete" if received != length else "Chunk checksum mismatch")
+    session.offset += received
+    session.save(update_fields=['offset', 'updated_at'])
+    return session.offset
+
+def complete_upload(session):
+    """Turn a fully received upload into a Video.
+    The partial file is verified against the declared checksum and then moved to the upload folder of `Video.video_file`
+    without being copied. Creating the Video starts the usual thumbnail and transcode tasks, or links a duplicate upload.
+    The Video is created in a transaction. If creating it fails, the file is moved back to the partial file, so the
+    upload can be completed again with an empty chunk.
+    Args:
+        session (UploadSession): The upload session whose offset has reached its size.
+    Returns:
+        Video: The newly created video.
+    Raises:
+        ValueError: If the file does not match the declared checksum or the partial file is missing.
+            The session is reset so the upload can start over.  """
+
+    part_path = get_upload_part_path(session)
+    if not os.path.isfile(part_path):
+        session.offset = 0
+        session.save(update_fields=['offset', 'updated_at'])
+        raise ValueError("The received file is missing, the upload has to be restarted")
+    sha256 = hashlib.sha256()
+    with open(part_path, 'rb') as part:
+        for data in iter(lambda: part.read(UPLOAD_READ_SIZE), b''):
+            sha256.update(data)
+    content_hash = sha256.hexdigest()
+    if session.checksum and content_hash != session.checksum.lower():
+        os.remove(part_path)
+        session.offset = 0
+        session.save(update_fields=['offset', 'updated_at'])
+        raise ValueError("File checksum mismatch, the upload has to be restarted")
+    name = default_storage.get_available_name(Video._meta.get_field('video_file').generate_filename(None, session.filename))
+    target_path = default_storage.path(name)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    os.replace(part_path, target_path)
+    try:
+        with transaction.atomic():
+            video = Video.objects.create(title=session.title, description=session.description, category=session.category,
+                                         is_featured=session.is_featured, user=session.user, video_file=name, content_hash=content_hash)
+            session.video = video
+            session.save(update_fields=['video', 'updated_at'])
+    except Exception:
+        session.video = None
+        os.replace(target_path, part_path)
+        raise
+    return video
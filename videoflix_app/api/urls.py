@@ -3,11 +3,15 @@ from django.http import FileResponse, Http404
 from django.conf import settings
 import os
 from rest_framework.routers import DefaultRouter
-from .views import  LogoutView, CustomUserView, CategoryViewSet, VideoViewSet, WatchHistoryViewSet, WatchlistViewSet, WatchlistEntryViewSet, serve_hls_manifest, serve_hls_segment
+from .views import  LogoutView, CustomUserView, CategoryViewSet, VideoViewSet, WatchHistoryViewSet, WatchlistViewSet, WatchlistEntryViewSet, UploadSessionViewSet, serve_hls_manifest, serve_hls_master, serve_dash_manifest, serve_hls_segment, serve_trickplay
+from .views import serve_hls_manifest_async, serve_hls_segment_async
 from .views import RegistrationView, ActivateUserView, CookieTokenObtainPairView, CookieTokenRefreshView, CheckLoginOrRegisterView, PasswordResetRequestView, PasswordResetConfirmView
 
 
 
+# Under the ASGI server profile the playlists and segments are streamed by async views.
+ASGI = settings.SERVER_PROFILE == 'asgi'
+
 router = DefaultRouter()
 router.register(r'user', CustomUserView, basename='user')
 router.register(r'categories', CategoryViewSet, basename='category')
@@ -15,6 +19,7 @@ router.register(r'video', VideoViewSet, basename='video')
 router.register(r'watchlist', WatchlistViewSet, basename='watchlist')
 router.register(r'watchlist-entries', WatchlistEntryViewSet, basename='watchlist-entry')
 router.register(r'history', WatchHistoryViewSet, basename='history')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
     
 urlpatterns = [   
     path('', include(router.urls)),
@@ -26,8 +31,11 @@ urlpatterns = [
     path('users/check-login-register/', CheckLoginOrRegisterView.as_view(), name='check-login-register'), 
     path('password_reset/', PasswordResetRequestView.as_view(), name='password_reset'),
     path('password_confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name='password_confirm'),   
-    path('video/<int:movie_id>/<str:resolution>/index.m3u8', serve_hls_manifest, name='serve_hls_manifest'),
-    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', serve_hls_segment, name='serve_hls_segment'),   
+    path('video/<int:movie_id>/master.m3u8', serve_hls_master, name='serve_hls_master'),
+    path('video/<int:movie_id>/manifest.mpd', serve_dash_manifest, name='serve_dash_manifest'),
+    path('video/<int:movie_id>/trickplay/<str:filename>', serve_trickplay, name='serve_trickplay'),
+    path('video/<int:movie_id>/<str:resolution>/index.m3u8', serve_hls_manifest_async if ASGI else serve_hls_manifest, name='serve_hls_manifest'),
+    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', serve_hls_segment_async if ASGI else serve_hls_segment, name='serve_hls_segment'),   
     
 ]
 
@@ -1,6 +1,16 @@
 import os
-from django.http import FileResponse, Http404
-from django.utils.http import urlsafe_base64_decode
+import re
+import base64
+import binascii
+import hashlib
+from asgiref.sync import sync_to_async
+from urllib.parse import quote
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from django.utils.http import http_date, parse_http_date_safe, urlsafe_base64_decode
+from django.utils.cache import get_conditional_response
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth import get_user_model
 from django.conf import settings
@@ -10,23 +20,227 @@ from django.views.decorators.csrf import ensure_csrf_cookie
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.request import Request
+from rest_framework.exceptions import NotAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken, TokenError
 from rest_framework.authentication import SessionAuthentication
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework import status,viewsets,permissions
+from rest_framework import status,viewsets,permissions,mixins
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.decorators import action, api_view, permission_classes, authentication_classes
 
 from .tasks import send_activation_email_task, send_resetPW_email_task
-from .authentication import CookieJWTAuthentication
+from .authentication import CookieJWTAuthentication, SignedSegmentAuthentication, get_segment_query
 from .serializers import CustomUserSerializer, MyTokenObtainPairSerializer, PasswordResetConfirmSerializer, PasswordResetRequestSerializer, RegistrationSerializer
-from .serializers import  CategorySerializer, VideoSerializer, VideoListSerializer, WatchHistorySerializer, WatchlistSerializer, WatchlistEntrySerializer
-from videoflix_app.models import CustomUser, Category, Video, WatchHistory, Watchlist, WatchlistEntry    
+from .serializers import  CategorySerializer, VideoSerializer, VideoListSerializer, WatchHistorySerializer, WatchlistSerializer, WatchlistEntrySerializer, UploadSessionSerializer
+from .manifest_cache import read_manifest
+from .segment_index import get_segment_index, is_valid_media_name
+from .upload_handlers import append_upload_chunk, complete_upload, get_upload_part_path
+from videoflix_app.models import CustomUser, Category, Video, WatchHistory, Watchlist, WatchlistEntry, UploadSession
 from .permissions import IsAdminOrReadOnly, IsOwnerProfile
 
 
 User = get_user_model()
+SEGMENT_CONTENT_TYPES = {'.ts': 'video/MP2T', '.m4s': 'video/iso.segment', '.mp4': 'video/mp4'}
+TRICKPLAY_CONTENT_TYPES = {'.vtt': 'text/vtt', '.jpg': 'image/jpeg', '.webp': 'image/webp'}
+RANGE_READ_SIZE = 64 * 1024
+
+
+def parse_byte_range(range_header, size):
+    """ Parses a single 'bytes=start-end', 'bytes=start-' or 'bytes=-suffix' Range header.
+    Returns (start, end) with an inclusive end, None if the header is missing or not a single byte range,
+    or False if the range cannot be satisfied for a file of the given size. """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (range_header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+def read_file_range(file, start, length):
+    """ Yields 'length' bytes of a file from 'start' in small blocks and closes the file at the end. """
+    with file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(RANGE_READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+
+def get_file_etag(size, last_modified):
+    """ Returns a strong ETag built from the modification time and the size of a file, in the same format as nginx. """
+    return f'"{last_modified:x}-{size:x}"'
+
+def get_file_validators(file_path, entry=None):
+    """ Returns the size, the modification time and the ETag of a file, from its segment index entry if one is given,
+    otherwise from os.stat. """
+    if entry is None:
+        stat = os.stat(file_path)
+        size, last_modified = stat.st_size, int(stat.st_mtime)
+    else:
+        size, last_modified = entry[0], entry[1]
+    return size, last_modified, get_file_etag(size, last_modified)
+
+def set_file_headers(response, size, last_modified, etag, entry=None):
+    """ Sets the range, validator and, for indexed segments, the SHA-256 Repr-Digest headers of a file response. """
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if entry is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_206_PARTIAL_CONTENT):
+        response['Repr-Digest'] = f'sha-256=:{base64.b64encode(bytes.fromhex(entry[2])).decode()}:'
+    return response
+
+def is_range_current(request, etag, last_modified):
+    """ Returns whether the Range header of a request may be used. A request with an If-Range header that no longer matches
+    the ETag or the modification time of the file gets the whole file instead of a range of a changed file. """
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+def serve_file_with_range(request, file_path, content_type, entry=None):
+    """ Serves a file as a whole or, if the request has a Range header, only the requested byte range with 206 Partial Content.
+    Byte-range HLS renditions are read this way from one media file per rendition. Every response has an ETag and a Last-Modified
+    header, and conditional requests whose copy is still current get 304 Not Modified without a body.
+    With the segment index entry of the file its size and modification time are not read from disk. """
+    size, last_modified, etag = get_file_validators(file_path, entry)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = parse_byte_range(request.META.get('HTTP_RANGE'), size) if is_range_current(request, etag, last_modified) else None
+        if byte_range is False:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+        elif byte_range is None:
+            response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(read_file_range(open(file_path, 'rb'), start, end - start + 1),
+                                             status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+    return set_file_headers(response, size, last_modified, etag, entry)
+
+def serve_content(request, content, stat, content_type, variant=''):
+    """ Serves file content that is already in memory with the same ETag, Last-Modified and 304 handling as serve_file_with_range.
+    Content that was derived from the file, e.g. a playlist signed with a query, passes the query as 'variant'. It is hashed into
+    the ETag and the response has no Last-Modified, so a cached copy is only current for the same file and the same variant. """
+    last_modified = int(stat.st_mtime)
+    etag = get_file_etag(stat.st_size, last_modified)
+    if variant:
+        etag = f'{etag[:-1]}-{hashlib.sha256(variant.encode()).hexdigest()[:16]}"'
+        last_modified = None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+def sign_playlist(content, query):
+    """ Appends a signed query to every segment URI and EXT-X-MAP URI of a media playlist. The URIs get the trailing slash
+    of the segment route, so players request the segments without a redirect. """
+    lines = []
+    for line in content.splitlines():
+        if line.startswith('#EXT-X-MAP:'):
+            line = re.sub(r'URI="([^"]+)"', lambda match: f'URI="{match.group(1)}/?{query}"', line)
+        elif line and not line.startswith('#'):
+            line = f'{line}/?{query}'
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+def get_proxy_response(file_path, content_type):
+    """ Returns the empty response with the internal redirect header of the 'x-accel' and 'x-sendfile' delivery modes,
+    or None if Django sends the file itself. """
+    mode = settings.MEDIA_DELIVERY_MODE
+    if mode == 'x-accel':
+        response = HttpResponse(content_type=content_type)
+        relative_path = os.path.relpath(file_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(relative_path)
+        return response
+    if mode == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = os.path.abspath(file_path)
+        return response
+    return None
+
+def serve_media_file(request, file_path, content_type, entry=None):
+    """ Serves a file below MEDIA_ROOT according to MEDIA_DELIVERY_MODE. In the 'x-accel' and 'x-sendfile' modes the view only
+    answers with an internal redirect header and the front proxy sends the file and answers Range requests itself,
+    so no Python worker is held while a viewer downloads. Any other mode streams the file from Django. """
+    return get_proxy_response(file_path, content_type) or serve_file_with_range(request, file_path, content_type, entry)
+
+async def aread_file_range(file, start, length):
+    """ Yields 'length' bytes of a file from 'start' in small blocks and closes the file at the end. The file is read in worker
+    threads, so a slow disk or network volume never blocks the event loop of the ASGI server. """
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        await sync_to_async(file.seek, thread_sensitive=False)(start)
+        while length > 0:
+            data = await read(min(RANGE_READ_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+async def aserve_media_file(request, file_path, content_type, entry=None):
+    """ Async version of serve_media_file. The file is opened and streamed with non-blocking reads and answers Range and
+    conditional requests like serve_file_with_range.
+    Raises: - FileNotFoundError: If the file does not exist. """
+    response = get_proxy_response(file_path, content_type)
+    if response is not None:
+        return response
+    if entry is None:
+        size, last_modified, etag = await sync_to_async(get_file_validators, thread_sensitive=False)(file_path)
+    else:
+        size, last_modified, etag = get_file_validators(file_path, entry)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        byte_range = parse_byte_range(request.META.get('HTTP_RANGE'), size) if is_range_current(request, etag, last_modified) else None
+        if byte_range is False:
+            response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+        else:
+            start, end = byte_range or (0, size - 1)
+            file = await sync_to_async(open, thread_sensitive=False)(file_path, 'rb')
+            response = StreamingHttpResponse(aread_file_range(file, start, end - start + 1), content_type=content_type,
+                                             status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK)
+            response['Content-Length'] = str(end - start + 1)
+            if byte_range:
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return set_file_headers(response, size, last_modified, etag, entry)
+
+async def get_media_user(request, movie_id, signed=False):
+    """ Authenticates a request of an async streaming view with the same DRF authentication classes as the sync views.
+    A signed segment URL is checked on the event loop; the cookie and session checks need the database and run in a thread.
+    Returns: - The authenticated user or an AnonymousUser. """
+    drf_request = Request(request, authenticators=[CookieJWTAuthentication(), SessionAuthentication()], parser_context={'kwargs': {'movie_id': movie_id}})
+    if signed:
+        user_auth = SignedSegmentAuthentication().authenticate(drf_request)
+        if user_auth is not None:
+            return user_auth[0]
+    return await sync_to_async(lambda: drf_request.user)()
+
+def get_not_authenticated_response():
+    """ Returns the 401 response that DRF sends for unauthenticated requests, for the async streaming views. """
+    response = JsonResponse({'detail': str(NotAuthenticated.default_detail)}, status=status.HTTP_401_UNAUTHORIZED)
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+def get_not_found_response(detail):
+    """ Returns the 404 response that DRF sends for a missing file, for the async streaming views. """
+    return JsonResponse({'detail': detail}, status=status.HTTP_404_NOT_FOUND)
 
 class CustomUserView(viewsets.ModelViewSet):    
     serializer_class = CustomUserSerializer
@@ -68,7 +282,7 @@ class RegistrationView(APIView):
         if serializer.is_valid():
             user = serializer.save()
             token = default_token_generator.make_token(user)
-            queue = get_queue('default')
+            queue = get_queue('email')
             queue.enqueue(send_activation_email_task, user.id)
             
             return Response({"user": {
@@ -216,7 +430,7 @@ class PasswordResetRequestView(APIView):
         if serializer.is_valid():
             user = User.objects.filter(email=serializer.validated_data['email']).first()
             if user:
-                queue = get_queue('default')
+                queue = get_queue('email')
                 queue.enqueue(send_resetPW_email_task, user.id)
             return Response(
                 {'detail': 'An email has been sent to reset your password.'},
@@ -260,7 +474,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         categories = self.get_queryset()
         data = []
         for category in categories:
-            videos = Video.objects.filter(category=category)
+            videos = Video.objects.filter(category=category).select_related('media_info')
             videos_serializer = VideoSerializer(videos, many=True)
             data.append({
                 'category': category.name,
@@ -268,7 +482,7 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return Response(data)
   
 class VideoViewSet(viewsets.ModelViewSet):
-    queryset = Video.objects.all()
+    queryset = Video.objects.select_related('category', 'media_info')
     serializer_class = VideoSerializer
     authentication_classes = [CookieJWTAuthentication, SessionAuthentication]
     permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
@@ -311,27 +525,200 @@ class VideoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(videos, many=True)
         return Response(serializer.data)
 
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    serializer_class = UploadSessionSerializer
+    authentication_classes = [CookieJWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAuthenticated, IsAdminOrReadOnly]
+
+    def get_queryset(self):
+        """ Returns the upload sessions of the authenticated user. """
+        return UploadSession.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        """ Starts a new resumable upload for the user. The file and the Video are created once all chunks are received. """
+        serializer.save(user=self.request.user)
+
+    def partial_update(self, request, pk=None):
+        """ Appends one chunk to a resumable upload. The raw request body is the chunk, the `Upload-Offset` header must match
+        the number of bytes received so far and an optional `Upload-Checksum: sha256 <base64 digest>` header verifies the chunk.
+        After a failed request the client reads the offset of the session and resends from there.
+        When the last chunk is received, the Video is created and its transcode is started. If creating the Video failed,
+        an empty chunk at the final offset completes the upload again. """
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+        if length > settings.UPLOAD_MAX_CHUNK_SIZE:
+            return Response({"error": f"Chunks must not exceed {settings.UPLOAD_MAX_CHUNK_SIZE} bytes"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            checksum = None
+            if 'Upload-Checksum' in request.headers:
+                algorithm, digest = request.headers['Upload-Checksum'].split(' ', 1)
+                if algorithm.lower() != 'sha256':
+                    return Response({"error": "Only sha256 checksums are supported"}, status=status.HTTP_400_BAD_REQUEST)
+                checksum = base64.b64decode(digest, validate=True)
+        except (KeyError, ValueError, binascii.Error):
+            return Response({"error": "Missing or invalid Upload-Offset or Upload-Checksum header"}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            if offset != session.offset or session.video_id:
+                return Response({"error": "Offset does not match the upload", "offset": session.offset}, status=status.HTTP_409_CONFLICT)
+            if length < 1 and session.offset < session.size:
+                return Response({"error": "Empty chunk"}, status=status.HTTP_400_BAD_REQUEST)
+            try:
+                if length:
+                    append_upload_chunk(session, request.stream, length, checksum)
+            except ValueError as e:
+                return Response({"error": str(e), "offset": session.offset}, status=status.HTTP_400_BAD_REQUEST)
+        if session.offset < session.size:
+            return Response({"offset": session.offset, "size": session.size}, headers={'Upload-Offset': str(session.offset)})
+        try:
+            video = complete_upload(session)
+        except ValueError as e:
+            return Response({"error": str(e), "offset": session.offset}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Video created successfully", "video": video.id, "offset": session.offset, "size": session.size},
+                        status=status.HTTP_201_CREATED, headers={'Upload-Offset': str(session.offset)})
+
+    def perform_destroy(self, instance):
+        """ Aborts an upload and deletes the chunks received so far. """
+        part_path = get_upload_part_path(instance)
+        if os.path.isfile(part_path):
+            os.remove(part_path)
+        instance.delete()
+
+def get_manifest_response(request, user, movie_id, file_path, stat, content):
+    """ Returns the response for a rendition playlist that was read by read_manifest, for the sync and the async manifest view.
+    While the video is still being encoded, the partial EVENT playlist is served with 'Cache-Control: no-cache', so players reload
+    it and pick up new segments. Finished playlists are served with HLS_MANIFEST_CACHE_CONTROL. With HLS_SIGNED_SEGMENT_URLS
+    every segment URI is signed for the user and the ETag also covers the signed query, which stays the same within an expiry
+    bucket; otherwise the file is served as it is. Both can be revalidated with their ETag. """
+    is_complete = '#EXT-X-ENDLIST' in content
+    content_type = 'application/vnd.apple.mpegurl'
+    if settings.HLS_SIGNED_SEGMENT_URLS:
+        query = get_segment_query(user.id, movie_id)
+        response = serve_content(request, sign_playlist(content, query), stat, content_type, variant=query)
+    else:
+        response = get_proxy_response(file_path, content_type) or serve_content(request, content, stat, content_type)
+    response['Cache-Control'] = settings.HLS_MANIFEST_CACHE_CONTROL if is_complete else 'no-cache'
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @authentication_classes([CookieJWTAuthentication, SessionAuthentication])
 def serve_hls_manifest(request, movie_id, resolution):
-    """ Serves the HLS manifest file for a specific video.    
-    Returns:    - FileResponse: The HLS manifest file as a response.   """
+    """ Serves the HLS manifest file for a specific video, see get_manifest_response.
+    The playlist is read through the manifest cache, so a player poll only costs a stat of the file while the playlist is unchanged.
+    Returns:    - HttpResponse: The HLS manifest file or the redirect to it for the front proxy.   """
     file_path = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), resolution, 'index.m3u8')
-    if not os.path.exists(file_path):
+    try:
+        stat, content = read_manifest(file_path, movie_id, resolution)
+    except FileNotFoundError:
         raise Http404("Video or Manifest file not found")
-    return FileResponse(open(file_path, 'rb'), content_type='application/vnd.apple.mpegurl')
+    return get_manifest_response(request, request.user, movie_id, file_path, stat, content)
+
+@require_safe
+async def serve_hls_manifest_async(request, movie_id, resolution):
+    """ Async version of serve_hls_manifest for the ASGI server profile. The playlist is read in a worker thread.
+    Returns:    - HttpResponse: The HLS manifest file or the redirect to it for the front proxy.   """
+    user = await get_media_user(request, movie_id)
+    if not user.is_authenticated:
+        return get_not_authenticated_response()
+    file_path = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), resolution, 'index.m3u8')
+    try:
+        stat, content = await sync_to_async(read_manifest, thread_sensitive=False)(file_path, movie_id, resolution)
+    except FileNotFoundError:
+        return get_not_found_response("Video or Manifest file not found")
+    return get_manifest_response(request, user, movie_id, file_path, stat, content)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 @authentication_classes([CookieJWTAuthentication, SessionAuthentication])
-def serve_hls_segment(request, movie_id, resolution, segment):
-    """ Serves an HLS segment file for a specific video.    
-    Returns: - FileResponse: The HLS segment file as a response.   """    
-    file_path = os.path.join(settings.MEDIA_ROOT,'videos', str(movie_id), resolution, segment)
+def serve_hls_master(request, movie_id):
+    """ Serves the adaptive-bitrate HLS master playlist that lists every rendition of a video.    
+    Returns:    - HttpResponse: The HLS master playlist or the redirect to it for the front proxy.   """
+    file_path = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), 'master.m3u8')
+    if not os.path.exists(file_path):
+        raise Http404("Video or Master playlist not found")
+    return serve_media_file(request, file_path, 'application/vnd.apple.mpegurl')
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CookieJWTAuthentication, SessionAuthentication])
+def serve_dash_manifest(request, movie_id):
+    """ Serves the DASH manifest of a video that was packaged with the 'cmaf' delivery profile.
+    The manifest references the same CMAF segments as the HLS playlists.
+    Returns:    - HttpResponse: The DASH manifest or the redirect to it for the front proxy.   """
+    file_path = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), 'manifest.mpd')
     if not os.path.exists(file_path):
+        raise Http404("Video or DASH manifest not found")
+    return serve_media_file(request, file_path, 'application/dash+xml')
+
+def get_segment_entry(movie_id, resolution, segment):
+    """ Looks up a segment in the segment index of its rendition. Invalid and unknown names are rejected without touching the disk;
+    renditions without an index, e.g. while they are published progressively, are checked on disk.
+    Returns: - tuple: The path of the segment and its index entry, or None as entry if the rendition has no index.
+    Raises: - Http404: If the name is invalid or the segment does not exist. """
+    if not (is_valid_media_name(resolution) and is_valid_media_name(segment)):
+        raise Http404("Video or Segment file not found")
+    folder = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), resolution)
+    file_path = os.path.join(folder, segment)
+    index = get_segment_index(folder)
+    if index is None and os.path.exists(file_path):
+        return file_path, None
+    if index is None or segment not in index:
+        raise Http404("Video or Segment file not found")
+    return file_path, index[segment]
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([SignedSegmentAuthentication, CookieJWTAuthentication, SessionAuthentication])
+def serve_hls_segment(request, movie_id, resolution, segment):
+    """ Serves an HLS segment file for a specific video. MPEG-TS segments, CMAF segments and their init.mp4 are supported.    
+    A segment URL signed by serve_hls_manifest is checked without a database lookup; unsigned requests need the login cookie.
+    Range requests are answered with the requested bytes, so byte-range renditions can be played from their single media file.
+    Names are checked against the segment index of the rendition, which also gives the size and validators without a stat.
+    Files of finished renditions, which are listed in their segment index, never change and are served with the long
+    HLS_SEGMENT_CACHE_CONTROL lifetime; files of renditions without an index, e.g. while they are published progressively,
+    are revalidated with their ETag instead.
+    Returns: - HttpResponse: The HLS segment file, the requested byte range or the redirect to the file for the front proxy.   """    
+    file_path, entry = get_segment_entry(movie_id, resolution, segment)
+    extension = os.path.splitext(segment)[1]
+    try:
+        response = serve_media_file(request, file_path, SEGMENT_CONTENT_TYPES.get(extension, 'video/MP2T'), entry)
+    except FileNotFoundError:
         raise Http404("Video or Segment file not found")
-    return FileResponse(open(file_path, 'rb'), content_type='video/MP2T')
+    response['Cache-Control'] = settings.HLS_SEGMENT_CACHE_CONTROL if entry is not None else 'no-cache'
+    return response
+
+@require_safe
+async def serve_hls_segment_async(request, movie_id, resolution, segment):
+    """ Async version of serve_hls_segment for the ASGI server profile. The segment is streamed with non-blocking reads,
+    so a slow client only holds a coroutine instead of a worker process.
+    Returns: - HttpResponse: The HLS segment file, the requested byte range or the redirect to the file for the front proxy.   """
+    user = await get_media_user(request, movie_id, signed=True)
+    if not user.is_authenticated:
+        return get_not_authenticated_response()
+    try:
+        file_path, entry = await sync_to_async(get_segment_entry, thread_sensitive=False)(movie_id, resolution, segment)
+    except Http404 as e:
+        return get_not_found_response(str(e))
+    extension = os.path.splitext(segment)[1]
+    try:
+        response = await aserve_media_file(request, file_path, SEGMENT_CONTENT_TYPES.get(extension, 'video/MP2T'), entry)
+    except FileNotFoundError:
+        return get_not_found_response("Video or Segment file not found")
+    response['Cache-Control'] = settings.HLS_SEGMENT_CACHE_CONTROL if entry is not None else 'no-cache'
+    return response
+    
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@authentication_classes([CookieJWTAuthentication, SessionAuthentication])
+def serve_trickplay(request, movie_id, filename):
+    """ Serves the WebVTT index 'thumbnails.vtt' or a sprite sheet of the trickplay scrub previews of a video.
+    Returns: - HttpResponse: The WebVTT file, the sprite sheet or the redirect to it for the front proxy.   """
+    content_type = TRICKPLAY_CONTENT_TYPES.get(os.path.splitext(filename)[1])
+    file_path = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), 'trickplay', filename)
+    if not content_type or not os.path.exists(file_path):
+        raise Http404("Video or Trickplay file not found")
+    return serve_media_file(request, file_path, content_type)
     
 class WatchlistViewSet(viewsets.ModelViewSet):
     serializer_class = WatchlistSerializer
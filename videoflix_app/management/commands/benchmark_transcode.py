@@ -0,0 +1,178 @@
+import os
+import json
+import glob
+import time
+import shutil
+import resource
+import tempfile
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from videoflix_app.api.tasks import (TranscodeError, probe_media, extract_thumbnail, analyze_complexity, get_per_title_encoding,
+                                     generate_hls_ladder, generate_hls_chunked, get_resolution_size, get_folder_size, measure_quality)
+
+FIXTURES_FOLDER = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets')
+
+
+class Command(BaseCommand):
+    help = ("Runs the thumbnail and HLS pipeline on the bundled test videos and reports wall time, CPU seconds, "
+            "output bytes, PSNR and SSIM of every rendition as JSON, so runs can be compared over time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='*', help="Video files to encode, defaults to every .mp4 in videoflix_app/tests/assets")
+        parser.add_argument('--resolutions', nargs='+', default=['360', '480', '720'], help="Resolutions of the ladder")
+        parser.add_argument('--segment-type', choices=['mpegts', 'fmp4'], default='mpegts')
+        parser.add_argument('--chunked', action='store_true', help="Encode with generate_hls_chunked instead of generate_hls_ladder")
+        parser.add_argument('--output', help="Path of the JSON report, defaults to benchmarks/transcode_<timestamp>.json")
+        parser.add_argument('--compare', help="Path of an earlier JSON report to print the changes against")
+        parser.add_argument('--label', default='', help="Free text stored in the report, e.g. the tested change")
+
+    def handle(self, *args, **options):
+        fixtures = options['fixtures'] or sorted(glob.glob(os.path.join(FIXTURES_FOLDER, '*.mp4')))
+        missing = [path for path in fixtures if not os.path.isfile(path)]
+        if not fixtures or missing:
+            raise CommandError(f"Fixture not found: {', '.join(missing) or FIXTURES_FOLDER}")
+        report = {
+            'label': options['label'],
+            'created_at': timezone.now().isoformat(),
+            'ffmpeg': get_ffmpeg_version(),
+            'options': {
+                'resolutions': options['resolutions'],
+                'segment_type': options['segment_type'],
+                'chunked': options['chunked'],
+                'shared_audio': settings.HLS_SHARED_AUDIO,
+                'per_title_encoding': settings.HLS_PER_TITLE_ENCODING,
+            },
+            'fixtures': [],
+        }
+        for path in fixtures:
+            self.stdout.write(f"Benchmarking {os.path.basename(path)} ...")
+            try:
+                report['fixtures'].append(self.benchmark_fixture(path, options))
+            except TranscodeError as e:
+                raise CommandError(f"ffmpeg failed on {path}: {e.stderr.decode()[-2000:]}")
+        output = options['output'] or os.path.join(settings.BASE_DIR, 'benchmarks', f"transcode_{timezone.now():%Y%m%d_%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.print_summary(report)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.print_comparison(json.load(f), report)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
+
+    def benchmark_fixture(self, path, options):
+        """ Encodes one fixture into a temporary folder and returns its measurements. """
+
+        info = probe_media(path)
+        work_folder = tempfile.mkdtemp(prefix='benchmark_')
+        try:
+            steps = {}
+            with measure(steps, 'thumbnail'):
+                extract_thumbnail(path, os.path.join(work_folder, 'thumb.jpg'), info['duration'])
+            encoding = None
+            if settings.HLS_PER_TITLE_ENCODING:
+                with measure(steps, 'analysis'):
+                    complexity = analyze_complexity(path, info['duration'], info['frame_rate'])
+                encoding = get_per_title_encoding(complexity, options['resolutions'], info['frame_rate'])
+            output_root = os.path.join(work_folder, 'hls')
+            hls_options = {'duration': info['duration'], 'has_audio': bool(info['audio_codec']), 'segment_type': options['segment_type'],
+                           'separate_audio': settings.HLS_SHARED_AUDIO or options['segment_type'] == 'fmp4', 'encoding': encoding}
+            with measure(steps, 'hls'):
+                if options['chunked']:
+                    generate_hls_chunked(path, output_root, options['resolutions'], settings.HLS_CHUNK_SECONDS, settings.HLS_CHUNK_WORKERS, **hls_options)
+                else:
+                    generate_hls_ladder(path, output_root, options['resolutions'], **hls_options)
+            steps['hls']['realtime_factor'] = round(info['duration'] / max(steps['hls']['wall_seconds'], 0.001), 2)
+            renditions = {}
+            for resolution in options['resolutions']:
+                folder = os.path.join(output_root, f'{resolution}p')
+                width, height = get_resolution_size(str(resolution))
+                psnr, ssim = measure_quality(os.path.join(folder, 'index.m3u8'), path, width, height)
+                size = get_folder_size(folder)
+                renditions[str(resolution)] = {
+                    'bytes': size,
+                    'bitrate': int(size * 8 / info['duration']),
+                    'crf': encoding[str(resolution)]['crf'] if encoding else 20,
+                    'psnr': round(psnr, 3),
+                    'ssim': round(ssim, 5),
+                }
+            return {
+                'name': os.path.basename(path),
+                'duration': info['duration'],
+                'width': info['width'],
+                'height': info['height'],
+                'steps': steps,
+                'renditions': renditions,
+                'audio_bytes': get_folder_size(os.path.join(output_root, 'audio')),
+            }
+        finally:
+            shutil.rmtree(work_folder, ignore_errors=True)
+
+    def print_summary(self, report):
+        """ Prints one line per fixture step and rendition. """
+
+        for fixture in report['fixtures']:
+            for name, step in fixture['steps'].items():
+                self.stdout.write(f"{fixture['name']:<20} {name:<10} {step['wall_seconds']:>8.2f}s wall {step['cpu_seconds']:>8.2f}s cpu")
+            for resolution, rendition in fixture['renditions'].items():
+                self.stdout.write(f"{fixture['name']:<20} {resolution + 'p':<10} {rendition['bytes']:>10} bytes "
+                                  f"PSNR {rendition['psnr']:>6.2f} dB SSIM {rendition['ssim']:.4f}")
+
+    def print_comparison(self, previous, report):
+        """ Prints the relative change of time, size and quality against an earlier report for every fixture in both. """
+
+        earlier = {fixture['name']: fixture for fixture in previous['fixtures']}
+        for fixture in report['fixtures']:
+            old = earlier.get(fixture['name'])
+            if not old:
+                continue
+            for name, step in fixture['steps'].items():
+                if name in old['steps']:
+                    self.stdout.write(f"{fixture['name']:<20} {name:<10} wall {get_change(old['steps'][name]['wall_seconds'], step['wall_seconds'])} "
+                                      f"cpu {get_change(old['steps'][name]['cpu_seconds'], step['cpu_seconds'])}")
+            for resolution, rendition in fixture['renditions'].items():
+                if resolution in old['renditions']:
+                    before = old['renditions'][resolution]
+                    self.stdout.write(f"{fixture['name']:<20} {resolution + 'p':<10} bytes {get_change(before['bytes'], rendition['bytes'])} "
+                                      f"PSNR {rendition['psnr'] - before['psnr']:+.2f} dB SSIM {rendition['ssim'] - before['ssim']:+.4f}")
+
+
+class measure:
+    """ Context manager that stores the wall time and the CPU seconds of this process and its ffmpeg children under 'name'. """
+
+    def __init__(self, steps, name):
+        self.steps, self.name = steps, name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.cpu = get_cpu_seconds()
+
+    def __exit__(self, *exc_info):
+        self.steps[self.name] = {
+            'wall_seconds': round(time.perf_counter() - self.started, 3),
+            'cpu_seconds': round(get_cpu_seconds() - self.cpu, 3),
+        }
+
+
+def get_cpu_seconds():
+    """ Returns the user and system CPU seconds of this process and of all finished child processes, e.g. ffmpeg. """
+
+    own, children = resource.getrusage(resource.RUSAGE_SELF), resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def get_change(before, after):
+    """ Returns the relative change between two measurements as a signed percentage. """
+
+    return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+
+def get_ffmpeg_version():
+    """ Returns the first line of 'ffmpeg -version', so reports of different ffmpeg builds can be told apart. """
+
+    try:
+        return subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.splitlines()[0]
+    except (OSError, IndexError):
+        return ''
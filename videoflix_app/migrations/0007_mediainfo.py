@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0006_transcodejob_rendition'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='video',
+            name='duration',
+            field=models.PositiveIntegerField(default=0, help_text='Duration in minutes, filled in from the probed media info'),
+        ),
+        migrations.CreateModel(
+            name='MediaInfo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('duration', models.FloatField(help_text='Duration in seconds')),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('video_codec', models.CharField(max_length=30)),
+                ('audio_codec', models.CharField(blank=True, help_text='Empty if the source has no audio', max_length=30)),
+                ('bitrate', models.PositiveIntegerField(blank=True, help_text='Bitrate in bits per second', null=True)),
+                ('frame_rate', models.FloatField(blank=True, null=True)),
+                ('keyframe_interval', models.FloatField(blank=True, help_text='Average keyframe interval in seconds', null=True)),
+                ('probed_at', models.DateTimeField(auto_now_add=True)),
+                ('video', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='media_info', to='videoflix_app.video')),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0007_mediainfo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rendition',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='queued', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='transcodejob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='queued', max_length=10),
+        ),
+    ]
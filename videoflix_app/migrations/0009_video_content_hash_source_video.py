@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0008_alter_rendition_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the uploaded source file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='source_video',
+            field=models.ForeignKey(blank=True, help_text='Video whose source file and renditions are reused by this duplicate upload', null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='duplicates', to='videoflix_app.video'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:20
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0009_video_content_hash_source_video'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField(help_text='Total size of the file in bytes')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Number of bytes received so far')),
+                ('checksum', models.CharField(blank=True, help_text='Expected SHA-256 of the complete file', max_length=64)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.TextField()),
+                ('is_featured', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='videoflix_app.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+                ('video', models.OneToOneField(blank=True, help_text='Video created when the upload was completed', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_session', to='videoflix_app.video')),
+            ],
+        ),
+    ]
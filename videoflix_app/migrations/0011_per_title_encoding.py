@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videoflix_app', '0010_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediainfo',
+            name='complexity',
+            field=models.FloatField(blank=True, help_text='Bits per pixel of the per-title sample encodes', null=True),
+        ),
+        migrations.AddField(
+            model_name='rendition',
+            name='crf',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rendition',
+            name='max_bitrate',
+            field=models.PositiveIntegerField(blank=True, help_text='Bitrate cap in bits per second', null=True),
+        ),
+    ]
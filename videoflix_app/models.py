@@ -1,3 +1,4 @@
+import uuid
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
@@ -15,16 +16,35 @@ class Category(models.Model):
 class Video(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
-    duration = models.PositiveIntegerField(help_text="Duration in minutes")
+    duration = models.PositiveIntegerField(default=0, help_text="Duration in minutes, filled in from the probed media info")
     category = models.ForeignKey(Category, on_delete=models.CASCADE)
     thumbnail = models.ImageField(upload_to='images/', null=True, blank=True)
     video_file = models.FileField(upload_to='videos/', null=True, blank=True) 
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)   
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, help_text="SHA-256 of the uploaded source file")
+    source_video = models.ForeignKey('self', on_delete=models.DO_NOTHING, null=True, blank=True, related_name='duplicates',
+                                     help_text="Video whose source file and renditions are reused by this duplicate upload")
     def __str__(self):
         return self.title  
 
+class MediaInfo(models.Model):
+    video = models.OneToOneField(Video, on_delete=models.CASCADE, related_name='media_info')
+    duration = models.FloatField(help_text="Duration in seconds")
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    video_codec = models.CharField(max_length=30)
+    audio_codec = models.CharField(max_length=30, blank=True, help_text="Empty if the source has no audio")
+    bitrate = models.PositiveIntegerField(null=True, blank=True, help_text="Bitrate in bits per second")
+    frame_rate = models.FloatField(null=True, blank=True)
+    keyframe_interval = models.FloatField(null=True, blank=True, help_text="Average keyframe interval in seconds")
+    complexity = models.FloatField(null=True, blank=True, help_text="Bits per pixel of the per-title sample encodes")
+    probed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.video.title} ({self.width}x{self.height}, {self.duration:.0f}s)"
+
 class WatchHistory(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     video = models.ForeignKey(Video, on_delete=models.CASCADE)
@@ -45,4 +65,65 @@ class Watchlist(models.Model):
 class WatchlistEntry(models.Model):
     watchlist = models.ForeignKey(Watchlist, on_delete=models.CASCADE)
     video = models.ForeignKey(Video, on_delete=models.CASCADE)
-    added_on = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    added_on = models.DateTimeField(auto_now_add=True)
+
+class TranscodeJob(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_SKIPPED = 'skipped'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+        (STATUS_SKIPPED, 'Skipped'),
+    ]
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='transcode_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Progress in percent")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Transcode of {self.video.title} ({self.status})"
+
+class Rendition(models.Model):
+    job = models.ForeignKey(TranscodeJob, on_delete=models.CASCADE, related_name='renditions')
+    resolution = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=TranscodeJob.STATUS_CHOICES, default=TranscodeJob.STATUS_QUEUED)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    output_size = models.PositiveBigIntegerField(null=True, blank=True, help_text="Output size in bytes")
+    exit_code = models.IntegerField(null=True, blank=True)
+    crf = models.PositiveSmallIntegerField(null=True, blank=True)
+    max_bitrate = models.PositiveIntegerField(null=True, blank=True, help_text="Bitrate cap in bits per second")
+
+    class Meta:
+        unique_together = ('job', 'resolution')
+
+    def __str__(self):
+        return f"{self.job.video.title} {self.resolution}p ({self.status})"
+
+class UploadSession(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField(help_text="Total size of the file in bytes")
+    offset = models.PositiveBigIntegerField(default=0, help_text="Number of bytes received so far")
+    checksum = models.CharField(max_length=64, blank=True, help_text="Expected SHA-256 of the complete file")
+    title = models.CharField(max_length=100)
+    description = models.TextField()
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    is_featured = models.BooleanField(default=False)
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload_session',
+                                 help_text="Video created when the upload was completed")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes)"
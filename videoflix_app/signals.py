@@ -1,18 +1,32 @@
 from .models import Video
 from django.dispatch import receiver
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete
-from .api.tasks import convert_resolution, generate_and_save_thumbnail_task, generate_hls
-import os, django_rq, shutil
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from .api.tasks import get_progressive_path, get_file_hash, link_duplicate_video, promote_duplicate_video, enqueue_video_processing, cancel_video_jobs
+import os, shutil
+
+
+@receiver(pre_save, sender=Video)
+def video_pre_save(sender, instance, **kwargs):
+    """Store the SHA-256 content hash of a newly uploaded source file before it is saved.
+    **Parameters:**
+      - sender (Video): The model class that sent the signal.
+      - instance (Video): The Video instance that is about to be saved."""
+    if instance.video_file and not instance.video_file._committed:
+        instance.content_hash = get_file_hash(instance.video_file.file)
 
 
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):       
     """Handle post-save signals for Video instances.
-    If the Video instance is newly created, it performs the following tasks:
-        - Enqueues a task to convert the video file to different resolutions.
-        - Enqueues a task to generate a thumbnail from the video file.
-        - Enqueues a task to generate an HLS stream for each resolution.    
+    If the Video instance is newly created and its content hash matches an existing upload, it reuses the
+    files and renditions of that video instead of encoding again. Otherwise it performs the following tasks:
+        - Enqueues a task to generate a thumbnail on the 'thumbnail' queue and one for the trickplay sprite sheets on the 'transcode' queue.
+        - Enqueues a task that writes one progressive MP4 fallback on the 'transcode' queue, only for the 'hls+mp4' delivery profile.
+        - Creates a TranscodeJob with one Rendition per resolution and enqueues a single task on the 'transcode' queue
+          that generates the HLS streams for all resolutions in one ffmpeg run.
+    The jobs get deterministic ids (e.g. '<prefix>-hls-<video_id>') and are not enqueued again while a job with the same id
+    is queued or running. The job ids are remembered per video, so the jobs can be cancelled when the video is deleted.
     **Parameters:**
       - sender (Video): The model class that sent the signal.
       - instance (Video): The Video instance that was saved.
@@ -20,34 +34,54 @@ def video_post_save(sender, instance, created, **kwargs):
     if created:
         if not instance.video_file:            
             return       
-        queue = django_rq.get_queue('default', autocommit=True)
-        widths = [120, 360, 480, 720, 1080]
-        for width in widths:
-            queue.enqueue(convert_resolution, instance.video_file.path, width)
-        queue.enqueue(generate_and_save_thumbnail_task, instance.id)
-        video_path = os.path.join(settings.MEDIA_ROOT, 'videos', os.path.basename(instance.video_file.name))        
-        hls_output_folder = os.path.join(settings.MEDIA_ROOT, 'videos', str(instance.id))
-        for res in widths:
-            output_folder = os.path.join(hls_output_folder, f'{res}p')
-            queue.enqueue(generate_hls, video_path, output_folder, str(res))
+        original = Video.objects.filter(content_hash=instance.content_hash, source_video__isnull=True).exclude(id=instance.id).order_by('id').first() if instance.content_hash else None
+        if original:
+            link_duplicate_video(instance, original)
+            return
+        enqueue_video_processing(instance)
         
 
+@receiver(pre_delete, sender=Video)
+def video_pre_delete(sender, instance, **kwargs):
+    """Handle pre-delete signals for Video instances.
+    Queued background jobs of the video are cancelled and running ones are stopped, so no worker keeps writing its files.
+    If other uploads are duplicates of the video, its HLS folder is handed over to the oldest duplicate before the jobs are cancelled.
+    If jobs were cancelled or stopped, their work is unfinished, so the oldest duplicate gets its own thumbnail, trickplay and transcode jobs.
+    **Args:**
+      - sender: The model class that sent the signal.
+      - instance: The actual instance being deleted.
+      - **kwargs: Additional keyword arguments.    """
+    heir = promote_duplicate_video(instance)
+    if cancel_video_jobs(instance.id) and heir:
+        enqueue_video_processing(heir)
+
+
 @receiver(post_delete, sender=Video)
 def video_post_delete(sender, instance, **kwargs):
     """Handle post-delete signals for Video instances.
-    When a Video instance is deleted, it cleans up by removing associated video files, thumbnail images, and HLS folders from the file system.
+    When a Video instance is deleted, it cleans up by removing associated video files, the progressive MP4 fallback, the extracted thumbnail frame, thumbnail images, and HLS folders from the file system.
+    Source files and thumbnails that are still shared with a duplicate upload are kept.
     **Args:**
       - sender: The model class that sent the signal.
       - instance: The actual instance being deleted.
       - **kwargs: Additional keyword arguments.    """
-    if instance.video_file:
+    if instance.video_file and not Video.objects.filter(video_file=instance.video_file.name).exists():
        if os.path.isfile(instance.video_file.path):
            os.remove(instance.video_file.path)
            print('Video is deleted')    
-    if instance.thumbnail and os.path.isfile(instance.thumbnail.path):
+       progressive_path = get_progressive_path(instance.video_file.path, settings.VIDEO_PROGRESSIVE_RESOLUTION)
+       if os.path.isfile(progressive_path):
+           os.remove(progressive_path)
+           print(f"Progressive fallback deleted: {progressive_path}")
+       frame_path = f'{os.path.splitext(instance.video_file.path)[0]}_thumb.jpg'
+       if os.path.isfile(frame_path):
+           os.remove(frame_path)
+    if instance.thumbnail and os.path.isfile(instance.thumbnail.path) and not Video.objects.filter(thumbnail=instance.thumbnail.name).exists():
         os.remove(instance.thumbnail.path)
         print(f"Thumbnail deleted: {instance.thumbnail.path}")        
     hls_folder = os.path.join(settings.MEDIA_ROOT, 'videos', str(instance.id))
-    if os.path.isdir(hls_folder):
+    if os.path.islink(hls_folder):
+        os.unlink(hls_folder)
+    elif os.path.isdir(hls_folder):
         shutil.rmtree(hls_folder)
         print(f"HLS folder deleted: {hls_folder}")
\ No newline at end of file
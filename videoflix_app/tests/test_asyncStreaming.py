@@ -0,0 +1,108 @@
+import os
+import json
+import shutil
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase, AsyncRequestFactory, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from videoflix_app.api.authentication import CookieJWTAuthentication, get_segment_query
+from videoflix_app.api.views import serve_hls_manifest_async, serve_hls_segment_async
+from videoflix_app.api.tasks import write_segment_index
+from videoflix_app.api.segment_index import clear_segment_indexes
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), MEDIA_DELIVERY_MODE='django', HLS_SIGNED_SEGMENT_URLS=True)
+class AsyncStreamingTests(TestCase):
+
+    def setUp(self):
+        """ Sets up a user with an access token cookie and a finished rendition with a playlist, a fake segment and its segment index. """
+
+        clear_segment_indexes()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.factory = AsyncRequestFactory()
+        self.factory.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+        self.output_folder = os.path.join(settings.MEDIA_ROOT, 'videos', '1', '480p')
+        os.makedirs(self.output_folder)
+        with open(os.path.join(self.output_folder, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:VOD\n#EXTINF:4.0,\nsegment_000.ts\n#EXT-X-ENDLIST\n')
+        self.segment = bytes(range(256)) * 1024
+        with open(os.path.join(self.output_folder, 'segment_000.ts'), 'wb') as f:
+            f.write(self.segment)
+        write_segment_index(self.output_folder)
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    async def _read(self, response):
+        """ Returns the body of a response that streams an async iterator. """
+
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_segment_is_streamed(self):
+        """ Tests that the async segment view streams the whole segment in blocks with its length and cache headers. """
+
+        response = await serve_hls_segment_async(self.factory.get('/api/video/1/480p/segment_000.ts/'), 1, '480p', 'segment_000.ts')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Length'], str(len(self.segment)))
+        self.assertEqual(response['Cache-Control'], settings.HLS_SEGMENT_CACHE_CONTROL)
+        self.assertEqual(await self._read(response), self.segment)
+
+    async def test_segment_range_is_streamed(self):
+        """ Tests that a Range request gets 206 Partial Content with exactly the requested bytes. """
+
+        request = self.factory.get('/api/video/1/480p/segment_000.ts/', headers={'Range': 'bytes=100000-199999'})
+        response = await serve_hls_segment_async(request, 1, '480p', 'segment_000.ts')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 100000-199999/{len(self.segment)}')
+        self.assertEqual(await self._read(response), self.segment[100000:200000])
+
+    async def test_signed_segment_skips_cookie_authentication(self):
+        """ Tests that a signed segment URL is served on the event loop without the cookie authentication and its database lookup. """
+
+        request = self.factory.get(f'/api/video/1/480p/segment_000.ts/?{get_segment_query(self.user.id, 1)}')
+        with mock.patch.object(CookieJWTAuthentication, 'authenticate', side_effect=AssertionError('cookie authentication used')):
+            response = await serve_hls_segment_async(request, 1, '480p', 'segment_000.ts')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    async def test_unauthenticated_request_is_rejected(self):
+        """ Tests that the async views answer requests without a login or signature with 401. """
+
+        self.factory.cookies.clear()
+        response = await serve_hls_segment_async(self.factory.get('/api/video/1/480p/segment_000.ts/'), 1, '480p', 'segment_000.ts')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = await serve_hls_manifest_async(self.factory.get('/api/video/1/480p/index.m3u8'), 1, '480p')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_manifest_is_signed(self):
+        """ Tests that the async manifest view serves the playlist with signed segment URIs. """
+
+        response = await serve_hls_manifest_async(self.factory.get('/api/video/1/480p/index.m3u8'), 1, '480p')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        self.assertIn(f'segment_000.ts/?user={self.user.id}&expires=', response.content.decode())
+
+    async def test_missing_files_get_not_found(self):
+        """ Tests that a missing segment or playlist gets the same 404 JSON response as from the sync views. """
+
+        response = await serve_hls_segment_async(self.factory.get('/api/video/1/480p/segment_999.ts/'), 1, '480p', 'segment_999.ts')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(json.loads(response.content), {'detail': 'Video or Segment file not found'})
+        response = await serve_hls_manifest_async(self.factory.get('/api/video/1/720p/index.m3u8'), 1, '720p')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(json.loads(response.content), {'detail': 'Video or Manifest file not found'})
+
+    async def test_head_request_is_answered(self):
+        """ Tests that the async views answer HEAD requests like the sync views and reject other unsafe methods. """
+
+        response = await serve_hls_segment_async(self.factory.head('/api/video/1/480p/segment_000.ts/'), 1, '480p', 'segment_000.ts')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Length'], str(len(self.segment)))
+        response = await serve_hls_manifest_async(self.factory.head('/api/video/1/480p/index.m3u8'), 1, '480p')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = await serve_hls_manifest_async(self.factory.post('/api/video/1/480p/index.m3u8'), 1, '480p')
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
@@ -0,0 +1,62 @@
+import os
+import io
+import json
+import shutil
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), HLS_PER_TITLE_ENCODING=False)
+class BenchmarkCommandTests(TestCase):
+
+    def setUp(self):
+        """ Sets up the sample video and the report path for the benchmark command tests. """
+
+        self.sample_video = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        assert os.path.exists(self.sample_video), "small.mp4 no found in tests/assets"
+        self.report_path = os.path.join(settings.MEDIA_ROOT, 'report.json')
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _run(self, *args):
+        """ Runs the benchmark command on the sample video and returns its console output. """
+
+        out = io.StringIO()
+        call_command('benchmark_transcode', self.sample_video, '--resolutions', '360', '--segment-type', 'fmp4', *args, stdout=out)
+        return out.getvalue()
+
+    def test_report_contains_timings_sizes_and_quality(self):
+        """ Tests that the JSON report lists the timings of every step and the size and quality of every rendition. """
+
+        self._run('--output', self.report_path, '--label', 'baseline')
+        with open(self.report_path) as f:
+            report = json.load(f)
+        self.assertEqual(report['label'], 'baseline')
+        fixture = report['fixtures'][0]
+        self.assertEqual(fixture['name'], 'small.mp4')
+        self.assertEqual(set(fixture['steps']), {'thumbnail', 'hls'})
+        self.assertGreater(fixture['steps']['hls']['wall_seconds'], 0)
+        self.assertGreater(fixture['steps']['hls']['cpu_seconds'], 0)
+        rendition = fixture['renditions']['360']
+        self.assertGreater(rendition['bytes'], 0)
+        self.assertGreater(rendition['psnr'], 30)
+        self.assertTrue(0 < rendition['ssim'] <= 1)
+
+    def test_compare_prints_changes(self):
+        """ Tests that a report can be compared against an earlier one of the same fixtures. """
+
+        self._run('--output', self.report_path)
+        output = self._run('--output', self.report_path + '.new', '--compare', self.report_path)
+        self.assertIn('bytes +0.0%', output)
+
+    def test_missing_fixture_raises(self):
+        """ Tests that a missing fixture stops the command with an error. """
+
+        with self.assertRaises(CommandError):
+            call_command('benchmark_transcode', 'missing.mp4', stdout=io.StringIO())
@@ -0,0 +1,106 @@
+import os
+import shutil
+import ffmpeg
+from urllib.parse import urljoin
+from xml.etree import ElementTree
+from django.conf import settings
+from django.test import override_settings
+from django.urls import resolve
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from videoflix_app.api.tasks import generate_hls_ladder, write_dash_manifest
+from videoflix_app.api.segment_index import clear_segment_indexes
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class DashManifestTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up the test environment for the CMAF packaging and DASH manifest tests.
+        - Creates a test user and assigns an access token for authentication.
+        - Renders a short test video with an audio track, because the sample video has none.
+        - Generates a CMAF ladder with a separate audio rendition and its DASH manifest. """
+
+        clear_segment_indexes()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.cookies['access_token'] = str(refresh.access_token)
+        self.movie_id = 1
+        self.output_root = os.path.join(settings.MEDIA_ROOT, 'videos', str(self.movie_id))
+        os.makedirs(self.output_root)
+        self.sample_video = os.path.join(settings.MEDIA_ROOT, 'source.mp4')
+        ffmpeg.output(ffmpeg.input('testsrc=duration=3:size=320x240:rate=25', f='lavfi'), ffmpeg.input('sine=duration=3', f='lavfi'),
+                      self.sample_video, vcodec='libx264', acodec='aac').run(quiet=True)
+        generate_hls_ladder(self.sample_video, self.output_root, ['360', '480'], segment_type='fmp4', separate_audio=True)
+        self.manifest = write_dash_manifest(self.output_root, ['360', '480'])
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_audio_is_written_once_as_group(self):
+        """ Tests that the audio is written once into its own rendition and referenced as an audio group by the master playlist. """
+
+        self.assertTrue(os.path.exists(os.path.join(self.output_root, 'audio', 'init.mp4')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_root, 'audio', 'index.m3u8')))
+        with open(os.path.join(self.output_root, 'master.m3u8')) as f:
+            content = f.read()
+        self.assertIn('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio"', content)
+        self.assertIn('URI="audio/index.m3u8"', content)
+        self.assertEqual(content.count('AUDIO="audio"'), 2)
+
+    def test_manifest_references_cmaf_segments(self):
+        """ Tests that the DASH manifest lists a video and an audio adaptation set built from the HLS segments. """
+
+        self.assertEqual(self.manifest, os.path.join(self.output_root, 'manifest.mpd'))
+        with open(self.manifest) as f:
+            content = f.read()
+        self.assertIn('type="static"', content)
+        self.assertIn('profiles="urn:mpeg:dash:profile:isoff-main:2011"', content)
+        self.assertIn('mimeType="video/mp4"', content)
+        self.assertIn('mimeType="audio/mp4"', content)
+        self.assertIn('<Initialization sourceURL="360p/init.mp4/"/>', content)
+        self.assertIn('<SegmentURL media="480p/segment_000.m4s/"/>', content)
+        self.assertIn('<SegmentURL media="audio/segment_000.m4s/"/>', content)
+        self.assertLess(content.index('id="360p"'), content.index('id="480p"'))
+
+    def test_manifest_urls_resolve_to_segment_view(self):
+        """ Tests that every init and media URL of the manifest resolves to the segment view and is served without a redirect. """
+
+        manifest_url = f'/api/video/{self.movie_id}/manifest.mpd'
+        tree = ElementTree.parse(self.manifest)
+        namespace = {'mpd': 'urn:mpeg:dash:schema:mpd:2011'}
+        urls = [element.get('sourceURL') for element in tree.iterfind('.//mpd:Initialization', namespace)]
+        urls += [element.get('media') for element in tree.iterfind('.//mpd:SegmentURL', namespace)]
+        self.assertTrue(urls)
+        for url in urls:
+            with self.subTest(url=url):
+                path = urljoin(manifest_url, url)
+                self.assertEqual(resolve(path).url_name, 'serve_hls_segment')
+                self.assertEqual(self.client.get(path).status_code, status.HTTP_200_OK)
+
+    def test_mpegts_ladder_has_no_manifest(self):
+        """ Tests that no DASH manifest is written for renditions with MPEG-TS segments. """
+
+        shutil.rmtree(self.output_root)
+        generate_hls_ladder(self.sample_video, self.output_root, ['360'])
+        self.assertIsNone(write_dash_manifest(self.output_root, ['360']))
+        self.assertFalse(os.path.exists(os.path.join(self.output_root, 'audio')))
+
+    def test_manifest_is_served(self):
+        """ Tests that the DASH manifest is served with the DASH content type. """
+
+        response = self.client.get(f'/api/video/{self.movie_id}/manifest.mpd')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/dash+xml')
+        self.assertIn(b'<MPD', b''.join(response.streaming_content))
+
+    def test_manifest_not_found(self):
+        """ Tests that a 404 Not Found status code is returned for a video without a DASH manifest. """
+
+        response = self.client.get('/api/video/999/manifest.mpd')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,105 @@
+import os
+import shutil
+import hashlib
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from videoflix_app.models import Category, Video, TranscodeJob, Rendition
+from videoflix_app.api.upload_handlers import ContentHashUploadHandler
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class DeduplicationTests(TestCase):
+
+    def setUp(self):
+        """ Sets up a user, a category and an original video with a fake HLS folder and thumbnail. """
+
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.category = Category.objects.create(name="TestCategory")
+        self.content = b"same master file"
+        self.original = self._create_video()
+        self.original.thumbnail.save('thumb.jpg', SimpleUploadedFile('thumb.jpg', b"jpg"))
+        self.videos_root = os.path.join(settings.MEDIA_ROOT, 'videos')
+        os.makedirs(os.path.join(self.videos_root, str(self.original.id), '480p'))
+        with open(os.path.join(self.videos_root, str(self.original.id), '480p', 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U')
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _create_video(self, content=None):
+        """ Creates a video with the given upload content. """
+
+        upload = SimpleUploadedFile('movie.mp4', content or self.content, content_type='video/mp4')
+        return Video.objects.create(title="Video", description="Desc", duration=1, category=self.category, user=self.user, video_file=upload)
+
+    def test_upload_handler_hashes_while_streaming(self):
+        """ Tests that the upload handler stores the SHA-256 of the streamed chunks on the uploaded file. """
+
+        handler = ContentHashUploadHandler()
+        handler.new_file('video_file', 'movie.mp4', 'video/mp4', None)
+        handler.receive_data_chunk(b"same ", 0)
+        handler.receive_data_chunk(b"master file", 5)
+        uploaded = handler.file_complete(16)
+        self.assertEqual(uploaded.content_hash, hashlib.sha256(self.content).hexdigest())
+        uploaded.close()
+
+    def test_duplicate_upload_reuses_original_outputs(self):
+        """ Tests that a duplicate upload links to the source file, thumbnail and HLS folder of the original. """
+
+        duplicate = self._create_video()
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.content_hash, self.original.content_hash)
+        self.assertEqual(duplicate.source_video, self.original)
+        self.assertEqual(duplicate.video_file.name, self.original.video_file.name)
+        self.assertEqual(duplicate.thumbnail.name, self.original.thumbnail.name)
+        self.assertEqual([name for name in os.listdir(self.videos_root) if name.endswith('.mp4')], ['movie.mp4'])
+        self.assertTrue(os.path.exists(os.path.join(self.videos_root, str(duplicate.id), '480p', 'index.m3u8')))
+        self.assertFalse(duplicate.transcode_jobs.exists())
+
+    def test_different_upload_is_not_linked(self):
+        """ Tests that an upload with different content is not treated as a duplicate. """
+
+        other = self._create_video(b"another master file")
+        self.assertIsNone(other.source_video)
+        self.assertNotEqual(other.content_hash, self.original.content_hash)
+
+    def test_deleting_duplicate_keeps_shared_outputs(self):
+        """ Tests that deleting a duplicate only removes its link and keeps the files of the original. """
+
+        duplicate = self._create_video()
+        duplicate.delete()
+        self.assertFalse(os.path.lexists(os.path.join(self.videos_root, str(duplicate.id))))
+        self.assertTrue(os.path.isfile(self.original.video_file.path))
+        self.assertTrue(os.path.isfile(self.original.thumbnail.path))
+        self.assertTrue(os.path.isdir(os.path.join(self.videos_root, str(self.original.id))))
+
+    def test_deleting_original_hands_outputs_to_duplicate(self):
+        """ Tests that deleting the original moves its HLS folder to the oldest duplicate and keeps the shared files. """
+
+        duplicate = self._create_video()
+        second = self._create_video()
+        self.original.delete()
+        duplicate.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIsNone(duplicate.source_video)
+        self.assertEqual(second.source_video, duplicate)
+        self.assertTrue(os.path.isfile(duplicate.video_file.path))
+        self.assertTrue(os.path.isfile(duplicate.thumbnail.path))
+        duplicate_folder = os.path.join(self.videos_root, str(duplicate.id))
+        self.assertTrue(os.path.isdir(duplicate_folder) and not os.path.islink(duplicate_folder))
+        self.assertTrue(os.path.exists(os.path.join(self.videos_root, str(second.id), '480p', 'index.m3u8')))
+
+    def test_deleting_original_keeps_finished_jobs(self):
+        """ Tests that the finished transcode job of a deleted original is kept for the duplicate that takes over its outputs. """
+
+        job = TranscodeJob.objects.create(video=self.original, status=TranscodeJob.STATUS_DONE, progress=100)
+        Rendition.objects.create(job=job, resolution='480', status=TranscodeJob.STATUS_DONE, output_size=1000)
+        duplicate = self._create_video()
+        self.original.delete()
+        job = TranscodeJob.objects.get(video=duplicate, status=TranscodeJob.STATUS_DONE)
+        self.assertEqual(list(job.renditions.values_list('resolution', 'output_size')), [('480', 1000)])
@@ -0,0 +1,138 @@
+import os
+import shutil
+import ffmpeg
+from django.conf import settings
+from django.test import TestCase, override_settings
+from videoflix_app.api.tasks import convert_resolution, generate_hls_ladder, generate_hls_chunked, set_playlist_type, get_rendition_bandwidth, has_audio_stream
+
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class HLSLadderTests(TestCase):
+
+    def setUp(self):
+        """ Sets up the sample video and the output folder for the HLS ladder tests. """
+
+        self.sample_video = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        assert os.path.exists(self.sample_video), "small.mp4 no found in tests/assets"
+        self.output_root = os.path.join(settings.MEDIA_ROOT, 'videos', '1')
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_ladder_writes_every_rendition(self):
+        """ Tests that a single ladder run writes a playlist and segments for every requested resolution. """
+
+        playlists = generate_hls_ladder(self.sample_video, self.output_root, ['360', '480'])
+        self.assertEqual(set(playlists), {'360', '480'})
+        for resolution, playlist in playlists.items():
+            with self.subTest(resolution=resolution):
+                self.assertEqual(playlist, os.path.join(self.output_root, f'{resolution}p', 'index.m3u8'))
+                self.assertTrue(os.path.exists(playlist))
+                self.assertTrue(os.path.exists(os.path.join(self.output_root, f'{resolution}p', 'segment_000.ts')))
+
+    def test_ladder_segments_are_aligned(self):
+        """ Tests that the forced keyframes give every rendition the same segment durations. """
+
+        playlists = generate_hls_ladder(self.sample_video, self.output_root, ['360', '480'])
+        durations = []
+        for playlist in playlists.values():
+            with open(playlist) as f:
+                durations.append([line for line in f.read().splitlines() if line.startswith('#EXTINF:')])
+        self.assertTrue(durations[0])
+        self.assertEqual(durations[0], durations[1])
+
+    def test_chunked_ladder_writes_every_rendition(self):
+        """ Tests that the chunked encoder writes every rendition and a master playlist and removes its work folder. """
+
+        playlists = generate_hls_chunked(self.sample_video, self.output_root, ['360', '480'], chunk_seconds=1, workers=2)
+        self.assertEqual(set(playlists), {'360', '480'})
+        for resolution, playlist in playlists.items():
+            with self.subTest(resolution=resolution):
+                with open(playlist) as f:
+                    content = f.read()
+                self.assertIn('#EXT-X-ENDLIST', content)
+                self.assertTrue(os.path.exists(os.path.join(self.output_root, f'{resolution}p', 'segment_000.ts')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_root, 'master.m3u8')))
+        self.assertEqual(sorted(os.listdir(self.output_root)), ['360p', '480p', 'master.m3u8'])
+
+    def test_cmaf_ladder_writes_fmp4_segments(self):
+        """ Tests that the 'fmp4' segment type writes an init.mp4 and .m4s segments and is listed in the master playlist. """
+
+        generate_hls_ladder(self.sample_video, self.output_root, ['360'], segment_type='fmp4')
+        folder = os.path.join(self.output_root, '360p')
+        self.assertTrue(os.path.exists(os.path.join(folder, 'init.mp4')))
+        self.assertTrue(os.path.exists(os.path.join(folder, 'segment_000.m4s')))
+        with open(os.path.join(folder, 'index.m3u8')) as f:
+            self.assertIn('#EXT-X-MAP:URI="init.mp4"', f.read())
+        with open(os.path.join(self.output_root, 'master.m3u8')) as f:
+            self.assertIn('CODECS="avc1.', f.read())
+
+    def test_single_file_ladder_uses_byte_ranges(self):
+        """ Tests that the single-file mode writes one media file per rendition, a playlist with EXT-X-BYTERANGE
+        and a master playlist whose bandwidth is measured from the byte ranges. """
+
+        generate_hls_ladder(self.sample_video, self.output_root, ['360'], single_file=True)
+        folder = os.path.join(self.output_root, '360p')
+        self.assertEqual(sorted(os.listdir(folder)), ['index.m3u8', 'media.ts', 'segments.json'])
+        with open(os.path.join(folder, 'index.m3u8')) as f:
+            content = f.read()
+        self.assertIn('#EXT-X-BYTERANGE:', content)
+        peak, average = get_rendition_bandwidth(os.path.join(folder, 'index.m3u8'))
+        self.assertGreater(peak, 0)
+        self.assertLessEqual(average, peak)
+        with open(os.path.join(self.output_root, 'master.m3u8')) as f:
+            self.assertIn('360p/index.m3u8', f.read())
+
+    def test_shared_audio_is_encoded_once(self):
+        """ Tests that the shared audio mode writes the audio once into its own rendition, writes the video renditions
+        without audio and references the audio group from every variant of the master playlist. """
+
+        os.makedirs(self.output_root)
+        source = os.path.join(settings.MEDIA_ROOT, 'source.mp4')
+        ffmpeg.output(ffmpeg.input('testsrc=duration=3:size=320x240:rate=25', f='lavfi'), ffmpeg.input('sine=duration=3', f='lavfi'),
+                      source, vcodec='libx264', acodec='aac').run(quiet=True)
+        playlists = generate_hls_ladder(source, self.output_root, ['360', '480'], separate_audio=True)
+        self.assertEqual(set(playlists), {'360', '480'})
+        self.assertTrue(os.path.exists(os.path.join(self.output_root, 'audio', 'segment_000.ts')))
+        self.assertFalse(has_audio_stream(os.path.join(self.output_root, '360p', 'segment_000.ts')))
+        with open(os.path.join(self.output_root, 'master.m3u8')) as f:
+            content = f.read()
+        self.assertEqual(content.count('#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="audio"'), 1)
+        self.assertEqual(content.count('AUDIO="audio"'), 2)
+        self.assertIn('mp4a.40.2', content)
+
+    def test_event_ladder_is_switched_to_vod(self):
+        """ Tests that a ladder published as a growing EVENT playlist ends as a complete VOD playlist with a master playlist. """
+
+        playlists = generate_hls_ladder(self.sample_video, self.output_root, ['360'], playlist_type='event')
+        with open(playlists['360']) as f:
+            content = f.read()
+        self.assertIn('#EXT-X-PLAYLIST-TYPE:VOD', content)
+        self.assertNotIn('EVENT', content)
+        self.assertIn('#EXT-X-ENDLIST', content)
+        self.assertTrue(os.path.exists(os.path.join(self.output_root, 'master.m3u8')))
+        self.assertFalse(os.path.exists(playlists['360'] + '.tmp'))
+
+    def test_set_playlist_type_replaces_type(self):
+        """ Tests that set_playlist_type only replaces the EXT-X-PLAYLIST-TYPE line. """
+
+        os.makedirs(self.output_root, exist_ok=True)
+        playlist = os.path.join(self.output_root, 'index.m3u8')
+        with open(playlist, 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:EVENT\n#EXTINF:4.0,\nsegment_000.ts\n')
+        set_playlist_type(playlist, 'VOD')
+        with open(playlist) as f:
+            self.assertEqual(f.read(), '#EXTM3U\n#EXT-X-PLAYLIST-TYPE:VOD\n#EXTINF:4.0,\nsegment_000.ts\n')
+
+    def test_progressive_fallback_is_written_next_to_source(self):
+        """ Tests that convert_resolution writes a single progressive MP4 next to the source file. """
+
+        os.makedirs(self.output_root, exist_ok=True)
+        source = shutil.copy(self.sample_video, os.path.join(self.output_root, 'movie.mp4'))
+        target = convert_resolution(source, '360')
+        self.assertEqual(target, os.path.join(self.output_root, 'movie_360p.mp4'))
+        self.assertGreater(os.path.getsize(target), 0)
+
@@ -0,0 +1,118 @@
+import os
+import shutil
+import django_rq
+from unittest.mock import patch
+from rq.job import Job, JobStatus
+from rq.exceptions import NoSuchJobError
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from videoflix_app.models import Category, Video, TranscodeJob
+from videoflix_app.api.tasks import get_video_jobs_key, get_video_job_id, generate_and_save_thumbnail_task, save_thumbnail_to_video, remove_outputs_of_deleted_video
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class JobCancellationTests(TestCase):
+
+    def setUp(self):
+        """ Sets up a user, a category and an uploaded video whose background jobs are waiting in the queues. """
+
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.category = Category.objects.create(name="TestCategory")
+        self.connection = django_rq.get_connection('transcode')
+        self.video = Video.objects.create(title="Video", description="Desc", category=self.category, user=self.user,
+                                          video_file=SimpleUploadedFile('movie.mp4', b"job cancellation content", content_type='video/mp4'))
+        self.key = get_video_jobs_key(self.video.id)
+        self.job_ids = [job_id.decode() for job_id in self.connection.smembers(self.key)]
+
+    def tearDown(self):
+        """ Deletes the test media root directory and the jobs of the test after each test is executed. """
+
+        for job_id in self.job_ids:
+            job = Job.fetch(job_id, connection=self.connection)
+            job.delete()
+        self.connection.delete(self.key)
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_job_ids_are_tracked_per_video(self):
+        """ Tests that the thumbnail, trickplay and transcode jobs of an upload are remembered for the video. """
+
+        self.assertEqual(len(self.job_ids), 3)
+        self.assertTrue(all(Job.fetch(job_id, connection=self.connection).get_status() == JobStatus.QUEUED for job_id in self.job_ids))
+
+    def test_delete_cancels_queued_jobs(self):
+        """ Tests that deleting a video cancels its queued jobs and forgets their ids. """
+
+        self.video.delete()
+        for job_id in self.job_ids:
+            with self.subTest(job_id=job_id):
+                self.assertEqual(Job.fetch(job_id, connection=self.connection).get_status(), JobStatus.CANCELED)
+        self.assertFalse(self.connection.exists(self.key))
+
+    @patch('videoflix_app.api.tasks.send_stop_job_command')
+    def test_delete_stops_running_jobs(self, mock_stop):
+        """ Tests that deleting a video sends the stop command for a job that a worker is running. """
+
+        running = Job.fetch(self.job_ids[0], connection=self.connection)
+        running.set_status(JobStatus.STARTED)
+        self.video.delete()
+        mock_stop.assert_called_once()
+        self.assertEqual(mock_stop.call_args.args[1], running.id)
+
+    def test_delete_with_active_jobs_hands_work_to_duplicate(self):
+        """ Tests that deleting an original whose jobs are still queued gives its duplicate its own thumbnail, trickplay and transcode jobs. """
+
+        duplicate = Video.objects.create(title="Copy", description="Desc", category=self.category, user=self.user,
+                                         video_file=SimpleUploadedFile('movie.mp4', b"job cancellation content", content_type='video/mp4'))
+        duplicate.refresh_from_db()
+        self.assertEqual(duplicate.source_video, self.video)
+        duplicate_key = get_video_jobs_key(duplicate.id)
+        for kind in ['thumbnail', 'trickplay', 'hls']:
+            try:
+                Job.fetch(get_video_job_id(kind, duplicate.id), connection=self.connection).delete()
+            except NoSuchJobError:
+                pass
+        self.connection.delete(duplicate_key)
+        self.video.delete()
+        duplicate_job_ids = {job_id.decode() for job_id in self.connection.smembers(duplicate_key)}
+        self.job_ids += list(duplicate_job_ids)
+        self.assertEqual(duplicate_job_ids, {get_video_job_id(kind, duplicate.id) for kind in ['thumbnail', 'trickplay', 'hls']})
+        for job_id in duplicate_job_ids:
+            with self.subTest(job_id=job_id):
+                self.assertEqual(Job.fetch(job_id, connection=self.connection).get_status(), JobStatus.QUEUED)
+        job = TranscodeJob.objects.get(video=duplicate)
+        self.assertEqual(job.status, TranscodeJob.STATUS_QUEUED)
+        self.connection.delete(duplicate_key)
+
+    def test_thumbnail_task_of_deleted_video(self):
+        """ Tests that the thumbnail task of a deleted video returns without an error. """
+
+        video_id = self.video.id
+        self.video.delete()
+        self.assertIsNone(generate_and_save_thumbnail_task(video_id))
+
+    def test_thumbnail_does_not_restore_deleted_video(self):
+        """ Tests that saving a thumbnail for a video deleted in the meantime neither inserts the row again nor keeps the file. """
+
+        frame_path = os.path.join(settings.MEDIA_ROOT, 'frame.jpg')
+        with open(frame_path, 'wb') as f:
+            f.write(b"jpg")
+        video = Video.objects.get(id=self.video.id)
+        self.video.delete()
+        save_thumbnail_to_video(video, frame_path)
+        self.assertFalse(Video.objects.filter(id=video.id).exists())
+        self.assertFalse(os.path.exists(frame_path))
+        self.assertFalse(os.path.exists(os.path.join(settings.MEDIA_ROOT, 'thumbnails', 'frame.jpg')))
+
+    def test_outputs_of_deleted_video_are_removed(self):
+        """ Tests that a task finishing after the delete removes the HLS folder it has written. """
+
+        video_id = self.video.id
+        output_root = os.path.join(settings.MEDIA_ROOT, 'videos', str(video_id))
+        self.assertFalse(remove_outputs_of_deleted_video(video_id))
+        self.video.delete()
+        os.makedirs(os.path.join(output_root, '360p'))
+        self.assertTrue(remove_outputs_of_deleted_video(video_id))
+        self.assertFalse(os.path.exists(output_root))
@@ -0,0 +1,101 @@
+import os
+import shutil
+import django_rq
+from unittest import mock
+from rq.job import Job, JobStatus
+from rq.exceptions import NoSuchJobError
+from django.conf import settings
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from videoflix_app.models import Category, Video, TranscodeJob
+from videoflix_app.signals import video_post_save
+from videoflix_app.api.tasks import get_video_jobs_key, enqueue_video_task, get_video_job_id, generate_trickplay_task, transcode_hls_task
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class JobDeduplicationTests(TestCase):
+
+    def setUp(self):
+        """ Sets up a user, a category and a video whose upload has not been enqueued yet.
+        Jobs left in Redis by earlier tests with the same video id are deleted first. """
+
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.category = Category.objects.create(name="TestCategory")
+        self.connection = django_rq.get_connection('transcode')
+        self.video = Video.objects.create(title="Video", description="Desc", category=self.category, user=self.user)
+        self.video.video_file.save('movie.mp4', SimpleUploadedFile('movie.mp4', b"job deduplication content", content_type='video/mp4'))
+        self.job_ids = [get_video_job_id(kind, self.video.id) for kind in ['thumbnail', 'trickplay', 'hls']]
+        self._delete_jobs()
+
+    def tearDown(self):
+        """ Deletes the jobs of the test and the test media root directory after each test is executed. """
+
+        self._delete_jobs()
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _delete_jobs(self):
+        """ Deletes the jobs of the test video from Redis. """
+
+        for job_id in self.job_ids:
+            try:
+                Job.fetch(job_id, connection=self.connection).delete()
+            except NoSuchJobError:
+                pass
+        self.connection.delete(get_video_jobs_key(self.video.id))
+
+    def test_upload_jobs_have_deterministic_ids(self):
+        """ Tests that the jobs of an upload are enqueued under ids built from the task kind and the video id. """
+
+        video_post_save(Video, self.video, created=True)
+        tracked = {job_id.decode() for job_id in self.connection.smembers(get_video_jobs_key(self.video.id))}
+        self.assertEqual(tracked, {get_video_job_id(kind, self.video.id) for kind in ['thumbnail', 'trickplay', 'hls']})
+
+    @override_settings(RQ_JOB_ID_PREFIX='staging')
+    def test_job_ids_start_with_the_configured_prefix(self):
+        """ Tests that the job ids and the job set of a video start with RQ_JOB_ID_PREFIX, so deployments sharing one Redis keep their jobs apart. """
+
+        self.assertEqual(get_video_job_id('progressive', 12, 480), 'staging-progressive-12-480')
+        self.assertEqual(get_video_jobs_key(12), 'videoflix:staging:video:12:jobs')
+
+    def test_default_prefix_depends_on_the_database(self):
+        """ Tests that without RQ_JOB_ID_PREFIX the job ids of two databases differ. """
+
+        job_id = get_video_job_id('hls', 12)
+        with mock.patch.dict(connections['default'].settings_dict, {'NAME': 'other_db'}):
+            self.assertNotEqual(get_video_job_id('hls', 12), job_id)
+
+    def test_repeated_upload_signal_enqueues_once(self):
+        """ Tests that handling the same upload twice neither enqueues the jobs nor creates the TranscodeJob again. """
+
+        queue = django_rq.get_queue('thumbnail')
+        video_post_save(Video, self.video, created=True)
+        queued = queue.count
+        video_post_save(Video, self.video, created=True)
+        self.assertEqual(queue.count, queued)
+        self.assertEqual(TranscodeJob.objects.filter(video=self.video).count(), 1)
+
+    def test_stale_transcode_job_of_earlier_video_is_replaced(self):
+        """ Tests that an active HLS job left over from an earlier video with the same id does not keep the upload from being transcoded. """
+
+        job_id = get_video_job_id('hls', self.video.id)
+        stale = enqueue_video_task(self.video.id, 'transcode', job_id, transcode_hls_task, 999999)
+        self.assertEqual(stale.get_status(), JobStatus.QUEUED)
+        video_post_save(Video, self.video, created=True)
+        transcode_job = TranscodeJob.objects.get(video=self.video)
+        job = Job.fetch(job_id, connection=self.connection)
+        self.assertEqual(job.args, (transcode_job.id,))
+        self.assertEqual(job.get_status(), JobStatus.QUEUED)
+
+    def test_finished_job_is_enqueued_again(self):
+        """ Tests that a job whose previous run has ended is enqueued again under the same id. """
+
+        job_id = get_video_job_id('trickplay', self.video.id)
+        first = enqueue_video_task(self.video.id, 'thumbnail', job_id, generate_trickplay_task, self.video.id)
+        self.assertEqual(enqueue_video_task(self.video.id, 'thumbnail', job_id, generate_trickplay_task, self.video.id).id, first.id)
+        first.cancel()
+        second = enqueue_video_task(self.video.id, 'thumbnail', job_id, generate_trickplay_task, self.video.id)
+        self.assertEqual(second.id, job_id)
+        self.assertEqual(second.get_status(), JobStatus.QUEUED)
@@ -0,0 +1,78 @@
+import os
+import shutil
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from videoflix_app.api import manifest_cache
+from videoflix_app.api.manifest_cache import read_manifest, clear_local_manifests
+
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), HLS_MANIFEST_CACHE_SIZE=2)
+class ManifestCacheTests(TestCase):
+
+    def setUp(self):
+        """ Empties both cache tiers and writes a rendition playlist. """
+
+        clear_local_manifests()
+        cache.clear()
+        self.playlist = self._write_playlist(1, '480p', '#EXTM3U\n#EXTINF:4.0,\nsegment_000.ts\n#EXT-X-ENDLIST\n')
+
+    def tearDown(self):
+        """ Deletes the test media root directory and empties the caches after each test is executed. """
+
+        clear_local_manifests()
+        cache.clear()
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _write_playlist(self, movie_id, resolution, content):
+        """ Writes a playlist for the given video and rendition and returns its path. """
+
+        folder = os.path.join(settings.MEDIA_ROOT, 'videos', str(movie_id), resolution)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, 'index.m3u8')
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_unchanged_playlist_is_not_read_again(self):
+        """ Tests that the second read of an unchanged playlist comes from the in-process cache without opening the file. """
+
+        _, content = read_manifest(self.playlist, 1, '480p')
+        with mock.patch('builtins.open', side_effect=AssertionError('playlist read from disk')):
+            self.assertEqual(read_manifest(self.playlist, 1, '480p')[1], content)
+
+    def test_shared_cache_serves_other_workers(self):
+        """ Tests that a worker with an empty in-process cache gets the playlist from the shared cache. """
+
+        _, content = read_manifest(self.playlist, 1, '480p')
+        clear_local_manifests()
+        with mock.patch('builtins.open', side_effect=AssertionError('playlist read from disk')):
+            self.assertEqual(read_manifest(self.playlist, 1, '480p')[1], content)
+
+    def test_rewritten_playlist_is_read_again(self):
+        """ Tests that a playlist rewritten by the encoder gets a new version and is read again from disk. """
+
+        read_manifest(self.playlist, 1, '480p')
+        self._write_playlist(1, '480p', '#EXTM3U\n#EXTINF:4.0,\nsegment_000.ts\n#EXTINF:4.0,\nsegment_001.ts\n#EXT-X-ENDLIST\n')
+        self.assertIn('segment_001.ts', read_manifest(self.playlist, 1, '480p')[1])
+
+    def test_least_recently_used_playlist_is_evicted(self):
+        """ Tests that the in-process cache keeps at most HLS_MANIFEST_CACHE_SIZE playlists and drops the least recently used one. """
+
+        second = self._write_playlist(2, '480p', '#EXTM3U\n')
+        third = self._write_playlist(3, '480p', '#EXTM3U\n')
+        read_manifest(self.playlist, 1, '480p')
+        read_manifest(second, 2, '480p')
+        read_manifest(self.playlist, 1, '480p')
+        read_manifest(third, 3, '480p')
+        self.assertEqual(list(manifest_cache._local_manifests), [(1, '480p'), (3, '480p')])
+
+    def test_missing_playlist_raises(self):
+        """ Tests that a missing playlist raises FileNotFoundError, even if an older version of it is cached. """
+
+        read_manifest(self.playlist, 1, '480p')
+        os.remove(self.playlist)
+        with self.assertRaises(FileNotFoundError):
+            read_manifest(self.playlist, 1, '480p')
@@ -0,0 +1,78 @@
+import os
+import shutil
+from django.conf import settings
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from videoflix_app.api.tasks import generate_hls_ladder, get_hls_version, write_master_playlist
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class MasterPlaylistTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up the test environment for the adaptive-bitrate master playlist tests.
+        - Creates a test user and assigns an access token for authentication.
+        - Generates a two-rendition HLS ladder for the sample video. """
+
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.cookies['access_token'] = str(refresh.access_token)
+        self.movie_id = 1
+        self.output_root = os.path.join(settings.MEDIA_ROOT, 'videos', str(self.movie_id))
+        sample_video = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        assert os.path.exists(sample_video), "small.mp4 no found in tests/assets"
+        generate_hls_ladder(sample_video, self.output_root, ['360', '480'])
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_master_playlist_lists_every_rendition(self):
+        """ Tests that the master playlist is served and lists every rendition with its bandwidth, resolution and codecs. """
+
+        response = self.client.get(f'/api/video/{self.movie_id}/master.m3u8')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('#EXTM3U', content)
+        self.assertEqual(content.count('#EXT-X-STREAM-INF:BANDWIDTH='), 2)
+        self.assertIn('RESOLUTION=640x360', content)
+        self.assertIn('RESOLUTION=854x480', content)
+        self.assertIn('CODECS="avc1.', content)
+        self.assertLess(content.index('360p/index.m3u8'), content.index('480p/index.m3u8'))
+
+    def test_duplicate_resolution_is_listed_once(self):
+        """ Tests that a rendition with the same frame size as an earlier one is left out of the master playlist. """
+
+        shutil.copytree(os.path.join(self.output_root, '360p'), os.path.join(self.output_root, '120p'))
+        with open(write_master_playlist(self.output_root, ['360', '120', '480'])) as f:
+            content = f.read()
+        self.assertEqual(content.count('RESOLUTION=640x360'), 1)
+        self.assertNotIn('120p/index.m3u8', content)
+        self.assertIn('#EXT-X-VERSION:3', content)
+
+    def test_version_follows_segment_layout(self):
+        """ Tests that fMP4 segments need version 6 and byte-range addressed single files version 4. """
+
+        self.assertEqual(get_hls_version('mpegts', False), 3)
+        self.assertEqual(get_hls_version('mpegts', True), 4)
+        self.assertEqual(get_hls_version('fmp4', False), 6)
+        self.assertEqual(get_hls_version('fmp4', True), 6)
+
+    def test_master_playlist_not_found(self):
+        """ Tests that a 404 Not Found status code is returned for a video without a master playlist. """
+
+        response = self.client.get('/api/video/999/master.m3u8')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_master_playlist_unauthenticated(self):
+        """ Tests that an unauthenticated request to the master playlist returns a 401 Unauthorized status code. """
+
+        self.client.cookies.clear()
+        response = self.client.get(f'/api/video/{self.movie_id}/master.m3u8')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,92 @@
+import os
+import shutil
+from unittest import mock
+from django.conf import settings
+from django.test import override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APITestCase
+from rest_framework import status
+from videoflix_app.models import Category, Video, MediaInfo
+from videoflix_app.api import tasks
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class MediaInfoTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up a user, a category and a video with the sample file.
+        The file is attached after the video was created, so no transcode is enqueued by the signal. """
+
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.category = Category.objects.create(name="TestCategory")
+        self.video = Video.objects.create(title="Video", description="Desc", duration=99, category=self.category, user=self.user)
+        sample_path = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        with open(sample_path, 'rb') as f:
+            self.video.video_file.save('video.mp4', SimpleUploadedFile('video.mp4', f.read(), content_type='video/mp4'))
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_probe_reads_source_metadata(self):
+        """ Tests that a single probe returns the duration, dimensions, codecs and frame rate of the source. """
+
+        info = tasks.probe_media(self.video.video_file.path)
+        self.assertAlmostEqual(info['duration'], 5.0, places=1)
+        self.assertEqual((info['width'], info['height']), (960, 540))
+        self.assertEqual(info['video_codec'], 'h264')
+        self.assertEqual(info['audio_codec'], '')
+        self.assertAlmostEqual(info['frame_rate'], 30.0)
+
+    def test_media_info_is_probed_only_once(self):
+        """ Tests that the media info is stored on the first call and read from the database afterwards.
+        The manual duration is replaced by the probed duration in minutes. """
+
+        with mock.patch.object(tasks, 'probe_media', wraps=tasks.probe_media) as probe:
+            tasks.get_media_info(self.video)
+            tasks.get_media_info(Video.objects.get(id=self.video.id))
+        self.assertEqual(probe.call_count, 1)
+        self.assertEqual(MediaInfo.objects.filter(video=self.video).count(), 1)
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.duration, 1)
+
+    def test_media_info_stored_during_probe_is_kept(self):
+        """ Tests that media info stored by another task while the source was probed is returned and not overwritten. """
+
+        probe_media = tasks.probe_media
+
+        def probe_while_other_task_stores(path):
+            MediaInfo.objects.create(video=self.video, duration=60.0, width=320, height=180, video_codec='h264')
+            return probe_media(path)
+
+        with mock.patch.object(tasks, 'probe_media', side_effect=probe_while_other_task_stores):
+            info = tasks.get_media_info(self.video)
+        self.assertEqual((info.width, info.height), (320, 180))
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.duration, 99)
+
+    def test_duplicate_linked_before_probe_gets_media_info(self):
+        """ Tests that a duplicate linked before the original was probed gets the media info and duration once the probe finishes. """
+
+        duplicate = Video.objects.create(title="Copy", description="Desc", duration=99, category=self.category, user=self.user,
+                                         video_file=self.video.video_file.name)
+        tasks.link_duplicate_video(duplicate, self.video)
+        self.assertFalse(MediaInfo.objects.filter(video=duplicate).exists())
+        tasks.get_media_info(self.video)
+        duplicate.refresh_from_db()
+        self.assertEqual((duplicate.media_info.width, duplicate.media_info.height), (960, 540))
+        self.assertEqual(duplicate.duration, 1)
+
+    def test_video_detail_contains_media_info(self):
+        """ Tests that the video detail response contains the stored media info. """
+
+        tasks.get_media_info(self.video)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('video-detail', args=[self.video.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['media_info']['width'], 960)
+        self.assertEqual(response.data['media_info']['height'], 540)
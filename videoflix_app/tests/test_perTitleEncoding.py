@@ -0,0 +1,86 @@
+import os
+import shutil
+import ffmpeg
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from videoflix_app.models import Category, Video
+from videoflix_app.api.tasks import RENDITION_MAX_BITRATES, analyze_complexity, get_per_title_encoding, get_video_encoding_options, create_transcode_job, transcode_hls_task
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), HLS_CRF_MIN=20, HLS_CRF_MAX=24)
+class PerTitleEncodingTests(TestCase):
+
+    def setUp(self):
+        """ Sets up a user, a category and the sample video for the per-title encoding tests. """
+
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.category = Category.objects.create(name="TestCategory")
+        self.sample_video = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        os.makedirs(settings.MEDIA_ROOT, exist_ok=True)
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _render(self, name, video_filter):
+        """ Renders a two second test video with the given filter and returns its path. """
+
+        path = os.path.join(settings.MEDIA_ROOT, name)
+        ffmpeg.input('testsrc2=duration=2:size=640x360:rate=25', f='lavfi').filter(*video_filter).output(path, vcodec='libx264', crf=10).run(quiet=True)
+        return path
+
+    def test_noisy_content_is_more_complex(self):
+        """ Tests that grainy content measures more bits per pixel than smooth content. """
+
+        smooth = self._render('smooth.mp4', ('boxblur', 10))
+        noisy = self._render('noisy.mp4', ('noise',))
+        smooth_complexity = analyze_complexity(smooth, 2, 25)
+        self.assertGreater(smooth_complexity, 0)
+        self.assertGreater(analyze_complexity(noisy, 2, 25), smooth_complexity)
+
+    def test_simple_title_gets_high_crf_and_low_caps(self):
+        """ Tests that simple content is encoded with HLS_CRF_MAX and a quarter of the bitrate limit. """
+
+        encoding = get_per_title_encoding(0.005, ['360', '1080'], 25)
+        self.assertEqual(encoding['360']['crf'], 24)
+        self.assertEqual(encoding['1080']['maxrate'], RENDITION_MAX_BITRATES['1080'] // 4)
+        self.assertEqual(encoding['1080']['bufsize'], encoding['1080']['maxrate'] * 2)
+
+    def test_complex_title_gets_low_crf_and_full_caps(self):
+        """ Tests that complex content is encoded with HLS_CRF_MIN and never above the bitrate limit. """
+
+        encoding = get_per_title_encoding(1.5, ['360', '720'], 25)
+        self.assertEqual(encoding['720']['crf'], 20)
+        self.assertEqual(encoding['360']['maxrate'], RENDITION_MAX_BITRATES['360'])
+        self.assertEqual(encoding['720']['maxrate'], RENDITION_MAX_BITRATES['720'])
+
+    def test_fixed_crf_without_per_title_encoding(self):
+        """ Tests that renditions without a per-title encoding keep the fixed CRF 20 without a cap. """
+
+        self.assertEqual(get_video_encoding_options(None, '480'), {'preset': 'fast', 'crf': 20})
+
+    def test_keyframes_are_forced_at_segment_boundaries(self):
+        """ Tests that a segment length forces a keyframe at every segment boundary. """
+
+        options = get_video_encoding_options(None, '480', 6)
+        self.assertEqual(options['force_key_frames'], 'expr:gte(t,n_forced*6)')
+
+    @override_settings(HLS_PER_TITLE_ENCODING=True)
+    def test_transcode_stores_chosen_values(self):
+        """ Tests that the transcode task stores the complexity on the media info and the CRF and cap on every rendition. """
+
+        video = Video.objects.create(title="Video", description="Desc", duration=1, category=self.category, user=self.user)
+        with open(self.sample_video, 'rb') as f:
+            video.video_file.save('video.mp4', SimpleUploadedFile('video.mp4', f.read(), content_type='video/mp4'))
+        job = create_transcode_job(video, [360, 480])
+        transcode_hls_task(job.id)
+        video.media_info.refresh_from_db()
+        self.assertGreater(video.media_info.complexity, 0)
+        for rendition in job.renditions.all():
+            with self.subTest(resolution=rendition.resolution):
+                self.assertTrue(20 <= rendition.crf <= 24)
+                self.assertLessEqual(rendition.max_bitrate, RENDITION_MAX_BITRATES[rendition.resolution])
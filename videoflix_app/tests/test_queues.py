@@ -0,0 +1,54 @@
+import os
+import shutil
+from unittest.mock import patch, MagicMock
+from django.conf import settings
+from django.urls import reverse
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APITestCase
+from videoflix_app.models import Category, Video
+from videoflix_app.api.tasks import send_activation_email_task, generate_and_save_thumbnail_task, generate_trickplay_task, transcode_hls_task, convert_resolution
+
+User = get_user_model()
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class QueueRoutingTests(APITestCase):
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_queues_have_their_own_timeouts(self):
+        """ Tests that the email, thumbnail and transcode queues are configured with separate timeouts. """
+
+        for name in ['email', 'thumbnail', 'transcode']:
+            with self.subTest(queue=name):
+                self.assertIn('DEFAULT_TIMEOUT', settings.RQ_QUEUES[name])
+        self.assertGreater(settings.RQ_QUEUES['transcode']['DEFAULT_TIMEOUT'], settings.RQ_QUEUES['email']['DEFAULT_TIMEOUT'])
+
+    @patch('videoflix_app.api.views.get_queue')
+    def test_activation_email_uses_email_queue(self, mock_get_queue):
+        """ Tests that the activation email of a new user is enqueued on the 'email' queue. """
+
+        data = {'email': 'newuser@example.com', 'password': 'strongpassword123', 'confirmed_password': 'strongpassword123'}
+        self.client.post(reverse('register'), data)
+        mock_get_queue.assert_called_once_with('email')
+        self.assertEqual(mock_get_queue.return_value.enqueue.call_args.args[0], send_activation_email_task)
+
+    @override_settings(VIDEO_DELIVERY_PROFILE='hls+mp4')
+    @patch('videoflix_app.api.tasks.django_rq.get_queue')
+    def test_upload_uses_thumbnail_and_transcode_queues(self, mock_get_queue):
+        """ Tests that the thumbnail task is enqueued on the 'thumbnail' queue and the trickplay task and the encodes on the 'transcode' queue. """
+
+        queues = {}
+        mock_get_queue.side_effect = lambda name, **kwargs: queues.setdefault(name, MagicMock())
+        user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        category = Category.objects.create(name="TestCategory")
+        Video.objects.create(title="Video", description="Desc", category=category, user=user,
+                             video_file=SimpleUploadedFile('movie.mp4', b"queue routing content", content_type='video/mp4'))
+        self.assertEqual(set(queues), {'thumbnail', 'transcode'})
+        self.assertEqual([call.args[0] for call in queues['thumbnail'].enqueue.call_args_list], [generate_and_save_thumbnail_task])
+        self.assertEqual([call.args[0] for call in queues['transcode'].enqueue.call_args_list], [generate_trickplay_task, convert_resolution, transcode_hls_task])
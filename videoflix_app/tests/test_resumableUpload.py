@@ -0,0 +1,151 @@
+import os
+import shutil
+import base64
+import hashlib
+from unittest import mock
+from django.conf import settings
+from django.urls import reverse
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+from videoflix_app.models import Category, Video, UploadSession
+from videoflix_app.api.upload_handlers import get_upload_part_path
+
+User = get_user_model()
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), UPLOAD_MAX_CHUNK_SIZE=8)
+class ResumableUploadTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up an admin user, a regular user, a category and an authenticated client for the upload tests. """
+
+        self.admin_user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.regular_user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.category = Category.objects.create(name="TestCategory")
+        self.content = b"resumable upload content"
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _start_upload(self, **extra):
+        """ Starts an upload session for the test content and returns the response. """
+
+        data = {'filename': 'movie.mp4', 'size': len(self.content), 'title': 'Upload', 'description': 'Desc', 'category_id': self.category.id}
+        data.update(extra)
+        return self.client.post(reverse('upload-list'), data, format='json')
+
+    def _send_chunk(self, upload_id, offset, chunk, checksum=None):
+        """ Sends one chunk of an upload and returns the response. """
+
+        headers = {'HTTP_UPLOAD_OFFSET': str(offset)}
+        if checksum:
+            headers['HTTP_UPLOAD_CHECKSUM'] = checksum
+        return self.client.patch(reverse('upload-detail', args=[upload_id]), chunk, content_type='application/offset+octet-stream', **headers)
+
+    def test_upload_in_chunks_creates_video(self):
+        """ Tests that the Video is only created after the last chunk and that its file holds the complete upload. """
+
+        upload_id = self._start_upload(checksum=hashlib.sha256(self.content).hexdigest()).data['id']
+        for offset in range(0, len(self.content), 8):
+            self.assertFalse(Video.objects.exists())
+            response = self._send_chunk(upload_id, offset, self.content[offset:offset + 8])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Upload-Offset'], str(len(self.content)))
+        video = Video.objects.get(id=response.data['video'])
+        self.assertEqual(video.title, 'Upload')
+        self.assertEqual(video.user, self.admin_user)
+        self.assertEqual(video.content_hash, hashlib.sha256(self.content).hexdigest())
+        with open(video.video_file.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(get_upload_part_path(UploadSession.objects.get(id=upload_id))))
+
+    def test_upload_resumes_from_stored_offset(self):
+        """ Tests that a chunk with a wrong offset is rejected with the stored offset so the client can resume. """
+
+        upload_id = self._start_upload().data['id']
+        self._send_chunk(upload_id, 0, self.content[:8])
+        response = self._send_chunk(upload_id, 0, self.content[:8])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], 8)
+        self.assertEqual(self.client.get(reverse('upload-detail', args=[upload_id])).data['offset'], 8)
+
+    def test_chunk_with_wrong_checksum_is_discarded(self):
+        """ Tests that a chunk that fails its checksum is not stored and the offset stays the same. """
+
+        upload_id = self._start_upload().data['id']
+        checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(b"other").digest()).decode()
+        response = self._send_chunk(upload_id, 0, self.content[:8], checksum)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(UploadSession.objects.get(id=upload_id).offset, 0)
+        checksum = 'sha256 ' + base64.b64encode(hashlib.sha256(self.content[:8]).digest()).decode()
+        response = self._send_chunk(upload_id, 0, self.content[:8], checksum)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(os.path.getsize(get_upload_part_path(UploadSession.objects.get(id=upload_id))), 8)
+
+    def test_file_with_wrong_checksum_is_reset(self):
+        """ Tests that a complete file that does not match the declared checksum creates no Video and resets the upload. """
+
+        upload_id = self._start_upload(checksum='0' * 64).data['id']
+        for offset in range(0, len(self.content), 8):
+            response = self._send_chunk(upload_id, offset, self.content[offset:offset + 8])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Video.objects.exists())
+        self.assertEqual(UploadSession.objects.get(id=upload_id).offset, 0)
+
+    def test_failed_video_creation_can_be_completed_again(self):
+        """ Tests that a failed Video creation keeps the received file and that an empty chunk at the final offset creates the Video. """
+
+        upload_id = self._start_upload().data['id']
+        last = len(self.content) - 8
+        for offset in range(0, last, 8):
+            self._send_chunk(upload_id, offset, self.content[offset:offset + 8])
+        with mock.patch('videoflix_app.api.upload_handlers.Video.objects.create', side_effect=RuntimeError("database unavailable")):
+            with self.assertRaises(RuntimeError):
+                self._send_chunk(upload_id, last, self.content[last:])
+        session = UploadSession.objects.get(id=upload_id)
+        self.assertEqual(session.offset, len(self.content))
+        self.assertIsNone(session.video)
+        self.assertEqual(os.path.getsize(get_upload_part_path(session)), len(self.content))
+        self.assertEqual(self._send_chunk(upload_id, 0, b'').status_code, status.HTTP_409_CONFLICT)
+        response = self._send_chunk(upload_id, len(self.content), b'')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        with open(Video.objects.get(id=response.data['video']).video_file.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+    def test_empty_chunk_before_the_end_is_rejected(self):
+        """ Tests that an empty chunk is rejected while the upload is incomplete. """
+
+        upload_id = self._start_upload().data['id']
+        response = self._send_chunk(upload_id, 0, b'')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_chunk_larger_than_limit_is_rejected(self):
+        """ Tests that chunks above UPLOAD_MAX_CHUNK_SIZE are rejected. """
+
+        upload_id = self._start_upload().data['id']
+        response = self._send_chunk(upload_id, 0, self.content[:9])
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_regular_user_cannot_start_upload(self):
+        """ Tests that only admins can start an upload. """
+
+        self.client.force_authenticate(user=self.regular_user)
+        response = self._start_upload()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_delete_aborts_upload(self):
+        """ Tests that deleting an upload session removes the chunks received so far. """
+
+        upload_id = self._start_upload().data['id']
+        self._send_chunk(upload_id, 0, self.content[:8])
+        part_path = get_upload_part_path(UploadSession.objects.get(id=upload_id))
+        response = self.client.delete(reverse('upload-detail', args=[upload_id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(part_path))
+        self.assertFalse(UploadSession.objects.exists())
@@ -0,0 +1,109 @@
+import os
+import json
+import base64
+import shutil
+import hashlib
+from django.conf import settings
+from django.http import Http404
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from videoflix_app.api.tasks import generate_hls_ladder, write_segment_index
+from videoflix_app.api.segment_index import get_segment_index, clear_segment_indexes
+from videoflix_app.api.views import get_segment_entry
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), HLS_SIGNED_SEGMENT_URLS=False, MEDIA_DELIVERY_MODE='django')
+class SegmentIndexTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up a logged-in user and a rendition with a playlist, two segments and a file that the playlist does not list. """
+
+        clear_segment_indexes()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+        self.output_folder = os.path.join(settings.MEDIA_ROOT, 'videos', '1', '480p')
+        os.makedirs(self.output_folder)
+        with open(os.path.join(self.output_folder, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:VOD\n#EXTINF:4.0,\nsegment_000.ts\n#EXTINF:4.0,\nsegment_001.ts\n#EXT-X-ENDLIST\n')
+        self.segments = {'segment_000.ts': b'\x47' * 376, 'segment_001.ts': b'\x47' * 188, 'stray.ts': b'\x47'}
+        for name, content in self.segments.items():
+            with open(os.path.join(self.output_folder, name), 'wb') as f:
+                f.write(content)
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        clear_segment_indexes()
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_index_lists_playlist_segments(self):
+        """ Tests that the index lists every segment of the playlist with its size and SHA-256 and leaves out other files. """
+
+        with open(write_segment_index(self.output_folder)) as f:
+            index = json.load(f)
+        self.assertEqual(sorted(index), ['segment_000.ts', 'segment_001.ts'])
+        self.assertEqual(index['segment_000.ts'][0], 376)
+        self.assertEqual(index['segment_000.ts'][2], hashlib.sha256(self.segments['segment_000.ts']).hexdigest())
+
+    def test_byte_range_rendition_is_indexed_once(self):
+        """ Tests that the init section and the single media file of a byte-range rendition are listed once each. """
+
+        with open(os.path.join(self.output_folder, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-MAP:URI="segment_000.ts",BYTERANGE="100@0"\n#EXTINF:4.0,\n#EXT-X-BYTERANGE:100@100\nsegment_001.ts\n'
+                    '#EXTINF:4.0,\n#EXT-X-BYTERANGE:88\nsegment_001.ts\n#EXT-X-ENDLIST\n')
+        with open(write_segment_index(self.output_folder)) as f:
+            self.assertEqual(sorted(json.load(f)), ['segment_000.ts', 'segment_001.ts'])
+
+    def test_unknown_and_invalid_names_are_rejected(self):
+        """ Tests that a file on disk that is not in the index and names with path components are not served. """
+
+        write_segment_index(self.output_folder)
+        self.assertEqual(self.client.get('/api/video/1/480p/stray.ts/').status_code, status.HTTP_404_NOT_FOUND)
+        for resolution, segment in (('480p', '..'), ('..', 'index.m3u8'), ('480p', '.segments.json'), ('480p', 'a..b')):
+            with self.subTest(resolution=resolution, segment=segment):
+                with self.assertRaises(Http404):
+                    get_segment_entry(1, resolution, segment)
+
+    def test_indexed_segment_is_served_with_digest(self):
+        """ Tests that an indexed segment is served with its length, its validators and the SHA-256 from the index. """
+
+        write_segment_index(self.output_folder)
+        response = self.client.get('/api/video/1/480p/segment_000.ts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Length'], '376')
+        digest = base64.b64encode(hashlib.sha256(self.segments['segment_000.ts']).digest()).decode()
+        self.assertEqual(response['Repr-Digest'], f'sha-256=:{digest}:')
+        response = self.client.get('/api/video/1/480p/segment_000.ts/', HTTP_RANGE='bytes=0-187')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 0-187/376')
+
+    def test_rendition_without_index_is_checked_on_disk(self):
+        """ Tests that the segments of a rendition without an index, e.g. during progressive publishing, are still served. """
+
+        self.assertIsNone(get_segment_index(self.output_folder))
+        self.assertEqual(self.client.get('/api/video/1/480p/segment_001.ts/').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get('/api/video/1/480p/segment_999.ts/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_index_is_cached_until_ttl(self):
+        """ Tests that a loaded index is reused without reading the disk and revalidated once HLS_SEGMENT_INDEX_TTL has passed. """
+
+        write_segment_index(self.output_folder)
+        index = get_segment_index(self.output_folder)
+        os.remove(os.path.join(self.output_folder, 'segments.json'))
+        self.assertIs(get_segment_index(self.output_folder), index)
+        with override_settings(HLS_SEGMENT_INDEX_TTL=0):
+            self.assertIsNone(get_segment_index(self.output_folder))
+
+    def test_ladder_writes_segment_indexes(self):
+        """ Tests that the HLS ladder writes a segment index for every rendition. """
+
+        sample_video = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        output_root = os.path.join(settings.MEDIA_ROOT, 'videos', '2')
+        generate_hls_ladder(sample_video, output_root, ['360'])
+        index = get_segment_index(os.path.join(output_root, '360p'))
+        self.assertIn('segment_000.ts', index)
+        self.assertEqual(index['segment_000.ts'][0], os.path.getsize(os.path.join(output_root, '360p', 'segment_000.ts')))
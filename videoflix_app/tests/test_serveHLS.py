@@ -7,9 +7,10 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from videoflix_app.api.tasks import generate_hls
+from videoflix_app.api.segment_index import clear_segment_indexes
 
 User = get_user_model()
-@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), HLS_SIGNED_SEGMENT_URLS=False)
 class ServeHLSTests(APITestCase):
 
     def setUp(self):       
@@ -19,6 +20,7 @@ class ServeHLSTests(APITestCase):
         - Sets up the test media root directory and output folder for video segments.
         - Checks for the existence of a sample video file and generates HLS segments. """
 
+        clear_segment_indexes()
         self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
         refresh = RefreshToken.for_user(self.user)        
         self.client.cookies['access_token'] = str(refresh.access_token)
@@ -65,10 +67,21 @@ class ServeHLSTests(APITestCase):
         response = self.client.get(self._get_url())
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
-        content_bytes = b''.join(response.streaming_content)
+        content_bytes = response.getvalue()
         content_str = content_bytes.decode()
         self.assertIn('#EXTM3U', content_str)      
 
+    def test_partial_manifest_is_not_cached(self):
+        """ Tests that a growing EVENT playlist without EXT-X-ENDLIST is served with 'Cache-Control: no-cache'
+        and that a finished playlist is served with the manifest cache lifetime. """
+
+        self.assertEqual(self.client.get(self._get_url())['Cache-Control'], settings.HLS_MANIFEST_CACHE_CONTROL)
+        with open(os.path.join(self.output_folder, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:EVENT\n#EXTINF:4.0,\nsegment_000.ts\n')
+        response = self.client.get(self._get_url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
     def test_manifest_not_found(self):
         """ Tests that the HLS manifest is not found when a non-existent movie ID is provided.
         A 404 Not Found status code should be returned in this case. """
@@ -124,7 +137,7 @@ class ServeHLSTests(APITestCase):
 
         manifest_response = self.client.get(self._get_url())
         self.assertEqual(manifest_response.status_code, status.HTTP_200_OK)
-        content_bytes = b''.join(manifest_response.streaming_content)
+        content_bytes = manifest_response.getvalue()
         manifest_content = content_bytes.decode()
 
         segment_files = [
@@ -137,4 +150,107 @@ class ServeHLSTests(APITestCase):
                 self.assertEqual(seg_response.status_code, status.HTTP_200_OK)
                 seg_content = b''.join(seg_response.streaming_content)
                 self.assertGreater(len(seg_content), 0)    
-    
\ No newline at end of file
+    
+
+    def test_segment_byte_range_served(self):
+        """ Tests that a Range request for a segment returns 206 Partial Content with exactly the requested bytes. """
+
+        segment_path = os.path.join(self.output_folder, 'segment_000.ts')
+        with open(segment_path, 'rb') as f:
+            expected = f.read()[188:376]
+        response = self.client.get(self._get_url('segment_000.ts'), HTTP_RANGE='bytes=188-375')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 188-375/{os.path.getsize(segment_path)}')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), expected)
+
+    def test_segment_unsatisfiable_range(self):
+        """ Tests that a Range request beyond the end of a segment returns 416 Range Not Satisfiable. """
+
+        segment_path = os.path.join(self.output_folder, 'segment_000.ts')
+        response = self.client.get(self._get_url('segment_000.ts'), HTTP_RANGE=f'bytes={os.path.getsize(segment_path)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], f'bytes */{os.path.getsize(segment_path)}')
+
+    def test_segment_is_cached_as_immutable(self):
+        """ Tests that the files of a finished, indexed rendition, including the single media file of a byte-range rendition,
+        are served with a validator, a modification date and the long segment cache lifetime,
+        while the files of a rendition without a segment index yet are revalidated instead. """
+
+        single_file_folder = os.path.join(self.test_media_root, 'videos', '2', self.resolution)
+        generate_hls(video_path=self.sample_video, output_folder=single_file_folder, resolution=self.resolution, single_file=True)
+        for folder, url in ((self.output_folder, self._get_url('segment_000.ts')), (single_file_folder, self._get_url('media.ts', movie_id=2))):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Cache-Control'], settings.HLS_SEGMENT_CACHE_CONTROL)
+                self.assertIn('immutable', response['Cache-Control'])
+                self.assertTrue(response['ETag'].startswith('"'))
+                self.assertIn('Last-Modified', response)
+                os.remove(os.path.join(folder, 'segments.json'))
+                clear_segment_indexes()
+                self.assertEqual(self.client.get(url)['Cache-Control'], 'no-cache')
+
+    def test_conditional_requests_get_not_modified(self):
+        """ Tests that a request with a current ETag or modification date gets 304 Not Modified without a body
+        and that a stale ETag gets the whole file. """
+
+        response = self.client.get(self._get_url('segment_000.ts'))
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        for headers in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_MODIFIED_SINCE': last_modified}):
+            with self.subTest(headers=headers):
+                response = self.client.get(self._get_url('segment_000.ts'), **headers)
+                self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response.content, b'')
+        manifest = self.client.get(self._get_url())
+        self.assertEqual(self.client.get(self._get_url(), HTTP_IF_NONE_MATCH=manifest['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(self._get_url('segment_000.ts'), HTTP_IF_NONE_MATCH='"0-0"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stale_if_range_gets_whole_segment(self):
+        """ Tests that a Range request is answered with 206 while its If-Range still matches and with the whole file once it does not. """
+
+        segment_path = os.path.join(self.output_folder, 'segment_000.ts')
+        etag = self.client.get(self._get_url('segment_000.ts'))['ETag']
+        response = self.client.get(self._get_url('segment_000.ts'), HTTP_RANGE='bytes=0-187', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        response = self.client.get(self._get_url('segment_000.ts'), HTTP_RANGE='bytes=0-187', HTTP_IF_RANGE='"0-0"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(b''.join(response.streaming_content)), os.path.getsize(segment_path))
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-accel', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_segment_handed_to_nginx(self):
+        """ Tests that the 'x-accel' mode answers with an empty body and an X-Accel-Redirect to the segment below the internal prefix. """
+
+        response = self.client.get(self._get_url('segment_000.ts'), HTTP_RANGE='bytes=188-375')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'video/MP2T')
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/videos/{self.movie_id}/{self.resolution}/segment_000.ts')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-accel')
+    def test_partial_manifest_handed_to_nginx_is_not_cached(self):
+        """ Tests that a growing playlist handed to the proxy keeps its 'Cache-Control: no-cache' header. """
+
+        with open(os.path.join(self.output_folder, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:EVENT\n#EXTINF:4.0,\nsegment_000.ts\n')
+        response = self.client.get(self._get_url())
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/videos/{self.movie_id}/{self.resolution}/index.m3u8')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-sendfile')
+    def test_segment_handed_to_sendfile(self):
+        """ Tests that the 'x-sendfile' mode answers with an empty body and the absolute path of the segment in X-Sendfile. """
+
+        response = self.client.get(self._get_url('segment_000.ts'))
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.output_folder, 'segment_000.ts'))
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_DELIVERY_MODE='x-accel')
+    def test_proxy_mode_still_requires_authentication(self):
+        """ Tests that an unauthenticated request is rejected before any redirect header is set. """
+
+        self.client.cookies.clear()
+        response = self.client.get(self._get_url('segment_000.ts'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
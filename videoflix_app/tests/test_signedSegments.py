@@ -0,0 +1,124 @@
+import os
+import time
+import shutil
+from unittest import mock
+from django.conf import settings
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from videoflix_app.api.authentication import get_segment_signature, get_segment_query
+from videoflix_app.api.views import sign_playlist
+from videoflix_app.api.segment_index import clear_segment_indexes
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'), HLS_SIGNED_SEGMENT_URLS=True)
+class SignedSegmentTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up a logged-in user and a rendition with a playlist and two fake segments. """
+
+        clear_segment_indexes()
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        refresh = RefreshToken.for_user(self.user)
+        self.client.cookies['access_token'] = str(refresh.access_token)
+        self.movie_id = 1
+        self.output_folder = os.path.join(settings.MEDIA_ROOT, 'videos', str(self.movie_id), '480p')
+        os.makedirs(self.output_folder)
+        with open(os.path.join(self.output_folder, 'index.m3u8'), 'w') as f:
+            f.write('#EXTM3U\n#EXT-X-PLAYLIST-TYPE:VOD\n#EXTINF:4.0,\nsegment_000.ts\n#EXTINF:4.0,\nsegment_001.ts\n#EXT-X-ENDLIST\n')
+        for name in ('segment_000.ts', 'segment_001.ts'):
+            with open(os.path.join(self.output_folder, name), 'wb') as f:
+                f.write(b'\x47' * 188)
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _get_segment_urls(self):
+        """ Returns the signed segment URLs of the rendition playlist, resolved against the playlist URL. """
+
+        response = self.client.get(f'/api/video/{self.movie_id}/480p/index.m3u8')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [f'/api/video/{self.movie_id}/480p/{line}' for line in response.content.decode().splitlines() if not line.startswith('#')]
+
+    def test_manifest_signs_every_segment(self):
+        """ Tests that every segment URI of the playlist carries the user, the expiry and a valid signature. """
+
+        urls = self._get_segment_urls()
+        self.assertEqual(len(urls), 2)
+        for url in urls:
+            with self.subTest(url=url):
+                path, query = url.split('?')
+                self.assertTrue(path.endswith('.ts/'))
+                params = dict(pair.split('=') for pair in query.split('&'))
+                self.assertEqual(params['user'], str(self.user.id))
+                self.assertGreater(int(params['expires']), time.time())
+                self.assertEqual(params['token'], get_segment_signature(self.user.id, self.movie_id, params['expires']))
+
+    def test_signed_segment_is_served_without_database(self):
+        """ Tests that a signed segment URL is served without the login cookie and without a database query. """
+
+        urls = self._get_segment_urls()
+        self.client.cookies.clear()
+        with self.assertNumQueries(0):
+            response = self.client.get(urls[0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'\x47' * 188)
+
+    @override_settings(HLS_SIGNED_URL_LIFETIME=3600)
+    def test_signed_urls_are_stable_within_a_bucket(self):
+        """ Tests that the expiry is rounded up to half the lifetime, so repeated playlist requests get the same URLs. """
+
+        with mock.patch('videoflix_app.api.authentication.time.time', return_value=1_800_001):
+            first = get_segment_query(self.user.id, self.movie_id)
+        with mock.patch('videoflix_app.api.authentication.time.time', return_value=1_801_799):
+            self.assertEqual(get_segment_query(self.user.id, self.movie_id), first)
+        self.assertIn('expires=1805400', first)
+        with mock.patch('videoflix_app.api.authentication.time.time', return_value=1_801_801):
+            self.assertNotEqual(get_segment_query(self.user.id, self.movie_id), first)
+
+    @override_settings(HLS_SIGNED_URL_LIFETIME=3600)
+    def test_signed_playlist_answers_conditional_requests(self):
+        """ Tests that a signed playlist gets 304 Not Modified for its ETag within an expiry bucket and a new ETag in the next bucket. """
+
+        url = f'/api/video/{self.movie_id}/480p/index.m3u8'
+        with mock.patch('videoflix_app.api.authentication.time.time', return_value=1_800_001):
+            response = self.client.get(url)
+            etag = response['ETag']
+            self.assertNotIn('Last-Modified', response)
+        with mock.patch('videoflix_app.api.authentication.time.time', return_value=1_801_799):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+        with mock.patch('videoflix_app.api.authentication.time.time', return_value=1_801_801):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_tampered_or_expired_url_is_rejected(self):
+        """ Tests that a segment URL for another video, with a changed expiry or an expired signature is rejected without the cookie. """
+
+        url = self._get_segment_urls()[0]
+        self.client.cookies.clear()
+        expired = int(time.time()) - 1
+        expired_url = (f'/api/video/{self.movie_id}/480p/segment_000.ts/?user={self.user.id}&expires={expired}'
+                       f'&token={get_segment_signature(self.user.id, self.movie_id, expired)}')
+        for bad_url in (url.replace(f'/video/{self.movie_id}/', '/video/2/'), url.replace('expires=', 'expires=9'), expired_url):
+            with self.subTest(url=bad_url):
+                self.assertEqual(self.client.get(bad_url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cookie_still_authorizes_unsigned_segment(self):
+        """ Tests that a segment without a signed query is still served to a logged-in user. """
+
+        response = self.client.get(f'/api/video/{self.movie_id}/480p/segment_000.ts/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sign_playlist_signs_init_segment(self):
+        """ Tests that the EXT-X-MAP URI of a CMAF playlist and every byte-range URI get the signed query. """
+
+        content = sign_playlist('#EXTM3U\n#EXT-X-MAP:URI="init.mp4"\n#EXT-X-BYTERANGE:100@0\nmedia.mp4\n#EXT-X-ENDLIST\n', 'token=abc')
+        self.assertEqual(content, '#EXTM3U\n#EXT-X-MAP:URI="init.mp4/?token=abc"\n#EXT-X-BYTERANGE:100@0\nmedia.mp4/?token=abc\n#EXT-X-ENDLIST\n')
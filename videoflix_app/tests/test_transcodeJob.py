@@ -0,0 +1,122 @@
+import os
+import shutil
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from videoflix_app.models import Category, Video, TranscodeJob
+from videoflix_app.api.tasks import LADDER_RESOLUTIONS, get_resolution_size, create_transcode_job, select_renditions, transcode_hls_task
+
+User = get_user_model()
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class TranscodeJobTests(TestCase):
+
+    def setUp(self):
+        """ Sets up a user and a category for the transcode job tests. """
+
+        self.user = User.objects.create_user(username='admin', email='admin@example.com', password='adminpass', is_staff=True)
+        self.category = Category.objects.create(name="TestCategory")
+        sample_path = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        with open(sample_path, 'rb') as f:
+            self.sample_content = f.read()
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def _create_video(self, content):
+        """ Creates a video without a file and attaches the given content, so no transcode is enqueued by the signal. """
+
+        video = Video.objects.create(title="Video", description="Desc", duration=1, category=self.category, user=self.user)
+        video.video_file.save('video.mp4', SimpleUploadedFile('video.mp4', content, content_type='video/mp4'))
+        return video
+
+    def test_job_and_renditions_start_queued(self):
+        """ Tests that a new job and its renditions are created in the queued state. """
+
+        video = self._create_video(self.sample_content)
+        job = create_transcode_job(video, [360, 480])
+        self.assertEqual(job.status, TranscodeJob.STATUS_QUEUED)
+        self.assertEqual(sorted(job.renditions.values_list('resolution', flat=True)), ['360', '480'])
+        self.assertFalse(job.renditions.exclude(status=TranscodeJob.STATUS_QUEUED).exists())
+
+    def test_ladder_resolutions_are_unique(self):
+        """ Tests that every resolution of the upload ladder is encoded in its own frame size, so no rendition is encoded twice. """
+
+        sizes = [get_resolution_size(str(resolution)) for resolution in LADDER_RESOLUTIONS]
+        self.assertEqual(len(sizes), len(set(sizes)))
+
+    def test_successful_transcode_marks_job_done(self):
+        """ Tests that a finished transcode stores the done state, progress, timings, output sizes and exit codes. """
+
+        video = self._create_video(self.sample_content)
+        job = create_transcode_job(video, [360, 480])
+        transcode_hls_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscodeJob.STATUS_DONE)
+        self.assertEqual(job.progress, 100)
+        self.assertIsNotNone(job.started_at)
+        self.assertGreaterEqual(job.finished_at, job.started_at)
+        for rendition in job.renditions.all():
+            with self.subTest(resolution=rendition.resolution):
+                self.assertEqual(rendition.status, TranscodeJob.STATUS_DONE)
+                self.assertEqual(rendition.exit_code, 0)
+                self.assertGreater(rendition.output_size, 0)
+
+    def test_failed_transcode_marks_job_failed(self):
+        """ Tests that an unreadable source marks the job and its renditions as failed and stores the error. """
+
+        video = self._create_video(b"fake video content")
+        job = create_transcode_job(video, [360])
+        transcode_hls_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscodeJob.STATUS_FAILED)
+        self.assertNotEqual(job.error, '')
+        rendition = job.renditions.get()
+        self.assertEqual(rendition.status, TranscodeJob.STATUS_FAILED)
+        self.assertNotEqual(rendition.exit_code, 0)
+
+    def test_unexpected_error_marks_job_failed(self):
+        """ Tests that an error other than a failed ffmpeg run marks the job and its renditions as failed and is raised again. """
+
+        video = self._create_video(self.sample_content)
+        job = create_transcode_job(video, [360])
+        with mock.patch('videoflix_app.api.tasks.generate_hls_ladder', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                transcode_hls_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscodeJob.STATUS_FAILED)
+        self.assertIsNotNone(job.finished_at)
+        self.assertIn('OSError: disk full', job.error)
+        self.assertEqual(job.renditions.get().status, TranscodeJob.STATUS_FAILED)
+
+    def test_renditions_above_source_are_skipped(self):
+        """ Tests that renditions above the 540p sample source are recorded as skipped and not encoded. """
+
+        video = self._create_video(self.sample_content)
+        job = create_transcode_job(video, [360, 480, 720, 1080])
+        transcode_hls_task(job.id)
+        job.refresh_from_db()
+        self.assertEqual(job.status, TranscodeJob.STATUS_DONE)
+        statuses = dict(job.renditions.values_list('resolution', 'status'))
+        self.assertEqual(statuses, {'360': TranscodeJob.STATUS_DONE, '480': TranscodeJob.STATUS_DONE,
+                                    '720': TranscodeJob.STATUS_SKIPPED, '1080': TranscodeJob.STATUS_SKIPPED})
+        output_root = os.path.join(settings.MEDIA_ROOT, 'videos', str(video.id))
+        self.assertFalse(os.path.exists(os.path.join(output_root, '720p')))
+        with open(os.path.join(output_root, 'master.m3u8')) as f:
+            self.assertNotIn('720p', f.read())
+
+    def test_smallest_rendition_is_kept_for_tiny_sources(self):
+        """ Tests that the smallest rendition is kept even if the source is smaller than every rendition. """
+
+        self.assertEqual(select_renditions(['720', '360', '480'], 320, 240), (['360'], ['480', '720']))
+
+    def test_widescreen_source_keeps_native_width(self):
+        """ Tests that a scope source keeps every rendition that is not larger in both dimensions, e.g. 1080p for a 1920x800 source. """
+
+        self.assertEqual(select_renditions(['360', '480', '720', '1080'], 1920, 800), (['360', '480', '720', '1080'], []))
+        self.assertEqual(select_renditions(['360', '480', '720', '1080'], 1280, 534), (['360', '480', '720'], ['1080']))
+
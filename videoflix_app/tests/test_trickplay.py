@@ -0,0 +1,71 @@
+import os
+import shutil
+from PIL import Image
+from django.conf import settings
+from django.test import override_settings
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from videoflix_app.api.tasks import generate_trickplay, format_vtt_timestamp
+
+User = get_user_model()
+
+@override_settings(MEDIA_ROOT=os.path.join(settings.BASE_DIR, 'test_media'))
+class TrickplayTests(APITestCase):
+
+    def setUp(self):
+        """ Sets up an authenticated user and generates trickplay sprite sheets of the sample video. """
+
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.client.cookies['access_token'] = str(RefreshToken.for_user(self.user).access_token)
+        self.sample_video = os.path.join(settings.BASE_DIR, 'videoflix_app', 'tests', 'assets', 'small.mp4')
+        assert os.path.exists(self.sample_video), "small.mp4 no found in tests/assets"
+        self.output_folder = os.path.join(settings.MEDIA_ROOT, 'videos', '1', 'trickplay')
+        self.vtt_path = generate_trickplay(self.sample_video, self.output_folder, 5.0, interval=1, width=80, columns=2, rows=2)
+
+    def tearDown(self):
+        """ Deletes the test media root directory after each test is executed. """
+
+        if os.path.exists(settings.MEDIA_ROOT):
+            shutil.rmtree(settings.MEDIA_ROOT)
+
+    def test_sprite_sheets_and_vtt_are_written(self):
+        """ Tests that the frames are tiled into sprite sheets and every cue of the WebVTT file points to a tile. """
+
+        with open(self.vtt_path) as f:
+            content = f.read()
+        self.assertTrue(content.startswith('WEBVTT'))
+        self.assertIn('00:00:00.000 --> 00:00:01.000\nsprite_000.jpg#xywh=0,0,80,', content)
+        self.assertIn('sprite_001.jpg#xywh=0,0,80,', content)
+        self.assertEqual(content.count(' --> '), 5)
+        self.assertNotIn('frame_', ''.join(os.listdir(self.output_folder)))
+        with Image.open(os.path.join(self.output_folder, 'sprite_000.jpg')) as sheet:
+            self.assertEqual(sheet.width, 160)
+
+    def test_vtt_timestamp_format(self):
+        """ Tests that positions are formatted as WebVTT timestamps. """
+
+        self.assertEqual(format_vtt_timestamp(3725.5), '01:02:05.500')
+
+    def test_trickplay_files_are_served(self):
+        """ Tests that the WebVTT index and the sprite sheets are served with their content types. """
+
+        response = self.client.get('/api/video/1/trickplay/thumbnails.vtt')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/vtt')
+        response = self.client.get('/api/video/1/trickplay/sprite_000.jpg')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_unknown_trickplay_file_not_found(self):
+        """ Tests that missing files and other file types are not served from the trickplay folder. """
+
+        self.assertEqual(self.client.get('/api/video/1/trickplay/sprite_009.jpg').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/video/1/trickplay/secret.txt').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_trickplay_unauthenticated(self):
+        """ Tests that an unauthenticated request for the trickplay index returns a 401 Unauthorized status code. """
+
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get('/api/video/1/trickplay/thumbnails.vtt').status_code, status.HTTP_401_UNAUTHORIZED)